@@ -1,10 +1,12 @@
 import os
+import uuid
 import secrets
 import string
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 
 from models import (
     User, UserCreateAdvanced, UserRole,
@@ -13,7 +15,7 @@ from models import (
     OrganizationBranding, OrganizationBrandingCreate,
     EmailTemplate, EmailLog
 )
-from auth import get_password_hash
+from auth import get_password_hash_async, hash_passwords_bulk
 
 class AdminService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -34,29 +36,9 @@ class AdminService:
         username = user_data.email.split('@')[0]
         
         # Hash password
-        password_hash = get_password_hash(user_data.password)
+        password_hash = await get_password_hash_async(user_data.password)
         
-        # Create user document
-        user_dict = {
-            "name": user_data.name,
-            "email": user_data.email,
-            "password_hash": password_hash,
-            "role": user_data.role,
-            "organization_id": organization_id,
-            "partner_organization_id": user_data.partner_organization_id,
-            "department": user_data.department,
-            "position": user_data.position,
-            "supervisor_id": user_data.supervisor_id,
-            "access_level": user_data.access_level,
-            "permissions": user_data.permissions or self._get_default_permissions(user_data.role),
-            "is_active": True,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-            "created_by": created_by,
-            "last_login": None,
-            "login_count": 0,
-            "must_change_password": user_data.temporary_password
-        }
+        user_dict = self._build_user_doc(user_data, organization_id, created_by, password_hash)
         
         result = await self.db.users.insert_one(user_dict)
         user_dict["_id"] = str(result.inserted_id)
@@ -83,43 +65,109 @@ class AdminService:
             "credentials_sent": user_data.send_credentials_email
         }
 
-    async def bulk_create_users(self, users_data: List[UserCreateAdvanced], organization_id: str, created_by: str, send_emails: bool = True) -> Dict[str, Any]:
-        """Create multiple users at once with batch email sending"""
-        
+    def _build_user_doc(self, user_data: UserCreateAdvanced, organization_id: str, created_by: str, password_hash: str) -> Dict[str, Any]:
+        """User document for a new account"""
+        return {
+            "id": str(uuid.uuid4()),
+            "name": user_data.name,
+            "email": user_data.email.lower(),
+            "password_hash": password_hash,
+            "role": user_data.role,
+            "organization_id": organization_id,
+            "partner_organization_id": user_data.partner_organization_id,
+            "department": user_data.department,
+            "position": user_data.position,
+            "supervisor_id": user_data.supervisor_id,
+            "access_level": user_data.access_level,
+            "permissions": user_data.permissions or self._get_default_permissions(user_data.role),
+            "is_active": True,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+            "created_by": created_by,
+            "last_login": None,
+            "login_count": 0,
+            "must_change_password": user_data.temporary_password
+        }
+
+    async def bulk_create_users(self, users_data: List[UserCreateAdvanced], organization_id: str, created_by: str, send_emails: bool = True, chunk_size: int = 500) -> Dict[str, Any]:
+        """Create multiple users at once with a per-row status report"""
+        results: List[Dict[str, Any]] = [None] * len(users_data)
+
+        # Rows whose email already has an account, or repeats an earlier row, are skipped.
+        # Emails are stored lowercased (as /auth/register does); the raw spelling
+        # also catches accounts created before that
+        existing = set()
+        emails = list({email for user_data in users_data for email in (user_data.email.lower(), user_data.email)})
+        if emails:
+            async for doc in self.db.users.find({"email": {"$in": emails}}, {"email": 1, "_id": 0}):
+                existing.add(doc["email"].lower())
+
+        pending = []
+        seen = set()
+        for row, user_data in enumerate(users_data):
+            key = user_data.email.lower()
+            if key in existing:
+                results[row] = {"row": row, "email": user_data.email, "status": "skipped", "error": "Email already registered"}
+            elif key in seen:
+                results[row] = {"row": row, "email": user_data.email, "status": "skipped", "error": "Duplicate email in batch"}
+            else:
+                seen.add(key)
+                pending.append((row, user_data, user_data.password or self._generate_secure_password()))
+
+        hashes = await hash_passwords_bulk([password for _, _, password in pending])
+
         created_users = []
-        failed_users = []
         email_queue = []
-        
-        for user_data in users_data:
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            docs = [
+                self._build_user_doc(user_data, organization_id, created_by, password_hash)
+                for (_, user_data, _), password_hash in zip(chunk, hashes[i:i + chunk_size])
+            ]
+
+            failed: Dict[int, str] = {}
             try:
-                # Override email sending for individual users if batch processing
-                user_data.send_credentials_email = False
-                
-                result = await self.create_user_advanced(user_data, organization_id, created_by)
-                created_users.append(result)
-                
+                await self.db.users.insert_many(docs, ordered=False)
+            except BulkWriteError as bwe:
+                for err in bwe.details.get("writeErrors", []):
+                    failed[err["index"]] = err.get("errmsg", "Insert failed")
+            except Exception as chunk_error:
+                failed = {idx: str(chunk_error) for idx in range(len(docs))}
+
+            for idx, ((row, user_data, password), doc) in enumerate(zip(chunk, docs)):
+                if idx in failed:
+                    results[row] = {"row": row, "email": user_data.email, "status": "failed", "error": failed[idx]}
+                    continue
+                doc["_id"] = str(doc["_id"])
+                user = User(**doc)
+                username = user_data.email.split('@')[0]
+                created_users.append({
+                    "user": user,
+                    "username": username,
+                    "password": password,
+                    "credentials_sent": send_emails
+                })
+                results[row] = {"row": row, "email": user_data.email, "status": "created", "user_id": user.id}
                 if send_emails:
-                    email_queue.append({
-                        "user": result["user"],
-                        "username": result["username"],
-                        "password": result["password"]
-                    })
-                    
+                    email_queue.append({"user": user, "username": username, "password": password, "row": row})
+
+        if email_queue:
+            try:
+                await self._send_batch_credentials_emails(organization_id, email_queue, created_by)
             except Exception as e:
-                failed_users.append({
-                    "email": user_data.email,
-                    "error": str(e)
-                })
-        
-        # Send batch emails if requested
-        if send_emails and email_queue:
-            await self._send_batch_credentials_emails(organization_id, email_queue, created_by)
-        
+                for email_data in email_queue:
+                    results[email_data["row"]]["warning"] = f"User created but credentials email not sent: {e}"
+
+        failed_users = [
+            {"email": r["email"], "error": r["error"]}
+            for r in results if r["status"] != "created"
+        ]
         return {
             "created_count": len(created_users),
             "failed_count": len(failed_users),
             "created_users": created_users,
             "failed_users": failed_users,
+            "results": results,
             "emails_sent": send_emails
         }
 
@@ -382,9 +430,13 @@ class AdminService:
     async def _send_user_credentials_email(self, organization_id: str, user_email: str, user_name: str, 
                                          username: str, password: str, role: str, created_by: str):
         """Send user credentials via mock email system"""
-        
-        # Create email log entry
-        email_log = {
+        email_log = self._credentials_email_log(organization_id, user_email, user_name, username, password, role, created_by)
+        await self.db.email_logs.insert_one(email_log)
+
+    def _credentials_email_log(self, organization_id: str, user_email: str, user_name: str,
+                               username: str, password: str, role: str, created_by: str) -> Dict[str, Any]:
+        """Email log entry carrying a user's credentials"""
+        return {
             "organization_id": organization_id,
             "recipient_email": user_email,
             "recipient_name": user_name,
@@ -410,14 +462,11 @@ class AdminService:
             "triggered_by": created_by,
             "created_at": datetime.utcnow()
         }
-        
-        await self.db.email_logs.insert_one(email_log)
 
     async def _send_batch_credentials_emails(self, organization_id: str, email_queue: List[Dict], created_by: str):
         """Send batch credentials emails"""
-        
-        for email_data in email_queue:
-            await self._send_user_credentials_email(
+        email_logs = [
+            self._credentials_email_log(
                 organization_id=organization_id,
                 user_email=email_data["user"].email,
                 user_name=email_data["user"].name,
@@ -426,6 +475,10 @@ class AdminService:
                 role=email_data["user"].role,
                 created_by=created_by
             )
+            for email_data in email_queue
+        ]
+        if email_logs:
+            await self.db.email_logs.insert_many(email_logs)
 
     async def get_email_logs(self, organization_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Get email logs for organization"""
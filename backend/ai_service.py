@@ -7,7 +7,11 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from pydantic import BaseModel
 
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+try:
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
+except Exception:
+    LlmChat = UserMessage = None
+from llm_gateway import LLMGateway
 from models import (
     SurveyQuestion, QuestionType, AISurveyGenerationRequest, 
     SurveyGenerationContext, DocumentUpload
@@ -33,10 +37,7 @@ class AIService:
     # ... existing methods (unchanged) ...
 
 # Finance AI functionality
-try:
-    from emergentintegrations import LLMClient
-except Exception:
-    LLMClient = None
+FINANCE_AI_DEADLINE = float(os.environ.get('FINANCE_AI_DEADLINE_SECONDS', '10'))
 
 class FinanceAIInsight(BaseModel):
     risk_level: str
@@ -51,56 +52,52 @@ class FinanceAIInsight(BaseModel):
     risk_predictions: Optional[List[str]] = None
 
 class FinanceAI:
-    def __init__(self):
-        self.key = os.environ.get('EMERGENT_LLM_KEY')
-        self.client = None
-        if self.key and LLMClient:
-            try:
-                self.client = LLMClient(api_key=self.key, provider='openai', model='gpt-4o')
-            except Exception:
-                self.client = None
+    def __init__(self, llm: Optional[LLMGateway] = None):
+        self.llm = llm or LLMGateway()
 
-    async def analyze(self, summary: Dict[str, Any], anomalies: List[Dict[str, Any]]) -> FinanceAIInsight:
-        if not self.client:
-            count = len(anomalies)
-            risk = 'low' if count == 0 else 'medium' if count < 5 else 'high'
-            # Simple heuristic add-ons
-            reallocation = ['Consider reallocating unused funds from low-variance items to critical path activities']
-            forecast = {'method': 'avg_monthly', 'notes': 'Using simple average monthly spend for projection'}
-            return FinanceAIInsight(
-                risk_level=risk,
-                description='Fallback analysis based on available summaries',
-                recommendations=['Review high-variance items', 'Adjust disbursements', 'Set alerts for vendor spikes'],
-                confidence=0.6,
-                reallocation_suggestions=reallocation,
-                forecast_summary=forecast,
-                budget_finish_estimate='unknown',
-            )
-        # Rich prompt with requested capabilities
+    def _heuristic(self, anomalies: List[Dict[str, Any]]) -> FinanceAIInsight:
+        count = len(anomalies)
+        risk = 'low' if count == 0 else 'medium' if count < 5 else 'high'
+        # Simple heuristic add-ons
+        reallocation = ['Consider reallocating unused funds from low-variance items to critical path activities']
+        forecast = {'method': 'avg_monthly', 'notes': 'Using simple average monthly spend for projection'}
+        return FinanceAIInsight(
+            risk_level=risk,
+            description='Fallback analysis based on available summaries',
+            recommendations=['Review high-variance items', 'Adjust disbursements', 'Set alerts for vendor spikes'],
+            confidence=0.6,
+            reallocation_suggestions=reallocation,
+            forecast_summary=forecast,
+            budget_finish_estimate='unknown',
+        )
+
+    async def _insight(self, summary: Dict[str, Any], anomalies: List[Dict[str, Any]], organization_id: Optional[str] = None):
+        # Rich prompt with requested capabilities; sorted keys keep equal data on one cache entry
         prompt = (
             "You are a project finance co-pilot. Analyze provided summaries and anomalies and return STRICT JSON with keys: "
             "risk_level, description, recommendations (array of 3-7), confidence (0-1), "
             "reallocation_suggestions (array), forecast_summary (object with remaining_costs_estimate, cash_flow_alerts if any), "
             "disbursement_timing (array with activity-based timing guidance), budget_finish_estimate (under/over/about on budget with %), "
             "variance_hotspots (array identifying activities/lines requiring action), risk_predictions (array predicting likely over/under spend activities).\n"
-            f"Summary: {json.dumps(summary)[:8000]}\n"
-            f"Anomalies: {json.dumps(anomalies)[:2000]}\n"
+            f"Summary: {json.dumps(summary, sort_keys=True, default=str)[:8000]}\n"
+            f"Anomalies: {json.dumps(anomalies, sort_keys=True, default=str)[:2000]}\n"
             "Ensure JSON only, no prose."
         )
-        try:
-            resp = await self.client.chat(messages=[
+        return await self.llm.complete(
+            organization_id,
+            [
                 {"role": "system", "content": "Be concise, return JSON only."},
                 {"role": "user", "content": prompt}
-            ])
-            text = resp.get('content') or resp.get('text') or str(resp)
-            # Parse JSON
-            data = json.loads(text)
-            return FinanceAIInsight(**data)
-        except Exception:
-            # Fallback
-            return FinanceAIInsight(
-                risk_level='medium',
-                description='AI service error; using fallback guidance',
-                recommendations=['Review cost centers', 'Cut non-critical spend'],
-                confidence=0.6,
-            )
\ No newline at end of file
+            ],
+            schema=FinanceAIInsight,
+            fallback=lambda: self._heuristic(anomalies),
+            deadline=FINANCE_AI_DEADLINE,
+        )
+
+    async def analyze(self, summary: Dict[str, Any], anomalies: List[Dict[str, Any]], organization_id: Optional[str] = None) -> FinanceAIInsight:
+        return (await self._insight(summary, anomalies, organization_id)).value
+
+    async def finance_insights(self, payload: Dict[str, Any], organization_id: Optional[str] = None) -> Dict[str, Any]:
+        """Insight for the /finance/ai/insights payload ({summary, anomalies}), flagged with ai_used"""
+        result = await self._insight(payload.get('summary') or {}, payload.get('anomalies') or [], organization_id)
+        return {**result.value.model_dump(), 'ai_used': result.ai_used, 'cached': result.source == 'cache'}
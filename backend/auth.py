@@ -1,30 +1,113 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import List, Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorClient
 from models import User, UserRole, TokenData
+from ttl_cache import TTLCache
 import os
+import time
 
 # Security Configuration
 SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
+# Verified token -> User snapshot. User writes must call invalidate_user().
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", "4096"))
+# Let read-only routes use the signed org_id/role claims without a user
+# lookup. A deactivated user keeps read access until the token expires.
+TRUST_TOKEN_CLAIMS = os.environ.get("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# bcrypt runs on its own threads (it releases the GIL) so a burst of logins
+# cannot stall the event loop. Past MAX_PENDING queued hashes we shed load.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "64"))
+# Bulk provisioning hashes on separate processes so it never queues behind
+# (or starves) interactive logins
+PASSWORD_HASH_PROCESSES = int(os.environ.get("PASSWORD_HASH_PROCESSES", str(os.cpu_count() or 1)))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 # Database - will be set by server.py
 db = None
 
+_user_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+_trusted_claim_hits = 0
+
+def invalidate_user(user_id: str) -> int:
+    """Drop cached sessions of user_id; call after updating, deactivating or deleting it"""
+    return _user_cache.discard_where(lambda token, user: user.id == user_id)
+
+def auth_cache_stats() -> dict:
+    return {**_user_cache.stats(), "trusted_claim_hits": _trusted_claim_hits, "trust_token_claims": TRUST_TOKEN_CLAIMS}
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+_hash_rejected = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_hashing(fn, *args):
+    global _hash_pending, _hash_rejected
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        _hash_rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool; raises 503 when the pool is saturated"""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing pool; raises 503 when the pool is saturated"""
+    return await _run_hashing(get_password_hash, password)
+
+_bulk_hash_pool: Optional[ProcessPoolExecutor] = None
+
+def _hash_chunk(passwords: List[str]) -> List[str]:
+    return [get_password_hash(p) for p in passwords]
+
+async def hash_passwords_bulk(passwords: List[str], chunk_size: int = 32) -> List[str]:
+    """Hash passwords across a process pool, preserving order"""
+    global _bulk_hash_pool
+    if not passwords:
+        return []
+    if _bulk_hash_pool is None:
+        _bulk_hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_PROCESSES)
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(_bulk_hash_pool, _hash_chunk, passwords[i:i + chunk_size])
+        for i in range(0, len(passwords), chunk_size)
+    ))
+    return [hashed for chunk in chunks for hashed in chunk]
+
+def password_hashing_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "pending": _hash_pending,
+        "rejected": _hash_rejected,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -44,8 +127,8 @@ async def get_user_by_email(email: str) -> Optional[User]:
     return None
 
 async def get_user_by_id(user_id: str) -> Optional[User]:
-    # Try both id and _id fields for compatibility
-    user_doc = await db.users.find_one({"$or": [{"id": user_id}, {"_id": user_id}]})
+    # Users carry an indexed id field; older documents may only have _id
+    user_doc = await db.users.find_one({"id": user_id}) or await db.users.find_one({"_id": user_id})
     if user_doc:
         # Remove MongoDB _id field before serialization
         user_doc.pop('_id', None)
@@ -56,34 +139,48 @@ async def authenticate_user(email: str, password: str) -> Optional[User]:
     user = await get_user_by_email(email)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         return None
     return user
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+def decode_token(token: str) -> TokenData:
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(
+            raise _credentials_exception()
+        return TokenData(
             user_id=user_id,
             organization_id=payload.get("org_id"),
-            role=UserRole(payload.get("role"))
+            role=UserRole(payload.get("role")),
+            exp=payload.get("exp"),
         )
-    except JWTError:
-        raise credentials_exception
-    
-    user = await get_user_by_id(user_id)
+    except (JWTError, ValueError):
+        raise _credentials_exception()
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+    token = credentials.credentials
+    user = _user_cache.get(token)
+    if user is not None:
+        return user
+
+    token_data = decode_token(token)
+    user = await get_user_by_id(token_data.user_id)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    # Never serve a cached session past the token's own expiry
+    ttl = AUTH_CACHE_TTL
+    if token_data.exp:
+        ttl = min(ttl, token_data.exp - time.time())
+    if ttl > 0:
+        _user_cache.set(token, user, ttl)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -91,6 +188,21 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_token_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenData:
+    """Caller identity for read-only routes.
+
+    With AUTH_TRUST_TOKEN_CLAIMS the signed claims are used as-is; otherwise
+    the user is loaded (through the cache) and must be active.
+    """
+    global _trusted_claim_hits
+    if TRUST_TOKEN_CLAIMS:
+        token_data = decode_token(credentials.credentials)
+        if token_data.organization_id:
+            _trusted_claim_hits += 1
+            return token_data
+    user = await get_current_active_user(await get_current_user(credentials))
+    return TokenData(user_id=user.id, organization_id=user.organization_id, role=user.role)
+
 def require_role(required_role: UserRole):
     def role_checker(current_user: User = Depends(get_current_active_user)):
         if current_user.role == UserRole.ADMIN:
@@ -0,0 +1,253 @@
+"""
+Beneficiary locations for the map.
+
+Beneficiaries with valid gps_latitude / gps_longitude also carry a GeoJSON
+point in `location`, written with every create/update and indexed with
+(organization_id, location 2dsphere). The map endpoint asks for a bounding
+box and zoom level:
+
+- below MAP_POINTS_ZOOM the beneficiaries in the box are grouped into a grid
+  of MAP_CELLS_PER_TILE x MAP_CELLS_PER_TILE cells per map tile by a $group
+  stage, returning one cluster per cell with its count, centroid and
+  risk-level breakdown;
+- from MAP_POINTS_ZOOM on, individual points are returned, at most
+  MAP_POINT_LIMIT of them.
+
+Documents written before `location` existed are filled in by the backfill,
+run from backend/:
+
+    python beneficiary_geo.py backfill [--org ORG_ID] [--batch-size 1000]
+"""
+
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+import cli_support
+from beneficiary_search import HIDE_SEARCH_FIELDS
+from models import RiskLevel
+
+MAP_POINTS_ZOOM = int(os.environ.get("MAP_POINTS_ZOOM", "14"))
+MAP_POINT_LIMIT = int(os.environ.get("MAP_POINT_LIMIT", "5000"))
+MAP_CELLS_PER_TILE = 4
+# Used when no zoom is given and the points exceed MAP_POINT_LIMIT
+MAP_DEFAULT_ZOOM = 8
+MAP_CLUSTER_LIMIT = 5000
+
+GPS_FIELDS = ("gps_latitude", "gps_longitude")
+# Excludes the derived search fields and location from documents returned by the API
+HIDE_DERIVED_FIELDS = {**HIDE_SEARCH_FIELDS, "location": 0}
+POINT_PROJECTION = {
+    "_id": 1, "id": 1, "name": 1, "gps_latitude": 1, "gps_longitude": 1, "status": 1,
+    "risk_level": 1, "progress_score": 1, "last_service_date": 1, "project_ids": 1,
+}
+
+BBox = Tuple[float, float, float, float]
+
+
+def location_of(doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """GeoJSON point of a beneficiary document; None without valid coordinates"""
+    lat, lng = doc.get("gps_latitude"), doc.get("gps_longitude")
+    if isinstance(lat, bool) or isinstance(lng, bool) or not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return {"type": "Point", "coordinates": [float(lng), float(lat)]}
+
+
+def geo_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields to store with a new beneficiary document"""
+    location = location_of(doc)
+    return {"location": location} if location else {}
+
+
+def parse_bbox(bbox: Optional[str]) -> Optional[BBox]:
+    """(min_lng, min_lat, max_lng, max_lat) from "min_lng,min_lat,max_lng,max_lat"; raises ValueError"""
+    if not bbox:
+        return None
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat")
+    if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat within -180..180 / -90..90")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def _bulge(lat: float, step: float) -> float:
+    """Degrees a great-circle edge between two points on lat, step degrees of longitude apart, bows poleward"""
+    if abs(lat) >= 90:
+        return 0.0
+    peak = math.degrees(math.atan(math.tan(math.radians(abs(lat))) / math.cos(math.radians(step / 2))))
+    return peak - abs(lat)
+
+
+def _ring(bbox: BBox) -> List[List[float]]:
+    # Polygon edges are geodesics, so a latitude edge would bow toward its pole
+    # and cut into the box. The ring has a vertex every degree of longitude
+    # and its latitude edges are pushed out by the remaining bulge, making it
+    # a superset of the box that the coordinate ranges then trim
+    min_lng, min_lat, max_lng, max_lat = bbox
+    steps = max(1, math.ceil(max_lng - min_lng))
+    step = (max_lng - min_lng) / steps
+    south = max(-90.0, min_lat - _bulge(min_lat, step))
+    north = min(90.0, max_lat + _bulge(max_lat, step))
+    lngs = [min_lng + i * step for i in range(steps)] + [max_lng]
+    return [[lng, south] for lng in lngs] + [[lng, north] for lng in reversed(lngs)] + [[min_lng, south]]
+
+
+def location_filter(bbox: Optional[BBox]) -> Dict[str, Any]:
+    if bbox is None:
+        return {"location": {"$exists": True}}
+    min_lng, min_lat, max_lng, max_lat = bbox
+    ranges = {"location.coordinates.0": {"$gte": min_lng, "$lte": max_lng},
+              "location.coordinates.1": {"$gte": min_lat, "$lte": max_lat}}
+    ring = _ring(bbox)
+    if max_lng - min_lng >= 180 or abs(ring[0][1]) >= 90 or abs(ring[-2][1]) >= 90:
+        # A GeoJSON polygon must fit in a hemisphere and cannot run along a
+        # pole; boxes like these are checked on the coordinates only
+        return ranges
+    return {"location": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}, **ranges}
+
+
+def cell_size(zoom: int) -> float:
+    """Grid cell width in degrees at a zoom level"""
+    return 360.0 / (2 ** zoom) / MAP_CELLS_PER_TILE
+
+
+def cluster_pipeline(match: Dict[str, Any], zoom: int) -> List[Dict[str, Any]]:
+    size = cell_size(zoom)
+    lng = {"$arrayElemAt": ["$location.coordinates", 0]}
+    lat = {"$arrayElemAt": ["$location.coordinates", 1]}
+    risk = {"$ifNull": ["$risk_level", RiskLevel.LOW.value]}
+    return [
+        {"$match": match},
+        {"$project": {
+            "id": 1, "risk": risk, "lng": lng, "lat": lat,
+            "x": {"$floor": {"$divide": [{"$add": [lng, 180]}, size]}},
+            "y": {"$floor": {"$divide": [{"$add": [lat, 90]}, size]}},
+        }},
+        {"$group": {
+            "_id": {"x": "$x", "y": "$y"},
+            "count": {"$sum": 1},
+            "longitude": {"$avg": "$lng"},
+            "latitude": {"$avg": "$lat"},
+            "id": {"$first": "$id"},
+            **{level.value: {"$sum": {"$cond": [{"$eq": ["$risk", level.value]}, 1, 0]}} for level in RiskLevel},
+        }},
+        {"$sort": {"count": -1}},
+        {"$limit": MAP_CLUSTER_LIMIT},
+    ]
+
+
+def _cluster(row: Dict[str, Any], size: float) -> Dict[str, Any]:
+    x, y = row["_id"]["x"], row["_id"]["y"]
+    cluster = {
+        "latitude": row["latitude"],
+        "longitude": row["longitude"],
+        "count": row["count"],
+        "risk_levels": {level.value: row[level.value] for level in RiskLevel},
+        "bounds": [x * size - 180, y * size - 90, (x + 1) * size - 180, (y + 1) * size - 90],
+    }
+    if row["count"] == 1:
+        cluster["id"] = row["id"]
+    return cluster
+
+
+def _point(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": doc.get("id", str(doc.get("_id"))),
+        "name": doc.get("name", "Unknown"),
+        "latitude": doc.get("gps_latitude"),
+        "longitude": doc.get("gps_longitude"),
+        "status": doc.get("status", "active"),
+        "risk_level": doc.get("risk_level", "low"),
+        "progress_score": doc.get("progress_score"),
+        "last_service_date": doc.get("last_service_date"),
+        "project_ids": doc.get("project_ids", []),
+    }
+
+
+async def map_data(collection, query: Dict[str, Any], bbox: Optional[BBox] = None, zoom: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Clusters or points of the beneficiaries matching query inside bbox.
+    Without a zoom, points are returned when there are at most
+    MAP_POINT_LIMIT of them and clusters at MAP_DEFAULT_ZOOM otherwise
+    """
+    match = {**query, **location_filter(bbox)}
+    if zoom is None or zoom >= MAP_POINTS_ZOOM:
+        docs = await collection.find(match, POINT_PROJECTION).limit(MAP_POINT_LIMIT + 1).to_list(MAP_POINT_LIMIT + 1)
+        if zoom is not None or len(docs) <= MAP_POINT_LIMIT:
+            return {
+                "mode": "points",
+                "zoom": zoom,
+                "map_points": [_point(doc) for doc in docs[:MAP_POINT_LIMIT]],
+                "truncated": len(docs) > MAP_POINT_LIMIT,
+            }
+        zoom = MAP_DEFAULT_ZOOM
+
+    size = cell_size(zoom)
+    rows = await collection.aggregate(cluster_pipeline(match, zoom), allowDiskUse=True).to_list(MAP_CLUSTER_LIMIT)
+    return {
+        "mode": "clusters",
+        "zoom": zoom,
+        "cell_size": size,
+        "clusters": [_cluster(row, size) for row in rows],
+        "map_points": [],
+        "total": sum(row["count"] for row in rows),
+        "truncated": len(rows) >= MAP_CLUSTER_LIMIT,
+    }
+
+
+async def refresh(collection, query: Dict[str, Any]) -> None:
+    """Rewrite the location of the beneficiary matching query after its coordinates changed"""
+    doc = await collection.find_one(query, {"gps_latitude": 1, "gps_longitude": 1, "location": 1})
+    if doc is None:
+        return
+    location = location_of(doc)
+    if location == doc.get("location"):
+        return
+    update = {"$set": {"location": location}} if location else {"$unset": {"location": ""}}
+    await collection.update_one({"_id": doc["_id"]}, update)
+
+
+async def backfill(db, organization_id: Optional[str] = None, batch_size: int = 1000) -> int:
+    """
+    Write `location` wherever it is missing or disagrees with the GPS fields,
+    walking the collection in _id order; returns the number of documents updated
+    """
+    match: Dict[str, Any] = {"organization_id": organization_id} if organization_id else {}
+    projection = {"gps_latitude": 1, "gps_longitude": 1, "location": 1}
+    updated = 0
+    last_id = None
+    while True:
+        batch_query = {**match, "_id": {"$gt": last_id}} if last_id is not None else match
+        docs = await db.beneficiaries.find(batch_query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return updated
+        last_id = docs[-1]["_id"]
+        updates = []
+        for doc in docs:
+            location = location_of(doc)
+            if location != doc.get("location"):
+                update = {"$set": {"location": location}} if location else {"$unset": {"location": ""}}
+                updates.append(UpdateOne({"_id": doc["_id"]}, update))
+        if updates:
+            await db.beneficiaries.bulk_write(updates, ordered=False)
+            updated += len(updates)
+
+
+async def _main(argv: List[str]) -> int:
+    parser = cli_support.parser("Backfill beneficiary GeoJSON locations", ["backfill"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    count = await backfill(await cli_support.database(), args.organization_id, args.batch_size)
+    print(f"Updated locations of {count} beneficiaries")
+    return 0
+
+
+if __name__ == "__main__":
+    cli_support.run(_main)
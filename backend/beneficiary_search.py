@@ -0,0 +1,204 @@
+"""
+Indexed beneficiary search.
+
+Each beneficiary document carries search fields derived from its name and
+identifiers on every write:
+
+- search_tokens: lowercase, accent-folded words of name / first_name /
+  last_name / national_id / system_id ("Éric Mugabo" -> ["eric", "mugabo"])
+- search_terms: every prefix of those words up to MAX_PREFIX characters, so a
+  partially typed word is an exact multikey match on
+  (organization_id, search_terms)
+- national_id_key / system_id_key: the identifier folded and stripped of
+  punctuation, for exact lookups on their own indexes
+- search_v: SEARCH_VERSION the fields were derived with
+
+A query matches when every typed word is a prefix of some word of the
+beneficiary, or when it equals an identifier exactly. The identifier matches
+and the SEARCH_CANDIDATE_LIMIT newest word matches are ranked: identifier
+matches first, then by the number of typed words matching whole words, then
+newest first.
+
+Documents written before these fields existed (or by an older SEARCH_VERSION)
+are filled in by the backfill, run from backend/:
+
+    python beneficiary_search.py backfill [--org ORG_ID] [--batch-size 1000]
+"""
+
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+import cli_support
+from pagination import TOTAL_MODES, count_total
+
+SEARCH_VERSION = 1
+MAX_PREFIX = 20
+SEARCH_CANDIDATE_LIMIT = int(os.environ.get("BENEFICIARY_SEARCH_CANDIDATES", "1000"))
+
+SOURCE_FIELDS = ("name", "first_name", "last_name", "national_id", "system_id")
+SEARCH_FIELDS = ("search_tokens", "search_terms", "national_id_key", "system_id_key", "search_v")
+# Excludes the derived fields from documents returned by the API
+HIDE_SEARCH_FIELDS = {field: 0 for field in SEARCH_FIELDS}
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def fold(text: Any) -> str:
+    """Lowercase text with accents removed ("Ngabó" -> "ngabo")"""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text: Any) -> List[str]:
+    return _WORD.findall(fold(text)) if text else []
+
+
+def id_key(value: Any) -> Optional[str]:
+    """Identifier compared without case, accents or punctuation ("BEN-2024-A1" -> "ben2024a1")"""
+    key = "".join(tokenize(value))
+    return key or None
+
+
+def search_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Derived search fields of a beneficiary document"""
+    tokens: List[str] = []
+    for field in SOURCE_FIELDS:
+        for token in tokenize(doc.get(field)):
+            if token not in tokens:
+                tokens.append(token)
+    terms = sorted({token[:n] for token in tokens for n in range(1, min(len(token), MAX_PREFIX) + 1)})
+    return {
+        "search_tokens": tokens,
+        "search_terms": terms,
+        "national_id_key": id_key(doc.get("national_id")),
+        "system_id_key": id_key(doc.get("system_id")),
+        "search_v": SEARCH_VERSION,
+    }
+
+
+def _word_clause(words: List[str]) -> Dict[str, Any]:
+    # Longest word first: the index is scanned for the first $all term
+    terms = sorted({w[:MAX_PREFIX] for w in words}, key=len, reverse=True)
+    by_words: Dict[str, Any] = {"search_terms": {"$all": terms}}
+    long_words = [w for w in words if len(w) > MAX_PREFIX]
+    if long_words:
+        by_words = {"$and": [by_words] + [{"search_tokens": {"$regex": f"^{re.escape(w)}"}} for w in long_words]}
+    return by_words
+
+
+def _id_clauses(words: List[str]) -> List[Dict[str, Any]]:
+    key = "".join(words)
+    return [{"national_id_key": key}, {"system_id_key": key}]
+
+
+def search_filter(search: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """($match clause, query words) for a search string; (None, []) when it has no words"""
+    words = tokenize(search)
+    if not words:
+        return None, []
+    return {"$or": _id_clauses(words) + [_word_clause(words)]}, words
+
+
+async def search_page(collection, query: Dict[str, Any], search: str, page: int = 1, page_size: int = 20,
+                      total: Optional[str] = None, projection: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    One page of ranked search results, shaped like pagination.paginate()
+    (ranked results are paged by offset, so next_cursor is always None)
+    """
+    page = max(page, 1)
+    page_size = max(page_size, 1)
+    total = total or "exact"
+    if total not in TOTAL_MODES:
+        raise ValueError(f"total must be one of {', '.join(TOTAL_MODES)}")
+
+    clause, words = search_filter(search)
+    if clause is None:
+        return {"docs": [], "total": 0, "total_is_estimate": False, "page": page, "page_size": page_size,
+                "total_pages": 0, "next_cursor": None}
+    match = {**query, **clause}
+    key = "".join(words)
+    # Candidates: every identifier match plus the newest word matches, each
+    # selected through its own index so the same matches are ranked every time
+    pipeline = [
+        {"$match": {**query, "$or": _id_clauses(words)}},
+        {"$unionWith": {"coll": collection.name, "pipeline": [
+            {"$match": {**query, **_word_clause(words)}},
+            {"$sort": {"created_at": -1, "_id": -1}},
+            {"$limit": SEARCH_CANDIDATE_LIMIT},
+        ]}},
+        {"$group": {"_id": "$_id", "doc": {"$first": "$$ROOT"}}},
+        {"$replaceRoot": {"newRoot": "$doc"}},
+        {"$addFields": {"_rank": {"$add": [
+            {"$cond": [{"$or": [{"$eq": ["$national_id_key", key]}, {"$eq": ["$system_id_key", key]}]}, 100, 0]},
+            {"$size": {"$setIntersection": [{"$ifNull": ["$search_tokens", []]}, words]}},
+        ]}}},
+        {"$sort": {"_rank": -1, "created_at": -1, "_id": -1}},
+        {"$skip": (page - 1) * page_size},
+        {"$limit": page_size},
+        {"$project": {"_rank": 0, **(projection or {})}},
+    ]
+    docs = await collection.aggregate(pipeline).to_list(page_size)
+    total_count, is_estimate = await count_total(collection, match, total)
+    if total_count is not None and total_count > SEARCH_CANDIDATE_LIMIT:
+        # Only the identifier matches and the newest SEARCH_CANDIDATE_LIMIT word
+        # matches are ranked and pageable
+        id_matches = await collection.count_documents({**query, "$or": _id_clauses(words)})
+        total_count, is_estimate = min(total_count, SEARCH_CANDIDATE_LIMIT + id_matches), True
+    return {
+        "docs": docs,
+        "total": total_count,
+        "total_is_estimate": is_estimate,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (total_count + page_size - 1) // page_size if total_count is not None else None,
+        "next_cursor": None,
+    }
+
+
+async def refresh(collection, query: Dict[str, Any]) -> None:
+    """Recompute the search fields of the beneficiary matching query after an update"""
+    doc = await collection.find_one(query, {field: 1 for field in SOURCE_FIELDS + SEARCH_FIELDS})
+    if doc is None:
+        return
+    fields = search_fields(doc)
+    if any(doc.get(k) != v for k, v in fields.items()):
+        await collection.update_one({"_id": doc["_id"]}, {"$set": fields})
+
+
+async def backfill(db, organization_id: Optional[str] = None, batch_size: int = 1000) -> int:
+    """
+    Fill in search fields missing or derived by an older SEARCH_VERSION,
+    walking the collection in _id order; returns the number of documents updated
+    """
+    match: Dict[str, Any] = {"organization_id": organization_id} if organization_id else {}
+    projection = {field: 1 for field in SOURCE_FIELDS + ("search_v",)}
+    updated = 0
+    last_id = None
+    while True:
+        batch_query = {**match, "_id": {"$gt": last_id}} if last_id is not None else match
+        docs = await db.beneficiaries.find(batch_query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return updated
+        last_id = docs[-1]["_id"]
+        updates = [UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(doc)}) for doc in docs if doc.get("search_v") != SEARCH_VERSION]
+        if updates:
+            await db.beneficiaries.bulk_write(updates, ordered=False)
+            updated += len(updates)
+
+
+async def _main(argv: List[str]) -> int:
+    parser = cli_support.parser("Backfill the beneficiary search fields", ["backfill"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    count = await backfill(await cli_support.database(), args.organization_id, args.batch_size)
+    print(f"Updated search fields of {count} beneficiaries")
+    return 0
+
+
+if __name__ == "__main__":
+    cli_support.run(_main)
@@ -4,13 +4,20 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from bson import ObjectId
 import asyncio
-import math
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from models import (
     Beneficiary, BeneficiaryCreate, BeneficiaryUpdate,
     ServiceRecord, ServiceRecordCreate, BatchServiceRecord,
     BeneficiaryKPI, BeneficiaryKPICreate, BeneficiaryKPIUpdate,
     BeneficiaryStatus, RiskLevel, ServiceType
 )
+from pagination import paginate, page_metadata
+import risk_scoring
+import beneficiary_search
+import beneficiary_geo
+from data_versions import data_versions
 
 class BeneficiaryService:
     def __init__(self, db):
@@ -32,7 +39,9 @@ class BeneficiaryService:
             )
             
             # Insert into database
-            result = await self.db.beneficiaries.insert_one(beneficiary.dict())
+            doc = beneficiary.dict()
+            result = await self.db.beneficiaries.insert_one({**doc, **beneficiary_search.search_fields(doc), **beneficiary_geo.geo_fields(doc)})
+            data_versions.bump(organization_id, "beneficiaries")
             beneficiary.id = str(result.inserted_id) if result.inserted_id else beneficiary.id
             
             return beneficiary
@@ -48,9 +57,11 @@ class BeneficiaryService:
         risk_level: Optional[RiskLevel] = None,
         page: int = 1,
         page_size: int = 20,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        total: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Get beneficiaries with filtering and pagination"""
+        """Get beneficiaries with filtering and page or cursor pagination"""
         try:
             query = {"organization_id": organization_id}
             
@@ -64,34 +75,20 @@ class BeneficiaryService:
             if risk_level:
                 query["risk_level"] = risk_level
             
-            # Search functionality
-            if search:
-                query["$or"] = [
-                    {"name": {"$regex": search, "$options": "i"}},
-                    {"first_name": {"$regex": search, "$options": "i"}},
-                    {"last_name": {"$regex": search, "$options": "i"}},
-                    {"national_id": {"$regex": search, "$options": "i"}},
-                    {"system_id": {"$regex": search, "$options": "i"}}
-                ]
-            
-            # Count total for pagination
-            total = await self.db.beneficiaries.count_documents(query)
-            
-            # Apply pagination
-            cursor = self.db.beneficiaries.find(query).sort("created_at", -1).skip((page - 1) * page_size).limit(page_size)
+            # Search uses the indexed search fields and ranks the matches
+            if search and search.strip():
+                result = await beneficiary_search.search_page(
+                    self.db.beneficiaries, query, search, page, page_size, total, beneficiary_geo.HIDE_DERIVED_FIELDS
+                )
+            else:
+                result = await paginate(self.db.beneficiaries, query, "created_at", -1, page, page_size, cursor, total, beneficiary_geo.HIDE_DERIVED_FIELDS)
             
             beneficiaries = []
-            async for doc in cursor:
+            for doc in result["docs"]:
                 doc["_id"] = str(doc.get("_id"))
                 beneficiaries.append(Beneficiary(**doc))
             
-            return {
-                "items": beneficiaries,
-                "total": total,
-                "page": page,
-                "page_size": page_size,
-                "total_pages": math.ceil(total / page_size)
-            }
+            return {"items": beneficiaries, **page_metadata(result)}
         except Exception as e:
             raise Exception(f"Failed to get beneficiaries: {str(e)}")
 
@@ -106,7 +103,7 @@ class BeneficiaryService:
             except Exception:
                 query = {"organization_id": organization_id, "id": beneficiary_id}
             
-            doc = await self.db.beneficiaries.find_one(query)
+            doc = await self.db.beneficiaries.find_one(query, beneficiary_geo.HIDE_DERIVED_FIELDS)
             if doc:
                 doc["_id"] = str(doc.get("_id"))
                 return Beneficiary(**doc)
@@ -138,7 +135,12 @@ class BeneficiaryService:
             result = await self.db.beneficiaries.update_one(query, {"$set": update_data})
             
             if result.modified_count > 0:
-                updated_doc = await self.db.beneficiaries.find_one(query)
+                data_versions.bump(organization_id, "beneficiaries")
+                if any(field in update_data for field in beneficiary_search.SOURCE_FIELDS):
+                    await beneficiary_search.refresh(self.db.beneficiaries, query)
+                if any(field in update_data for field in beneficiary_geo.GPS_FIELDS):
+                    await beneficiary_geo.refresh(self.db.beneficiaries, query)
+                updated_doc = await self.db.beneficiaries.find_one(query, beneficiary_geo.HIDE_DERIVED_FIELDS)
                 if updated_doc:
                     updated_doc["_id"] = str(updated_doc.get("_id"))
                     return Beneficiary(**updated_doc)
@@ -161,6 +163,7 @@ class BeneficiaryService:
                 query, 
                 {"$set": {"status": BeneficiaryStatus.INACTIVE, "updated_at": datetime.utcnow()}}
             )
+            data_versions.bump(organization_id, "beneficiaries")
             
             return result.modified_count > 0
         except Exception as e:
@@ -189,6 +192,7 @@ class BeneficiaryService:
                 {"id": service_data.beneficiary_id, "organization_id": organization_id},
                 {"$set": {"last_service_date": service_data.service_date, "updated_at": datetime.utcnow()}}
             )
+            data_versions.bump(organization_id, "service_records", "beneficiaries")
             
             return service_record
         except Exception as e:
@@ -198,35 +202,88 @@ class BeneficiaryService:
         self, 
         batch_data: BatchServiceRecord, 
         organization_id: str,
-        created_by: str
-    ) -> List[ServiceRecord]:
-        """Create service records for multiple beneficiaries"""
+        created_by: str,
+        chunk_size: int = 500
+    ) -> Dict[str, Any]:
+        """Create service records for multiple beneficiaries with a per-item result report"""
         try:
-            service_records = []
-            
-            for beneficiary_id in batch_data.beneficiary_ids:
-                service_data = ServiceRecordCreate(
-                    beneficiary_id=beneficiary_id,
-                    project_id=batch_data.project_id,
-                    activity_id=batch_data.activity_id,
-                    service_type=batch_data.service_type,
-                    service_name=batch_data.service_name,
-                    service_description=batch_data.service_description,
-                    service_date=batch_data.service_date,
-                    service_location=batch_data.service_location,
-                    gps_latitude=batch_data.gps_latitude,
-                    gps_longitude=batch_data.gps_longitude,
-                    staff_responsible=batch_data.staff_responsible,
-                    staff_name=batch_data.staff_name,
-                    resources_used=batch_data.resources_used,
-                    cost=batch_data.cost_per_beneficiary,
-                    notes=batch_data.notes
-                )
-                
-                service_record = await self.create_service_record(service_data, organization_id, created_by)
-                service_records.append(service_record)
-            
-            return service_records
+            # Declared fields only: extras allowed by SafeModel (id, organization_id, ...)
+            # must not reach every record of the batch
+            template = batch_data.dict(include=set(BatchServiceRecord.model_fields) - {"beneficiary_ids", "cost_per_beneficiary"})
+            template["cost"] = batch_data.cost_per_beneficiary
+            now = datetime.utcnow()
+
+            service_records: List[ServiceRecord] = []
+            # One entry per input position, like AdminService.bulk_create_users
+            results: List[Dict[str, Any]] = [None] * len(batch_data.beneficiary_ids)
+            seen = set()
+            pending = []
+            for row, beneficiary_id in enumerate(batch_data.beneficiary_ids):
+                if beneficiary_id in seen:
+                    results[row] = {"row": row, "beneficiary_id": beneficiary_id, "status": "skipped", "error": "Duplicate beneficiary in batch"}
+                    continue
+                seen.add(beneficiary_id)
+                pending.append((row, beneficiary_id))
+
+            for i in range(0, len(pending), chunk_size):
+                chunk = pending[i:i + chunk_size]
+                records = [
+                    ServiceRecord(
+                        **ServiceRecordCreate(beneficiary_id=beneficiary_id, **template).dict(),
+                        organization_id=organization_id,
+                        created_by=created_by
+                    )
+                    for _, beneficiary_id in chunk
+                ]
+                docs = [record.dict() for record in records]
+
+                failed: Dict[int, str] = {}
+                try:
+                    await self.db.service_records.insert_many(docs, ordered=False)
+                except BulkWriteError as bwe:
+                    for err in bwe.details.get("writeErrors", []):
+                        failed[err["index"]] = err.get("errmsg", "Insert failed")
+                except Exception as chunk_error:
+                    failed = {idx: str(chunk_error) for idx in range(len(docs))}
+
+                created_rows = []
+                for idx, ((row, beneficiary_id), record, doc) in enumerate(zip(chunk, records, docs)):
+                    if idx in failed:
+                        results[row] = {"row": row, "beneficiary_id": beneficiary_id, "status": "failed", "error": failed[idx]}
+                        continue
+                    # Same id convention as create_service_record
+                    record.id = str(doc["_id"])
+                    service_records.append(record)
+                    created_rows.append(row)
+                    results[row] = {"row": row, "beneficiary_id": beneficiary_id, "status": "created", "service_record_id": record.id}
+
+                if created_rows:
+                    updates = [
+                        UpdateOne(
+                            {"id": results[row]["beneficiary_id"], "organization_id": organization_id},
+                            {"$set": {"last_service_date": batch_data.service_date, "updated_at": now}}
+                        )
+                        for row in created_rows
+                    ]
+                    try:
+                        await self.db.beneficiaries.bulk_write(updates, ordered=False)
+                    except BulkWriteError as bwe:
+                        for err in bwe.details.get("writeErrors", []):
+                            results[created_rows[err["index"]]]["warning"] = (
+                                f"Record created but last service date not updated: {err.get('errmsg', '')}"
+                            )
+
+            created_count = len(service_records)
+            skipped_count = sum(1 for r in results if r["status"] == "skipped")
+            if created_count:
+                data_versions.bump(organization_id, "service_records", "beneficiaries")
+            return {
+                "service_records": service_records,
+                "results": results,
+                "created_count": created_count,
+                "skipped_count": skipped_count,
+                "failed_count": len(results) - created_count - skipped_count,
+            }
         except Exception as e:
             raise Exception(f"Failed to create batch service records: {str(e)}")
 
@@ -240,9 +297,11 @@ class BeneficiaryService:
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         page: int = 1,
-        page_size: int = 20
+        page_size: int = 20,
+        cursor: Optional[str] = None,
+        total: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Get service records with filtering and pagination"""
+        """Get service records with filtering and page or cursor pagination"""
         try:
             query = {"organization_id": organization_id}
             
@@ -263,24 +322,14 @@ class BeneficiaryService:
                     date_filter["$lte"] = date_to
                 query["service_date"] = date_filter
             
-            # Count total for pagination
-            total = await self.db.service_records.count_documents(query)
-            
-            # Apply pagination
-            cursor = self.db.service_records.find(query).sort("service_date", -1).skip((page - 1) * page_size).limit(page_size)
+            result = await paginate(self.db.service_records, query, "service_date", -1, page, page_size, cursor, total)
             
             records = []
-            async for doc in cursor:
+            for doc in result["docs"]:
                 doc["_id"] = str(doc.get("_id"))
                 records.append(ServiceRecord(**doc))
             
-            return {
-                "items": records,
-                "total": total,
-                "page": page,
-                "page_size": page_size,
-                "total_pages": math.ceil(total / page_size)
-            }
+            return {"items": records, **page_metadata(result)}
         except Exception as e:
             raise Exception(f"Failed to get service records: {str(e)}")
 
@@ -308,6 +357,7 @@ class BeneficiaryService:
             )
             
             result = await self.db.beneficiary_kpis.insert_one(kpi.dict())
+            data_versions.bump(organization_id, "beneficiary_kpis")
             kpi.id = str(result.inserted_id) if result.inserted_id else kpi.id
             
             return kpi
@@ -353,6 +403,7 @@ class BeneficiaryService:
             )
             
             if result.modified_count > 0:
+                data_versions.bump(organization_id, "beneficiary_kpis")
                 updated_doc = await self.db.beneficiary_kpis.find_one({"id": kpi_id, "organization_id": organization_id})
                 if updated_doc:
                     updated_doc["_id"] = str(updated_doc.get("_id"))
@@ -480,76 +531,97 @@ class BeneficiaryService:
     async def get_beneficiary_map_data(
         self, 
         organization_id: str,
-        project_id: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
-        """Get beneficiary location data for mapping"""
+        project_id: Optional[str] = None,
+        bbox: Optional[str] = None,
+        zoom: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get beneficiary clusters or points inside a bounding box for mapping"""
         try:
             query = {"organization_id": organization_id}
             if project_id:
                 query["project_ids"] = project_id
             
-            # Only get beneficiaries with GPS coordinates
-            query["gps_latitude"] = {"$ne": None}
-            query["gps_longitude"] = {"$ne": None}
-            
-            cursor = self.db.beneficiaries.find(query)
-            
-            map_data = []
-            async for doc in cursor:
-                map_point = {
-                    "id": doc.get("id", str(doc.get("_id"))),
-                    "name": doc.get("name", "Unknown"),
-                    "latitude": doc.get("gps_latitude"),
-                    "longitude": doc.get("gps_longitude"),
-                    "status": doc.get("status", "active"),
-                    "risk_level": doc.get("risk_level", "low"),
-                    "progress_score": doc.get("progress_score"),
-                    "last_service_date": doc.get("last_service_date"),
-                    "project_ids": doc.get("project_ids", [])
-                }
-                map_data.append(map_point)
-            
-            return map_data
+            # Only beneficiaries with GPS coordinates have a location
+            return await beneficiary_geo.map_data(self.db.beneficiaries, query, beneficiary_geo.parse_bbox(bbox), zoom)
         except Exception as e:
             raise Exception(f"Failed to get map data: {str(e)}")
 
-    async def calculate_risk_scores(self, organization_id: str) -> Dict[str, int]:
-        """Calculate and update risk scores for all beneficiaries"""
+    async def calculate_risk_scores(self, organization_id: str, chunk_size: int = 1000) -> Dict[str, int]:
+        """Calculate and update risk scores for all active beneficiaries in one batch"""
         try:
-            updated_count = 0
-            
-            cursor = self.db.beneficiaries.find({"organization_id": organization_id, "status": "active"})
-            
-            async for beneficiary in cursor:
-                beneficiary_id = beneficiary.get("id", str(beneficiary.get("_id")))
-                
-                # Calculate risk score based on multiple factors
-                risk_score = await self._calculate_individual_risk_score(beneficiary_id, organization_id)
-                
-                # Determine risk level
-                if risk_score >= 80:
-                    risk_level = RiskLevel.CRITICAL
-                elif risk_score >= 60:
-                    risk_level = RiskLevel.HIGH
-                elif risk_score >= 40:
-                    risk_level = RiskLevel.MEDIUM
-                else:
-                    risk_level = RiskLevel.LOW
-                
-                # Update beneficiary
-                await self.db.beneficiaries.update_one(
-                    {"id": beneficiary_id, "organization_id": organization_id},
-                    {"$set": {"risk_score": risk_score, "risk_level": risk_level, "updated_at": datetime.utcnow()}}
+            now = datetime.utcnow()
+            recent_date = now - timedelta(days=90)
+
+            async def grouped(collection, pipeline):
+                return await collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+            beneficiaries, recent_rows, kpi_rows, satisfaction_rows = await asyncio.gather(
+                self.db.beneficiaries.find(
+                    {"organization_id": organization_id, "status": "active"},
+                    {"_id": 1, "id": 1, "last_service_date": 1}
+                ).to_list(None),
+                grouped(self.db.service_records, [
+                    {"$match": {"organization_id": organization_id, "service_date": {"$gte": recent_date}}},
+                    {"$group": {"_id": "$beneficiary_id", "count": {"$sum": 1}}}
+                ]),
+                # Progress values are summed in Python below, in the same order as
+                # get_beneficiary_kpis, so averages match the per-beneficiary path.
+                # KPIs without a progress value count as 0, as they do there
+                grouped(self.db.beneficiary_kpis, [
+                    {"$match": {"organization_id": organization_id}},
+                    {"$sort": {"measurement_date": -1}},
+                    {"$group": {"_id": "$beneficiary_id", "progress": {"$push": {"$ifNull": ["$progress_percentage", 0]}}}}
+                ]),
+                grouped(self.db.service_records, [
+                    {"$match": {"organization_id": organization_id, "satisfaction_score": {"$ne": None}}},
+                    {"$group": {"_id": "$beneficiary_id", "avg_satisfaction": {"$avg": "$satisfaction_score"}}}
+                ]),
+            )
+            if not beneficiaries:
+                return {"updated_count": 0}
+
+            recent_by_id = {r["_id"]: r["count"] for r in recent_rows}
+            progress_by_id = {
+                r["_id"]: sum(r["progress"]) / len(r["progress"])
+                for r in kpi_rows if r.get("progress")
+            }
+            satisfaction_by_id = {
+                r["_id"]: r["avg_satisfaction"] for r in satisfaction_rows if r.get("avg_satisfaction") is not None
+            }
+
+            ids = [b.get("id", str(b.get("_id"))) for b in beneficiaries]
+            last_service = []
+            for b in beneficiaries:
+                value = b.get("last_service_date")
+                if isinstance(value, str):
+                    value = datetime.fromisoformat(value)
+                last_service.append(value or None)
+
+            scores = risk_scoring.risk_scores(
+                np.array([recent_by_id.get(i, 0) for i in ids], dtype=np.float64),
+                np.array([progress_by_id.get(i, np.nan) for i in ids], dtype=np.float64),
+                risk_scoring.days_since(now, last_service),
+                np.array([satisfaction_by_id.get(i, np.nan) for i in ids], dtype=np.float64),
+            )
+            levels = risk_scoring.risk_levels(scores)
+
+            updates = [
+                UpdateOne(
+                    {"_id": b["_id"]},
+                    {"$set": {"risk_score": float(score), "risk_level": level, "updated_at": now}}
                 )
-                
-                updated_count += 1
-            
-            return {"updated_count": updated_count}
+                for b, score, level in zip(beneficiaries, scores, levels)
+            ]
+            for i in range(0, len(updates), chunk_size):
+                await self.db.beneficiaries.bulk_write(updates[i:i + chunk_size], ordered=False)
+            data_versions.bump(organization_id, "beneficiaries")
+
+            return {"updated_count": len(updates)}
         except Exception as e:
             raise Exception(f"Failed to calculate risk scores: {str(e)}")
 
     async def _calculate_individual_risk_score(self, beneficiary_id: str, organization_id: str) -> float:
-        """Calculate risk score for individual beneficiary"""
+        """Calculate risk score for one beneficiary (reference for risk_scoring.risk_scores)"""
         try:
             risk_score = 0.0
             
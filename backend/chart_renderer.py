@@ -0,0 +1,206 @@
+"""
+Chart rendering for the PDF reports.
+
+Charts are described declaratively as plain dicts and rendered to PNG or SVG
+bytes by render_chart() in a process pool, so matplotlib never runs on the
+event loop. Worker processes import matplotlib (and seaborn when installed)
+once at start-up. Rendered bytes are cached under a hash of the spec, which
+embeds the plotted data, so repeated reports over unchanged data skip
+rendering entirely.
+
+A spec looks like:
+
+    {"kind": "bar" | "barh" | "line" | "pie" | "donut",
+     "title": str, "xlabel": str, "ylabel": str,
+     "labels": [...],                       # categories / x values
+     "series": [{"label": str, "values": [...], "color": str | [str],
+                 "marker": str, "linewidth": float}],
+     "size": [width, height], "dpi": int,
+     "style": matplotlib style, "palette": seaborn palette,
+     "xtick_rotation": deg, "xtick_ha": str, "group_width": float,
+     "legend": bool, "grid": bool, "vline": x, "autopct": str}
+
+Several series on a bar chart are drawn side by side within group_width.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from ttl_cache import TTLCache
+
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+CHART_KINDS = ('bar', 'barh', 'line', 'pie', 'donut')
+CHART_RENDER_PROCESSES = int(os.environ.get('CHART_RENDER_PROCESSES', str(min(2, os.cpu_count() or 1))))
+CHART_CACHE_MAX_ENTRIES = int(os.environ.get('CHART_CACHE_MAX_ENTRIES', '256'))
+# Keys are content hashes, so entries never go stale; the TTL only frees memory
+CHART_CACHE_TTL = float(os.environ.get('CHART_CACHE_TTL_SECONDS', '3600'))
+DEFAULT_DPI = 140
+
+
+def chart_key(spec: Dict[str, Any], fmt: str = 'png') -> str:
+    """Content hash of a spec (data included) and output format"""
+    payload = json.dumps(spec, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f'{fmt}:{payload}'.encode('utf-8')).hexdigest()
+
+
+def _init_worker():
+    """Import and configure matplotlib once per worker process"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    try:
+        import seaborn  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _palette(name: str, count: int):
+    try:
+        import seaborn as sns
+    except ImportError:
+        return None
+    return sns.color_palette(name, max(count, 1))
+
+
+def _draw(ax, spec: Dict[str, Any]):
+    kind = spec['kind']
+    labels = list(spec.get('labels') or [])
+    series = spec.get('series') or []
+
+    if kind in ('pie', 'donut'):
+        values = series[0]['values']
+        wedge_opts = {'labels': labels, 'startangle': 90, 'autopct': spec.get('autopct', '%1.1f%%')}
+        if series[0].get('color'):
+            wedge_opts['colors'] = series[0]['color']
+        if kind == 'donut':
+            wedge_opts['pctdistance'] = 0.85
+        ax.pie(values, **wedge_opts)
+        if kind == 'donut':
+            import matplotlib.pyplot as plt
+            ax.add_artist(plt.Circle((0, 0), 0.70, fc='white'))
+        return
+
+    positions = list(range(len(labels)))
+    if kind == 'bar' and len(series) > 1:
+        width = spec.get('group_width', 0.8) / len(series)
+        for i, s in enumerate(series):
+            offset = (i - (len(series) - 1) / 2) * width
+            ax.bar([p + offset for p in positions], s['values'], width, label=s.get('label'), color=s.get('color'))
+        ax.set_xticks(positions)
+        ax.set_xticklabels(labels)
+    else:
+        for s in series:
+            if kind == 'line':
+                ax.plot(labels, s['values'], marker=s.get('marker', 'o'), label=s.get('label'),
+                        linewidth=s.get('linewidth'), color=s.get('color'))
+            elif kind == 'barh':
+                ax.barh(labels, s['values'], label=s.get('label'), color=s.get('color'))
+            else:
+                ax.bar(labels, s['values'], label=s.get('label'), color=s.get('color'))
+
+    if spec.get('xtick_rotation'):
+        for tick in ax.get_xticklabels():
+            tick.set_rotation(spec['xtick_rotation'])
+            if spec.get('xtick_ha'):
+                tick.set_horizontalalignment(spec['xtick_ha'])
+    if spec.get('vline') is not None:
+        ax.axvline(x=spec['vline'], color='gray', linestyle='--', alpha=0.7)
+    if spec.get('xlabel'):
+        ax.set_xlabel(spec['xlabel'])
+    if spec.get('ylabel'):
+        ax.set_ylabel(spec['ylabel'])
+    if spec.get('grid'):
+        ax.grid(True, alpha=0.3)
+    if spec.get('legend'):
+        ax.legend()
+
+
+def render_chart(spec: Dict[str, Any], fmt: str = 'png') -> bytes:
+    """Render a chart spec to PNG / SVG bytes (blocking; runs in a worker process)"""
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format: {fmt}")
+    if spec.get('kind') not in CHART_KINDS:
+        raise ValueError(f"Unsupported chart kind: {spec.get('kind')}")
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    # A fixed salt keeps SVG element ids, and so the bytes, stable per spec
+    rc = {'svg.hashsalt': 'datarw'}
+    if spec.get('palette'):
+        colors = _palette(spec['palette'], len(spec.get('series') or []))
+        if colors is not None:
+            rc['axes.prop_cycle'] = matplotlib.cycler(color=colors)
+    style = spec.get('style')
+    if style and style not in plt.style.available:
+        style = None
+    with plt.style.context(style or 'default'), plt.rc_context(rc):
+        fig, ax = plt.subplots(figsize=tuple(spec.get('size') or (6, 2.4)))
+        try:
+            _draw(ax, spec)
+            if spec.get('title'):
+                ax.set_title(spec['title'])
+            fig.tight_layout()
+            buf = io.BytesIO()
+            fig.savefig(buf, format=fmt, dpi=spec.get('dpi', DEFAULT_DPI), bbox_inches='tight', metadata={'Software': None} if fmt == 'png' else {'Date': None})
+            return buf.getvalue()
+        finally:
+            plt.close(fig)
+
+
+class ChartRenderer:
+    def __init__(self, max_workers: int = CHART_RENDER_PROCESSES, maxsize: int = CHART_CACHE_MAX_ENTRIES, ttl: float = CHART_CACHE_TTL):
+        self.max_workers = max_workers
+        self.cache = TTLCache(maxsize, ttl)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.rendered = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+        return self._pool
+
+    async def _render(self, spec: Dict[str, Any], fmt: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor(), render_chart, spec, fmt)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool and retry once
+            self._pool = None
+            return await loop.run_in_executor(self._executor(), render_chart, spec, fmt)
+
+    async def render(self, spec: Dict[str, Any], fmt: str = 'png') -> bytes:
+        """Rendered bytes for spec, from cache or a worker process"""
+        async def build() -> bytes:
+            data = await self._render(spec, fmt)
+            self.rendered += 1
+            return data
+        return await self.cache.get_or_build(chart_key(spec, fmt), build)
+
+    async def render_many(self, *specs: Optional[Dict[str, Any]], fmt: str = 'png'):
+        """Render specs concurrently; None specs and failed renders yield None"""
+        async def one(spec):
+            if spec is None:
+                return None
+            try:
+                return await self.render(spec, fmt)
+            except Exception:
+                return None
+        return await asyncio.gather(*(one(spec) for spec in specs))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), 'rendered': self.rendered, 'in_flight': self.cache.in_flight, 'workers': self.max_workers}
+
+
+chart_renderer = ChartRenderer()
@@ -0,0 +1,55 @@
+"""
+Shared plumbing of the maintenance commands run from backend/
+(finance_rollups.py, beneficiary_search.py, beneficiary_geo.py): the
+argument parser, .env loading and the database they connect to.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, List
+
+from db_selection import configured_db_name, select_database
+
+
+def parser(description: str, commands: Iterable[str]) -> argparse.ArgumentParser:
+    """Parser with a positional command and --org; callers add their own options"""
+    result = argparse.ArgumentParser(description=description)
+    result.add_argument("command", choices=list(commands))
+    result.add_argument("--org", dest="organization_id", default=None)
+    return result
+
+
+def load_env() -> None:
+    """Read backend/.env into the environment when MONGO_URL is not set, like the server does"""
+    if os.environ.get("MONGO_URL"):
+        return
+    env_path = Path(__file__).parent / ".env"
+    if not env_path.exists():
+        return
+    for line in env_path.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith("#") and "=" in line:
+            k, v = line.split("=", 1)
+            os.environ.setdefault(k.strip(), v.strip().strip('"').strip("'"))
+
+
+async def database():
+    """The database the server would use: MONGO_URL and DB_NAME, or another
+    database with data when the configured one is empty (db_selection)"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_env()
+    mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    db_name = configured_db_name()
+    selected = await select_database(AsyncIOMotorClient(mongo_url), db_name)
+    if selected.name != db_name:
+        print(f"Using database '{selected.name}' instead of empty '{db_name}'", file=sys.stderr)
+    return selected
+
+
+def run(main: Callable[[List[str]], Awaitable[int]]) -> None:
+    """Run main(argv) and exit with its status"""
+    sys.exit(asyncio.run(main(sys.argv[1:])))
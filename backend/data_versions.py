@@ -0,0 +1,36 @@
+"""
+Per-organization data version counters.
+
+Service write paths bump the counter of every collection they modify;
+read-side caches fold the versions they depend on into their cache keys, so
+a write makes stale entries unreachable without explicit eviction.
+
+Counters live in process memory. With several workers, a cache may keep
+serving another worker's pre-write result until its TTL expires, so caches
+built on this should keep TTLs short.
+"""
+
+from typing import Dict, Optional, Tuple
+
+
+class DataVersions:
+    def __init__(self):
+        self._versions: Dict[Tuple[str, str], int] = {}
+        # Bumped by writes whose organization is unknown; invalidates everything
+        self._global = 0
+
+    def bump(self, organization_id: Optional[str], *collections: str) -> None:
+        """Record a write to collections of organization_id"""
+        if not organization_id:
+            self._global += 1
+            return
+        for collection in collections:
+            key = (organization_id, collection)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def get(self, organization_id: str, *collections: str) -> Tuple[int, ...]:
+        """Current versions of collections, usable as part of a cache key"""
+        return (self._global,) + tuple(self._versions.get((organization_id, c), 0) for c in collections)
+
+
+data_versions = DataVersions()
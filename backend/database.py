@@ -4,6 +4,8 @@ from models import *
 from datetime import datetime
 import logging
 
+from auth import invalidate_user
+
 logger = logging.getLogger(__name__)
 
 class DatabaseService:
@@ -102,12 +104,23 @@ class DatabaseService:
         )
         
         if result.modified_count > 0:
+            invalidate_user(user_id)
             return await self.get_user(user_id)
         return None
 
+    async def deactivate_user(self, user_id: str) -> bool:
+        """Mark user inactive; its existing sessions stop authenticating"""
+        result = await self.db.users.update_one(
+            {"_id": user_id},
+            {"$set": {"status": "inactive", "updated_at": datetime.utcnow()}}
+        )
+        invalidate_user(user_id)
+        return result.modified_count > 0
+
     async def delete_user(self, user_id: str) -> bool:
         """Delete user"""
         result = await self.db.users.delete_one({"_id": user_id})
+        invalidate_user(user_id)
         return result.deleted_count > 0
 
     async def update_user_last_login(self, user_id: str):
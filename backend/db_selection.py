@@ -0,0 +1,35 @@
+"""
+Which database the server and the maintenance commands work on: the
+configured one (DB_NAME / MONGO_DB_NAME), unless it is empty and another
+database on the server already holds projects or activities.
+"""
+
+import os
+from typing import Any
+
+
+def configured_db_name() -> str:
+    return os.environ.get('DB_NAME') or os.environ.get('MONGO_DB_NAME') or 'datarw_database'
+
+
+async def _has_data(cand) -> bool:
+    return await cand.projects.estimated_document_count() > 0 or await cand.activities.estimated_document_count() > 0
+
+# Auto-detect database containing prior data if configured DB is empty
+async def select_database(client, configured_name: str) -> Any:
+    configured = client[configured_name]
+    try:
+        if await _has_data(configured):
+            return configured
+        for name in await client.list_database_names():
+            if name in ('admin', 'local', 'config'):
+                continue
+            cand = client[name]
+            try:
+                if await _has_data(cand):
+                    return cand
+            except Exception:
+                continue
+        return configured
+    except Exception:
+        return configured
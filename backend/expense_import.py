@@ -0,0 +1,307 @@
+"""
+Chunked expense import from CSV / XLSX uploads.
+
+The upload is spooled to a temporary file and parsed on a worker thread one
+batch at a time. Each batch is validated against ExpenseCreate, deduplicated
+on (invoice_no, vendor, amount, date), written with insert_many and folded
+into the finance rollups once. Progress is kept in expense_import_jobs and
+failing or skipped rows in expense_import_errors, so any worker can answer
+status and error-report requests.
+
+The spooled file only exists on the process that received the upload, so an
+import cannot move to another worker. Instead the owning process holds a
+lease on the job and renews it with every batch; a job whose lease expired
+because its process died is marked failed (and its spool file removed) at
+startup and whenever its status is read.
+"""
+
+import asyncio
+import csv
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from models import ExpenseCreate
+from data_versions import data_versions
+
+IMPORT_BATCH_SIZE = 1000
+SPOOL_CHUNK_SIZE = 1 << 20
+IMPORT_FIELDS = (
+    "date", "project_id", "activity_id", "vendor", "amount", "currency",
+    "funding_source", "cost_center", "invoice_no", "notes",
+)
+IMPORT_FORMATS = {".csv": "csv", ".xlsx": "xlsx"}
+# Renewed after every batch; a batch of IMPORT_BATCH_SIZE rows takes seconds
+IMPORT_JOB_LEASE = float(os.environ.get("IMPORT_JOB_LEASE_SECONDS", "300"))
+
+# Lease bookkeeping stays out of status responses
+JOB_PROJECTION = {"_id": 0, "worker": 0, "lease_until": 0, "spool_path": 0}
+
+
+def dedupe_key(expense: Dict[str, Any]) -> Optional[Tuple]:
+    """(invoice_no, vendor, amount, date) identity; rows without an invoice are never deduplicated"""
+    invoice_no = expense.get("invoice_no")
+    date = expense.get("date")
+    if not invoice_no or not isinstance(date, datetime):
+        return None
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    # Mongo stores datetimes with millisecond precision
+    date = date.replace(microsecond=date.microsecond // 1000 * 1000)
+    return (str(invoice_no), expense.get("vendor") or None, round(float(expense.get("amount") or 0), 2), date)
+
+
+def _clean(raw: Dict[str, Any]) -> Dict[str, Any]:
+    row = {}
+    for field in IMPORT_FIELDS:
+        value = raw.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        elif field not in ("date", "amount") and isinstance(value, (int, float)):
+            # Spreadsheet cells such as invoice numbers arrive as numbers
+            value = str(int(value)) if float(value).is_integer() else str(value)
+        if value not in (None, ""):
+            row[field] = value
+    return row
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+def _csv_rows(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        for row in csv.DictReader(fh):
+            yield {k.strip().lower(): v for k, v in row.items() if k}
+
+
+def _xlsx_rows(path: str) -> Iterator[Dict[str, Any]]:
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h).strip().lower() if h is not None else "" for h in next(rows, ())]
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            yield {h: v for h, v in zip(header, values) if h}
+    finally:
+        wb.close()
+
+
+class ExpenseImporter:
+    def __init__(self, db, rollups):
+        self.db = db
+        self.rollups = rollups
+        self.worker_id = uuid.uuid4().hex
+        # Keep references so running imports are not garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self, organization_id: str, user_id: str, upload) -> Dict[str, Any]:
+        """Spool upload to disk, record the job and process it in the background"""
+        filename = upload.filename or ""
+        fmt = IMPORT_FORMATS.get(os.path.splitext(filename.lower())[1])
+        if fmt is None:
+            raise ValueError("Upload a .csv or .xlsx file")
+
+        fd, path = tempfile.mkstemp(prefix="expense_import_", suffix=f".{fmt}")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk := await upload.read(SPOOL_CHUNK_SIZE):
+                    out.write(chunk)
+        except Exception:
+            os.unlink(path)
+            raise
+
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "organization_id": organization_id,
+            "created_by": user_id,
+            "filename": filename,
+            "format": fmt,
+            "status": "queued",
+            "rows_processed": 0,
+            "inserted": 0,
+            "duplicates": 0,
+            "failed": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+            "worker": self.worker_id,
+            "lease_until": now + timedelta(seconds=IMPORT_JOB_LEASE),
+            "spool_path": path,
+        }
+        await self.db.expense_import_jobs.insert_one(job)
+        job = {k: v for k, v in job.items() if k not in JOB_PROJECTION}
+
+        task = asyncio.create_task(self._run(job, path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def get_job(self, organization_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        await self.fail_expired({"organization_id": organization_id, "id": job_id})
+        return await self.db.expense_import_jobs.find_one(
+            {"organization_id": organization_id, "id": job_id}, JOB_PROJECTION
+        )
+
+    async def fail_expired(self, query: Optional[Dict[str, Any]] = None) -> int:
+        """Fail queued / running jobs whose process stopped renewing the lease and drop their spool files"""
+        now = datetime.utcnow()
+        expired = {**(query or {}), "status": {"$in": ["queued", "running"]}, "lease_until": {"$lt": now}}
+        failed = 0
+        async for job in self.db.expense_import_jobs.find(expired, {"_id": 0, "id": 1, "spool_path": 1}):
+            result = await self.db.expense_import_jobs.update_one(
+                {"id": job["id"], **expired},
+                {"$set": {"status": "failed", "error": "Import did not finish, please upload the file again",
+                          "finished_at": now, "updated_at": now}},
+            )
+            if not result.modified_count:
+                continue
+            failed += 1
+            # Only present when the dead process ran on this host
+            try:
+                os.unlink(job.get("spool_path") or "")
+            except OSError:
+                pass
+        return failed
+
+    async def stop(self):
+        """Cancel running imports; their jobs are marked failed"""
+        tasks, self._tasks = set(self._tasks), set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def error_rows(self, organization_id: str, job_id: str):
+        """Cursor over a job's rejected rows in file order"""
+        return self.db.expense_import_errors.find(
+            {"organization_id": organization_id, "job_id": job_id}, {"_id": 0}
+        ).sort("row", 1)
+
+    async def _set_job(self, job_id: str, update: Dict[str, Any]):
+        """Update the job and renew this process's lease on it"""
+        now = datetime.utcnow()
+        fields = update.setdefault("$set", {})
+        fields["updated_at"] = now
+        fields["lease_until"] = now + timedelta(seconds=IMPORT_JOB_LEASE)
+        # A job already failed by fail_expired stays failed
+        await self.db.expense_import_jobs.update_one(
+            {"id": job_id, "worker": self.worker_id, "status": {"$in": ["queued", "running"]}}, update
+        )
+
+    async def _run(self, job: Dict[str, Any], path: str):
+        rows = _xlsx_rows(path) if job["format"] == "xlsx" else _csv_rows(path)
+        try:
+            await self._set_job(job["id"], {"$set": {"status": "running"}})
+            seen: Set[Tuple] = set()
+            next_row = 2  # row 1 is the header
+            while True:
+                batch = await asyncio.to_thread(lambda: list(islice(rows, IMPORT_BATCH_SIZE)))
+                if not batch:
+                    break
+                counts = await self._import_batch(job, batch, next_row, seen)
+                next_row += len(batch)
+                await self._set_job(job["id"], {"$inc": counts})
+            await self._set_job(job["id"], {"$set": {"status": "completed", "finished_at": datetime.utcnow()}})
+        except asyncio.CancelledError:
+            await self._set_job(job["id"], {"$set": {"status": "failed", "error": "Import interrupted by a server shutdown", "finished_at": datetime.utcnow()}})
+            raise
+        except Exception as e:
+            await self._set_job(job["id"], {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}})
+        finally:
+            rows.close()
+            os.unlink(path)
+
+    async def _import_batch(self, job: Dict[str, Any], batch: List[Dict[str, Any]], first_row: int, seen: Set[Tuple]) -> Dict[str, int]:
+        organization_id = job["organization_id"]
+        now = datetime.utcnow()
+        rejected: List[Dict[str, Any]] = []
+
+        def reject(row: int, raw: Dict[str, Any], error: str):
+            rejected.append({
+                "job_id": job["id"],
+                "organization_id": organization_id,
+                "row": row,
+                "error": error,
+                "data": {k: (v if v is None or isinstance(v, str) else str(v)) for k, v in raw.items()},
+            })
+
+        valid = []
+        for offset, raw in enumerate(batch):
+            try:
+                data = ExpenseCreate(**_clean(raw))
+            except ValidationError as e:
+                reject(first_row + offset, raw, _describe(e))
+                continue
+            doc = data.model_dump()
+            doc.update({
+                "id": str(uuid.uuid4()),
+                "organization_id": organization_id,
+                "created_by": job["created_by"],
+                "created_at": now,
+                "updated_at": now,
+                "import_job_id": job["id"],
+            })
+            valid.append((first_row + offset, raw, doc))
+
+        # One indexed lookup per batch for expenses already in the ledger
+        invoices = list({doc["invoice_no"] for _, _, doc in valid if doc.get("invoice_no")})
+        existing: Set[Tuple] = set()
+        if invoices:
+            cursor = self.db.expenses.find(
+                {"organization_id": organization_id, "invoice_no": {"$in": invoices}},
+                {"_id": 0, "invoice_no": 1, "vendor": 1, "amount": 1, "date": 1},
+            )
+            async for doc in cursor:
+                existing.add(dedupe_key(doc))
+
+        duplicates = 0
+        pending = []
+        for row, raw, doc in valid:
+            key = dedupe_key(doc)
+            if key is not None and (key in existing or key in seen):
+                duplicates += 1
+                reject(row, raw, "Skipped: duplicate of an existing expense")
+                continue
+            if key is not None:
+                seen.add(key)
+            pending.append((row, raw, doc))
+
+        failed: Dict[int, str] = {}
+        if pending:
+            try:
+                await self.db.expenses.insert_many([doc for _, _, doc in pending], ordered=False)
+            except BulkWriteError as bwe:
+                for err in bwe.details.get("writeErrors", []):
+                    failed[err["index"]] = err.get("errmsg", "Insert failed")
+            except Exception as chunk_error:
+                failed = {idx: str(chunk_error) for idx in range(len(pending))}
+
+        inserted = []
+        for idx, (row, raw, doc) in enumerate(pending):
+            if idx in failed:
+                reject(row, raw, failed[idx])
+            else:
+                inserted.append(doc)
+
+        if inserted:
+            await self.rollups.apply_insert_many(inserted)
+            data_versions.bump(organization_id, "expenses")
+        if rejected:
+            await self.db.expense_import_errors.insert_many(rejected)
+
+        return {
+            "rows_processed": len(batch),
+            "inserted": len(inserted),
+            "duplicates": duplicates,
+            "failed": len(rejected) - duplicates,
+        }
@@ -0,0 +1,273 @@
+"""
+Incrementally maintained finance rollups.
+
+The finance_rollups collection holds one document per
+organization x project x activity x funding_source x month with the spent
+amount and transaction count (total and approved only). Expense writes in
+FinanceService apply $inc deltas here so the analytics read a handful of
+rollup rows instead of re-aggregating the raw expenses collection.
+
+Rebuild / verify from the command line (run from backend/):
+
+    python finance_rollups.py verify [--org ORG_ID]
+    python finance_rollups.py rebuild [--org ORG_ID]
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import cli_support
+
+KEY_FIELDS = ("organization_id", "project_id", "activity_id", "funding_source", "month")
+VALUE_FIELDS = ("spent", "transactions", "approved_spent", "approved_transactions")
+
+# Float sums drift slightly under repeated $inc; verify tolerates this much
+AMOUNT_TOLERANCE = 0.005
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Aware datetimes as naive UTC, matching how expense dates are stored"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def month_start(value: Any) -> Optional[datetime]:
+    """First instant of the month containing value (None for non-dates)"""
+    if isinstance(value, datetime):
+        return datetime(value.year, value.month, 1)
+    return None
+
+
+def next_month(value: datetime) -> datetime:
+    if value.month == 12:
+        return datetime(value.year + 1, 1, 1)
+    return datetime(value.year, value.month + 1, 1)
+
+
+def rollup_key(expense: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "organization_id": expense.get("organization_id"),
+        "project_id": expense.get("project_id"),
+        "activity_id": expense.get("activity_id"),
+        "funding_source": expense.get("funding_source"),
+        "month": month_start(expense.get("date")),
+    }
+
+
+def rollup_values(expense: Dict[str, Any], sign: int = 1) -> Dict[str, float]:
+    amount = float(expense.get("amount") or 0)
+    approved = expense.get("approval_status") == "approved"
+    return {
+        "spent": sign * amount,
+        "transactions": sign,
+        "approved_spent": sign * amount if approved else 0.0,
+        "approved_transactions": sign if approved else 0,
+    }
+
+
+class FinanceRollups:
+    def __init__(self, db):
+        self.db = db
+
+    # -------------------- Incremental maintenance --------------------
+    async def _inc(self, key: Dict[str, Any], values: Dict[str, float]):
+        if not any(values.values()):
+            return
+        await self.db.finance_rollups.update_one(
+            key,
+            {"$inc": values, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def apply_insert(self, expense: Dict[str, Any]):
+        await self._inc(rollup_key(expense), rollup_values(expense, 1))
+
+    async def apply_delete(self, expense: Dict[str, Any]):
+        await self._inc(rollup_key(expense), rollup_values(expense, -1))
+
+    async def apply_update(self, before: Dict[str, Any], after: Dict[str, Any]):
+        """Move an expense's contribution from its old state to its new one"""
+        old_key, new_key = rollup_key(before), rollup_key(after)
+        old_values, new_values = rollup_values(before, -1), rollup_values(after, 1)
+        if old_key == new_key:
+            await self._inc(new_key, {f: old_values[f] + new_values[f] for f in VALUE_FIELDS})
+        else:
+            await self._inc(old_key, old_values)
+            await self._inc(new_key, new_values)
+
+    async def apply_insert_many(self, expenses: List[Dict[str, Any]]):
+        """Fold a batch of inserted expenses into one $inc per rollup key"""
+        folded: Dict[Tuple, Dict[str, float]] = {}
+        for expense in expenses:
+            key = rollup_key(expense)
+            values = rollup_values(expense, 1)
+            acc = folded.setdefault(tuple(key[f] for f in KEY_FIELDS), {f: 0 for f in VALUE_FIELDS})
+            for f in VALUE_FIELDS:
+                acc[f] += values[f]
+        for key_tuple, values in folded.items():
+            await self._inc(dict(zip(KEY_FIELDS, key_tuple)), values)
+
+    # -------------------- Reads --------------------
+    async def spent_by(
+        self,
+        organization_id: str,
+        group_by: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        approved_only: bool = False,
+    ) -> Dict[Tuple, Dict[str, float]]:
+        """
+        Sum spent/transactions grouped by any of project_id, activity_id,
+        funding_source, month, for expenses with date_from <= date <= date_to.
+
+        Whole months inside the range come from finance_rollups; partial months
+        at either edge are aggregated from raw expenses, so at most two months
+        of raw data are ever scanned.
+        """
+        filters = filters or {}
+        date_from, date_to = naive_utc(date_from), naive_utc(date_to)
+        spent_field = "approved_spent" if approved_only else "spent"
+        count_field = "approved_transactions" if approved_only else "transactions"
+
+        full_start = date_from
+        if date_from is not None and date_from != month_start(date_from):
+            full_start = next_month(month_start(date_from))
+        full_end = month_start(date_to) if date_to is not None else None
+
+        raw_ranges: List[Tuple[Optional[datetime], Optional[datetime], bool]] = []
+        use_rollups = full_start is None or full_end is None or full_start < full_end
+        if use_rollups:
+            if date_from is not None and date_from < full_start:
+                raw_ranges.append((date_from, full_start, False))
+            if date_to is not None:
+                raw_ranges.append((full_end, date_to, True))
+        else:
+            raw_ranges.append((date_from, date_to, True))
+
+        totals: Dict[Tuple, Dict[str, float]] = {}
+
+        def add(key: Tuple, spent: float, count: int):
+            acc = totals.setdefault(key, {"spent": 0.0, "transactions": 0})
+            acc["spent"] += float(spent or 0)
+            acc["transactions"] += int(count or 0)
+
+        group_id = {f: f"${f}" for f in group_by}
+
+        if use_rollups:
+            match: Dict[str, Any] = {"organization_id": organization_id, **filters}
+            if full_start is not None:
+                match.setdefault("month", {})["$gte"] = full_start
+            if full_end is not None:
+                match.setdefault("month", {})["$lt"] = full_end
+            pipeline = [
+                {"$match": match},
+                {"$group": {"_id": group_id, "spent": {"$sum": f"${spent_field}"}, "count": {"$sum": f"${count_field}"}}},
+            ]
+            async for row in self.db.finance_rollups.aggregate(pipeline):
+                add(tuple(row["_id"].get(f) for f in group_by), row.get("spent"), row.get("count"))
+
+        raw_group_id = {f: f"${f}" for f in group_by if f != "month"}
+        if "month" in group_by:
+            raw_group_id["month"] = {"$dateFromParts": {"year": {"$year": "$date"}, "month": {"$month": "$date"}}}
+        for start, end, end_inclusive in raw_ranges:
+            match = {"organization_id": organization_id, **filters}
+            if approved_only:
+                match["approval_status"] = "approved"
+            if start is not None:
+                match.setdefault("date", {})["$gte"] = start
+            if end is not None:
+                match.setdefault("date", {})["$lte" if end_inclusive else "$lt"] = end
+            pipeline = [
+                {"$match": match},
+                {"$group": {"_id": raw_group_id, "spent": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+            ]
+            async for row in self.db.expenses.aggregate(pipeline):
+                add(tuple(row["_id"].get(f) for f in group_by), row.get("spent"), row.get("count"))
+
+        # Rollup rows whose expenses were all deleted or moved linger at zero
+        return {k: v for k, v in totals.items() if v["transactions"] > 0}
+
+    # -------------------- Rebuild / verify --------------------
+    async def compute_from_expenses(self, organization_id: Optional[str] = None) -> Dict[Tuple, Dict[str, float]]:
+        """Recompute every rollup row from the raw expenses collection"""
+        match = {"organization_id": organization_id} if organization_id else {}
+        approved = {"$eq": ["$approval_status", "approved"]}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "organization_id": "$organization_id",
+                    "project_id": "$project_id",
+                    "activity_id": "$activity_id",
+                    "funding_source": "$funding_source",
+                    "month": {"$dateFromParts": {"year": {"$year": "$date"}, "month": {"$month": "$date"}}},
+                },
+                "spent": {"$sum": "$amount"},
+                "transactions": {"$sum": 1},
+                "approved_spent": {"$sum": {"$cond": [approved, "$amount", 0]}},
+                "approved_transactions": {"$sum": {"$cond": [approved, 1, 0]}},
+            }},
+        ]
+        expected: Dict[Tuple, Dict[str, float]] = {}
+        async for row in self.db.expenses.aggregate(pipeline, allowDiskUse=True):
+            key = tuple(row["_id"].get(f) for f in KEY_FIELDS)
+            expected[key] = {f: row.get(f) or 0 for f in VALUE_FIELDS}
+        return expected
+
+    async def verify(self, organization_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Diff live rollups against a from-scratch recomputation"""
+        expected = await self.compute_from_expenses(organization_id)
+        live: Dict[Tuple, Dict[str, float]] = {}
+        match = {"organization_id": organization_id} if organization_id else {}
+        async for doc in self.db.finance_rollups.find(match):
+            live[tuple(doc.get(f) for f in KEY_FIELDS)] = {f: doc.get(f) or 0 for f in VALUE_FIELDS}
+
+        diffs: List[Dict[str, Any]] = []
+        zero = {f: 0 for f in VALUE_FIELDS}
+        for key in set(expected) | set(live):
+            exp = expected.get(key, zero)
+            got = live.get(key, zero)
+            mismatched = [
+                f for f in VALUE_FIELDS
+                if abs(float(exp[f]) - float(got[f])) > (AMOUNT_TOLERANCE if "spent" in f else 0)
+            ]
+            if mismatched:
+                diffs.append({"key": dict(zip(KEY_FIELDS, key)), "expected": exp, "live": got, "fields": mismatched})
+        return diffs
+
+    async def rebuild(self, organization_id: Optional[str] = None) -> int:
+        """
+        Replace rollups with a fresh recomputation. Expense writes that land
+        while this runs may be lost, so run it during quiet periods and follow
+        with verify().
+        """
+        expected = await self.compute_from_expenses(organization_id)
+        match = {"organization_id": organization_id} if organization_id else {}
+        await self.db.finance_rollups.delete_many(match)
+        now = datetime.utcnow()
+        docs = [{**dict(zip(KEY_FIELDS, key)), **values, "updated_at": now} for key, values in expected.items()]
+        for i in range(0, len(docs), 1000):
+            await self.db.finance_rollups.insert_many(docs[i:i + 1000], ordered=False)
+        return len(docs)
+
+
+async def _main(argv: List[str]) -> int:
+    parser = cli_support.parser("Rebuild or verify the finance_rollups collection", ["rebuild", "verify"])
+    args = parser.parse_args(argv)
+
+    rollups = FinanceRollups(await cli_support.database())
+
+    if args.command == "rebuild":
+        count = await rollups.rebuild(args.organization_id)
+        print(f"Rebuilt {count} rollup rows")
+    diffs = await rollups.verify(args.organization_id)
+    for diff in diffs[:50]:
+        print(f"MISMATCH {diff['key']}: expected {diff['expected']} live {diff['live']}")
+    print(f"{len(diffs)} mismatched rollup rows")
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    cli_support.run(_main)
@@ -1,7 +1,7 @@
 import os
 import uuid
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
@@ -10,10 +10,14 @@ from models import (
     Expense, ExpenseCreate, ExpenseUpdate,
     BudgetItem, BudgetItemCreate, BudgetItemUpdate,
 )
+from pagination import paginate, page_metadata
+from finance_rollups import FinanceRollups
+from data_versions import data_versions
 
 class FinanceService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
+        self.rollups = FinanceRollups(db)
 
     # -------------------- Organization Finance Config --------------------
     async def get_org_config(self, organization_id: str) -> Dict[str, Any]:
@@ -51,10 +55,13 @@ class FinanceService:
             "updated_at": now,
         })
         await self.db.expenses.insert_one(payload)
+        await self.rollups.apply_insert(payload)
+        data_versions.bump(organization_id, "expenses")
         payload["_id"] = str(payload.get("_id"))
         return Expense(**payload)
 
-    async def list_expenses(self, organization_id: str, filters: Dict[str, Any], page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+    @staticmethod
+    def _expense_query(organization_id: str, filters: Dict[str, Any]) -> Dict[str, Any]:
         query: Dict[str, Any] = {"organization_id": organization_id}
         if project_id := filters.get("project_id"):
             query["project_id"] = project_id
@@ -68,14 +75,26 @@ class FinanceService:
             query.setdefault("date", {})["$gte"] = datetime.fromisoformat(date_from)
         if date_to := filters.get("date_to"):
             query.setdefault("date", {})["$lte"] = datetime.fromisoformat(date_to)
+        return query
 
-        total = await self.db.expenses.count_documents(query)
-        cursor = self.db.expenses.find(query).sort("date", -1).skip((page - 1) * page_size).limit(page_size)
+    async def list_expenses(self, organization_id: str, filters: Dict[str, Any], page: int = 1, page_size: int = 20, cursor: Optional[str] = None, total: Optional[str] = None) -> Dict[str, Any]:
+        query = self._expense_query(organization_id, filters)
+        result = await paginate(self.db.expenses, query, "date", -1, page, page_size, cursor, total)
         items: List[Dict[str, Any]] = []
-        async for doc in cursor:
+        for doc in result["docs"]:
             doc["_id"] = str(doc.get("_id"))
             items.append(doc)
-        return {"items": items, "total": total, "page": page, "page_size": page_size, "total_pages": (total + page_size - 1) // page_size}
+        return {"items": items, **page_metadata(result)}
+
+    def iter_expenses(self, organization_id: str, filters: Dict[str, Any], fields: List[str], batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Cursor over every matching expense (newest first), projected to fields.
+
+        Filters are validated here, so bad input raises before anything streams.
+        """
+        query = self._expense_query(organization_id, filters)
+        projection = {field: 1 for field in fields}
+        projection["_id"] = 0
+        return self.db.expenses.find(query, projection).sort([("date", -1), ("_id", -1)]).batch_size(batch_size)
 
     async def get_expense(self, organization_id: str, expense_id: str) -> Optional[Expense]:
         filters = []
@@ -102,12 +121,13 @@ class FinanceService:
             pass
         filters.append({"id": expense_id})
         query = {"$and": [{"organization_id": organization_id}, {"$or": filters}]}
-        res = await self.db.expenses.update_one(query, {"$set": update_data})
-        if res.matched_count:
-            doc = await self.db.expenses.find_one(query)
-            if doc:
-                doc["_id"] = str(doc.get("_id"))
-                return Expense(**doc)
+        before = await self.db.expenses.find_one_and_update(query, {"$set": update_data})
+        if before:
+            doc = {**before, **update_data}
+            await self.rollups.apply_update(before, doc)
+            data_versions.bump(organization_id, "expenses")
+            doc["_id"] = str(doc.get("_id"))
+            return Expense(**doc)
         return None
 
     async def delete_expense(self, organization_id: str, expense_id: str) -> bool:
@@ -118,10 +138,22 @@ class FinanceService:
             pass
         filters.append({"id": expense_id})
         query = {"$and": [{"organization_id": organization_id}, {"$or": filters}]}
-        res = await self.db.expenses.delete_one(query)
-        return res.deleted_count > 0
+        doc = await self.db.expenses.find_one_and_delete(query)
+        if doc:
+            await self.rollups.apply_delete(doc)
+            data_versions.bump(organization_id, "expenses")
+        return doc is not None
 
     # -------------------- Summaries & Analytics --------------------
+    # Spend figures come from finance_rollups (see finance_rollups.py); only
+    # partial months at the edges of a date range touch raw expenses.
+    @staticmethod
+    def _date_range(date_from: Optional[str], date_to: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+        return (
+            datetime.fromisoformat(date_from) if date_from else None,
+            datetime.fromisoformat(date_to) if date_to else None,
+        )
+
     async def budget_vs_actual(self, organization_id: str, project_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
         match_budget = {"organization_id": organization_id}
         if project_id:
@@ -138,21 +170,13 @@ class FinanceService:
                 "allocated": float(b.get("allocated", 0)),
                 "utilized_pi": float(b.get("utilized_pi", 0)),
             }
-        # Aggregate expenses (actual)
-        match_exp = {"organization_id": organization_id}
-        if project_id:
-            match_exp["project_id"] = project_id
-        if date_from:
-            match_exp.setdefault("date", {})["$gte"] = datetime.fromisoformat(date_from)
-        if date_to:
-            match_exp.setdefault("date", {})["$lte"] = datetime.fromisoformat(date_to)
-        pipeline_exp = [
-            {"$match": match_exp},
-            {"$group": {"_id": "$project_id", "actual": {"$sum": "$amount"}}}
-        ]
+        # Actual spend from rollups
+        filters = {"project_id": project_id} if project_id else {}
+        start, end = self._date_range(date_from, date_to)
+        spent = await self.rollups.spent_by(organization_id, ["project_id"], filters, start, end)
         actual_by_project: Dict[str, float] = {}
-        async for e in self.db.expenses.aggregate(pipeline_exp):
-            actual_by_project[str(e["_id"]) or "unknown"] = float(e.get("actual", 0))
+        for (pid,), v in spent.items():
+            actual_by_project[str(pid) or "unknown"] = v["spent"]
         # Merge
         result: List[Dict[str, Any]] = []
         keys = set(planned_by_project.keys()) | set(actual_by_project.keys())
@@ -174,68 +198,45 @@ class FinanceService:
         return {"by_project": result}
 
     async def burn_rate(self, organization_id: str, period: str = "monthly", project_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
-        now = datetime.utcnow()
-        start = now - timedelta(days=365)
-        match = {"organization_id": organization_id, "date": {"$gte": start}}
-        if project_id:
-            match["project_id"] = project_id
-        if date_from:
-            match.setdefault("date", {})["$gte"] = datetime.fromisoformat(date_from)
-        if date_to:
-            match.setdefault("date", {})["$lte"] = datetime.fromisoformat(date_to)
+        start, end = self._date_range(date_from, date_to)
+        if start is None:
+            start = datetime.utcnow() - timedelta(days=365)
+        filters = {"project_id": project_id} if project_id else {}
         if period == "quarterly":
-            group_id = {"year": {"$year": "$date"}, "quarter": {"$ceil": {"$divide": [{"$month": "$date"}, 3]}}}
-            label_build = lambda g: f"{int(g['year'])}-Q{int(g['quarter'])}"
+            label_build = lambda m: f"{m.year}-Q{(m.month + 2) // 3}"
         elif period == "annual":
-            group_id = {"year": {"$year": "$date"}}
-            label_build = lambda g: f"{int(g['year'])}"
+            label_build = lambda m: f"{m.year}"
         else:
-            group_id = {"year": {"$year": "$date"}, "month": {"$month": "$date"}}
-            label_build = lambda g: f"{int(g['year'])}-{int(g['month']):02d}"
-        pipeline = [
-            {"$match": match},
-            {"$group": {"_id": group_id, "spent": {"$sum": "$amount"}}},
-            {"$sort": {"_id.year": 1, "_id.month": 1 if period == 'monthly' else 1, "_id.quarter": 1 if period == 'quarterly' else 1}},
-        ]
-        series: List[Dict[str, Any]] = []
-        async for d in self.db.expenses.aggregate(pipeline):
-            label = label_build(d["_id"])
-            series.append({"period": label, "spent": float(d.get("spent", 0))})
+            label_build = lambda m: f"{m.year}-{m.month:02d}"
+        spent = await self.rollups.spent_by(organization_id, ["month"], filters, start, end)
+        by_label: Dict[str, float] = {}
+        for (month,), v in sorted(spent.items(), key=lambda kv: kv[0][0]):
+            label = label_build(month)
+            by_label[label] = by_label.get(label, 0.0) + v["spent"]
+        series: List[Dict[str, Any]] = [{"period": label, "spent": amount} for label, amount in by_label.items()]
         return {"period": period, "series": series}
 
     async def forecast(self, organization_id: str) -> Dict[str, Any]:
         now = datetime.utcnow()
         start_year = datetime(now.year, 1, 1)
-        match = {"organization_id": organization_id, "date": {"$gte": start_year}}
-        pipeline = [
-            {"$match": match},
-            {"$group": {"_id": {"year": {"$year": "$date"}, "month": {"$month": "$date"}}, "spent": {"$sum": "$amount"}}}
-        ]
-        monthly = []
-        async for d in self.db.expenses.aggregate(pipeline):
-            monthly.append(float(d.get("spent", 0)))
+        spent = await self.rollups.spent_by(organization_id, ["month"], date_from=start_year)
+        monthly = [v["spent"] for v in spent.values()]
         avg = sum(monthly) / len(monthly) if monthly else 0.0
         remaining_months = 12 - now.month
         projection = avg * remaining_months
         return {"avg_monthly": avg, "projected_spend_rest_of_year": projection, "months_remaining": remaining_months}
 
     async def funding_utilization(self, organization_id: str, donor: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, project_id: Optional[str] = None) -> Dict[str, Any]:
-        match = {"organization_id": organization_id}
+        filters: Dict[str, Any] = {}
         if donor:
-            match["funding_source"] = donor
+            filters["funding_source"] = donor
         if project_id:
-            match["project_id"] = project_id
-        if date_from:
-            match.setdefault("date", {})["$gte"] = datetime.fromisoformat(date_from)
-        if date_to:
-            match.setdefault("date", {})["$lte"] = datetime.fromisoformat(date_to)
-        pipeline = [
-            {"$match": match},
-            {"$group": {"_id": "$funding_source", "spent": {"$sum": "$amount"}}}
-        ]
+            filters["project_id"] = project_id
+        start, end = self._date_range(date_from, date_to)
+        spent = await self.rollups.spent_by(organization_id, ["funding_source"], filters, start, end)
         items: List[Dict[str, Any]] = []
-        async for d in self.db.expenses.aggregate(pipeline):
-            items.append({"funding_source": d.get("_id") or "Unknown", "spent": float(d.get("spent", 0))})
+        for (source,), v in spent.items():
+            items.append({"funding_source": source or "Unknown", "spent": v["spent"]})
         return {"by_funding_source": items}
 
     # -------------------- Finance Reports Data Helpers --------------------
@@ -258,18 +259,13 @@ class FinanceService:
                 "utilized_pi": float(b.get("utilized_amount", 0)),
             })
         # Expenses by activity within date range
-        match_exp = {"organization_id": organization_id, "project_id": project_id}
-        if date_from:
-            match_exp.setdefault("date", {})["$gte"] = datetime.fromisoformat(date_from)
-        if date_to:
-            match_exp.setdefault("date", {})["$lte"] = datetime.fromisoformat(date_to)
-        pipeline = [
-            {"$match": match_exp},
-            {"$group": {"_id": "$activity_id", "spent": {"$sum": "$amount"}, "count": {"$sum": 1}}}
-        ]
+        start, end = self._date_range(date_from, date_to)
+        spent = await self.rollups.spent_by(organization_id, ["activity_id"], {"project_id": project_id}, start, end)
         spent_by_activity: Dict[str, Dict[str, Any]] = {}
-        async for e in self.db.expenses.aggregate(pipeline):
-            spent_by_activity[str(e.get("_id") or "")] = {"spent": float(e.get("spent", 0)), "transactions": int(e.get("count", 0))}
+        for (activity_id,), v in spent.items():
+            key = str(activity_id or "")
+            prev = spent_by_activity.get(key, {"spent": 0.0, "transactions": 0})
+            spent_by_activity[key] = {"spent": prev["spent"] + v["spent"], "transactions": prev["transactions"] + v["transactions"]}
         total_spent = sum([v["spent"] for v in spent_by_activity.values()])
         variance_amount = total_budgeted - total_spent
         variance_pct = (variance_amount / total_budgeted * 100) if total_budgeted else 0.0
@@ -287,73 +283,59 @@ class FinanceService:
         return (await self.budget_vs_actual(organization_id, None, date_from, date_to)).get("by_project", [])
 
     # -------------------- Approval Workflow Methods --------------------
-    async def submit_expense_for_approval(self, organization_id: str, expense_id: str, user_id: str) -> Optional[Dict[str, Any]]:
-        """Submit an expense for approval"""
+    # Each transition is one find_one_and_update: the returned pre-update
+    # document and the applied $set give the exact rollup change, and the
+    # status condition in the filter keeps concurrent transitions from both
+    # applying.
+    DIRECTOR_APPROVAL_THRESHOLD = 100000.0  # 100K threshold
+
+    @staticmethod
+    def _approval_query(organization_id: str, expense_id: str, **conditions: Any) -> Dict[str, Any]:
         filters = []
         try:
             filters.append({"_id": ObjectId(expense_id)})
         except Exception:
             pass
         filters.append({"id": expense_id})
-        query = {"$and": [{"organization_id": organization_id}, {"$or": filters}]}
-        
-        # Get current expense
-        expense_doc = await self.db.expenses.find_one(query)
-        if not expense_doc:
+        return {"$and": [{"organization_id": organization_id}, {"$or": filters}, conditions]}
+
+    async def _transition(self, organization_id: str, query: Dict[str, Any], update: Any, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        before = await self.db.expenses.find_one_and_update(query, update)
+        if not before:
             return None
-        
-        # Check if user can submit (should be creator or have edit permissions)
-        if expense_doc.get("created_by") != user_id:
-            # Additional permission check could go here
-            pass
-        
-        # Determine if director approval is needed (e.g., for amounts > threshold)
-        DIRECTOR_APPROVAL_THRESHOLD = 100000.0  # 100K threshold
-        requires_director = float(expense_doc.get("amount", 0)) > DIRECTOR_APPROVAL_THRESHOLD
-        
+        doc = {**before, **update_data}
+        await self.rollups.apply_update(before, doc)
+        data_versions.bump(organization_id, "expenses")
+        doc["_id"] = str(doc.get("_id"))
+        return doc
+
+    async def submit_expense_for_approval(self, organization_id: str, expense_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Submit an expense for approval"""
+        query = self._approval_query(organization_id, expense_id)
         update_data = {
             "approval_status": "pending",
-            "requires_director_approval": requires_director,
             "updated_at": datetime.utcnow(),
             "last_updated_by": user_id
         }
-        
-        result = await self.db.expenses.update_one(query, {"$set": update_data})
-        if result.modified_count > 0:
-            # Return updated expense
-            updated_doc = await self.db.expenses.find_one(query)
-            if updated_doc:
-                updated_doc["_id"] = str(updated_doc.get("_id"))
-                return updated_doc
-        return None
+        # Director approval is needed above the threshold; it is decided from
+        # the amount stored at update time, not from an earlier read
+        needs_director = {"$gt": [{"$toDouble": {"$ifNull": ["$amount", 0]}}, self.DIRECTOR_APPROVAL_THRESHOLD]}
+        update = [{"$set": {**update_data, "requires_director_approval": needs_director}}]
+        doc = await self._transition(organization_id, query, update, update_data)
+        if doc is not None:
+            doc["requires_director_approval"] = float(doc.get("amount") or 0) > self.DIRECTOR_APPROVAL_THRESHOLD
+        return doc
 
     async def approve_expense(self, organization_id: str, expense_id: str, approver_id: str, approver_role: str) -> Optional[Dict[str, Any]]:
         """Approve an expense (Admin or Director)"""
-        filters = []
-        try:
-            filters.append({"_id": ObjectId(expense_id)})
-        except Exception:
-            pass
-        filters.append({"id": expense_id})
-        query = {"$and": [{"organization_id": organization_id}, {"$or": filters}]}
-        
-        # Get current expense
-        expense_doc = await self.db.expenses.find_one(query)
-        if not expense_doc:
-            return None
-        
-        # Check approval permissions
-        if expense_doc.get("approval_status") != "pending":
-            raise ValueError("Expense is not pending approval")
-        
-        # Check if approver has sufficient role
-        requires_director = expense_doc.get("requires_director_approval", False)
-        if requires_director and approver_role not in ["Director", "Admin", "System Admin"]:
-            raise ValueError("Director approval required for this expense amount")
-        
         if approver_role not in ["Admin", "Director", "System Admin"]:
+            expense_doc = await self.db.expenses.find_one(self._approval_query(organization_id, expense_id))
+            if not expense_doc:
+                return None
+            if expense_doc.get("requires_director_approval", False):
+                raise ValueError("Director approval required for this expense amount")
             raise ValueError("Insufficient permissions to approve expenses")
-        
+
         update_data = {
             "approval_status": "approved",
             "approved_by": approver_id,
@@ -361,36 +343,19 @@ class FinanceService:
             "updated_at": datetime.utcnow(),
             "last_updated_by": approver_id
         }
-        
-        result = await self.db.expenses.update_one(query, {"$set": update_data})
-        if result.modified_count > 0:
-            updated_doc = await self.db.expenses.find_one(query)
-            if updated_doc:
-                updated_doc["_id"] = str(updated_doc.get("_id"))
-                return updated_doc
-        return None
+        query = self._approval_query(organization_id, expense_id, approval_status="pending")
+        doc = await self._transition(organization_id, query, {"$set": update_data}, update_data)
+        if doc is None:
+            await self._raise_unless_missing(organization_id, expense_id)
+        return doc
 
     async def reject_expense(self, organization_id: str, expense_id: str, approver_id: str, approver_role: str, rejection_reason: str) -> Optional[Dict[str, Any]]:
         """Reject an expense with reason"""
-        filters = []
-        try:
-            filters.append({"_id": ObjectId(expense_id)})
-        except Exception:
-            pass
-        filters.append({"id": expense_id})
-        query = {"$and": [{"organization_id": organization_id}, {"$or": filters}]}
-        
-        # Get current expense
-        expense_doc = await self.db.expenses.find_one(query)
-        if not expense_doc:
-            return None
-        
-        if expense_doc.get("approval_status") != "pending":
-            raise ValueError("Expense is not pending approval")
-        
         if approver_role not in ["Admin", "Director", "System Admin"]:
+            if not await self.db.expenses.find_one(self._approval_query(organization_id, expense_id), {"_id": 1}):
+                return None
             raise ValueError("Insufficient permissions to reject expenses")
-        
+
         update_data = {
             "approval_status": "rejected",
             "rejection_reason": rejection_reason,
@@ -399,14 +364,16 @@ class FinanceService:
             "updated_at": datetime.utcnow(),
             "last_updated_by": approver_id
         }
-        
-        result = await self.db.expenses.update_one(query, {"$set": update_data})
-        if result.modified_count > 0:
-            updated_doc = await self.db.expenses.find_one(query)
-            if updated_doc:
-                updated_doc["_id"] = str(updated_doc.get("_id"))
-                return updated_doc
-        return None
+        query = self._approval_query(organization_id, expense_id, approval_status="pending")
+        doc = await self._transition(organization_id, query, {"$set": update_data}, update_data)
+        if doc is None:
+            await self._raise_unless_missing(organization_id, expense_id)
+        return doc
+
+    async def _raise_unless_missing(self, organization_id: str, expense_id: str):
+        """After a pending-only update matched nothing: None for a missing expense, else not pending"""
+        if await self.db.expenses.find_one(self._approval_query(organization_id, expense_id), {"_id": 1}):
+            raise ValueError("Expense is not pending approval")
 
     async def get_pending_approvals(self, organization_id: str, user_role: str) -> List[Dict[str, Any]]:
         """Get expenses pending approval for the user's role"""
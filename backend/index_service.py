@@ -0,0 +1,188 @@
+"""
+Declarative MongoDB index registry.
+
+Every compound index the services rely on is declared once in INDEX_SPECS,
+keyed by collection. IndexService applies the registry at startup and can
+report drift between the registry and what the server actually holds.
+"""
+
+import logging
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Field order follows the ESR rule (equality, sort, range) for the query
+# shapes issued by the services and the /api routes in server.py. Sorted list
+# shapes end in _id so keyset pagination (pagination.py) is index-ordered.
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "expenses": [
+        IndexModel([("organization_id", ASCENDING), ("project_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("funding_source", ASCENDING), ("date", DESCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("approval_status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("project_id", ASCENDING), ("approval_status", ASCENDING)]),
+        # Import deduplication key (expense_import.dedupe_key)
+        IndexModel([("organization_id", ASCENDING), ("invoice_no", ASCENDING), ("vendor", ASCENDING),
+                    ("amount", ASCENDING), ("date", ASCENDING)]),
+    ],
+    "expense_import_jobs": [
+        IndexModel([("organization_id", ASCENDING), ("id", ASCENDING)]),
+        # Expired leases (ExpenseImporter.fail_expired)
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)]),
+    ],
+    "expense_import_errors": [
+        IndexModel([("organization_id", ASCENDING), ("job_id", ASCENDING), ("row", ASCENDING)]),
+    ],
+    "generated_reports": [
+        # At most one queued / running job per report request (report_jobs.dedupe_key)
+        IndexModel([("dedupe_key", ASCENDING)], unique=True, partialFilterExpression={"active": True}),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("project_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "llm_cache": [
+        IndexModel([("key", ASCENDING)], unique=True),
+        # Entries are removed once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "report_narratives": [
+        # One narrative per organization and prompt (gateway prompt_key)
+        IndexModel([("organization_id", ASCENDING), ("key", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "activities": [
+        IndexModel([("organization_id", ASCENDING), ("project_id", ASCENDING), ("start_date", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("start_date", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("updated_at", DESCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("status", ASCENDING), ("end_date", ASCENDING)]),
+        IndexModel([("project_id", ASCENDING)]),
+        IndexModel([("id", ASCENDING)]),
+    ],
+    "beneficiaries": [
+        IndexModel([("organization_id", ASCENDING), ("project_ids", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # Report collection: beneficiaries enrolled by the end of a period
+        IndexModel([("organization_id", ASCENDING), ("project_ids", ASCENDING), ("enrollment_date", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("project_ids", ASCENDING)]),
+        # Search (beneficiary_search): word prefixes and exact identifiers
+        IndexModel([("organization_id", ASCENDING), ("search_terms", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("national_id_key", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("system_id_key", ASCENDING)]),
+        # Map data (beneficiary_geo): GeoJSON point inside a bounding box
+        IndexModel([("organization_id", ASCENDING), ("location", GEOSPHERE)]),
+    ],
+    "service_records": [
+        IndexModel([("beneficiary_id", ASCENDING), ("service_date", DESCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("service_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("project_id", ASCENDING), ("service_date", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "beneficiary_kpis": [
+        IndexModel([("organization_id", ASCENDING), ("beneficiary_id", ASCENDING), ("measurement_date", DESCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "projects": [
+        IndexModel([("organization_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("id", ASCENDING)]),
+    ],
+    "finance_rollups": [
+        IndexModel(
+            [("organization_id", ASCENDING), ("project_id", ASCENDING), ("activity_id", ASCENDING),
+             ("funding_source", ASCENDING), ("month", ASCENDING)],
+            unique=True,
+        ),
+        IndexModel([("organization_id", ASCENDING), ("month", ASCENDING)]),
+    ],
+    "budget_items": [
+        IndexModel([("organization_id", ASCENDING), ("project_id", ASCENDING)]),
+    ],
+    "kpi_indicators": [
+        IndexModel([("organization_id", ASCENDING), ("project_id", ASCENDING)]),
+    ],
+    "surveys": [
+        IndexModel([("organization_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)]),
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("organization_id", ASCENDING)]),
+    ],
+    "organizations": [
+        IndexModel([("id", ASCENDING)]),
+    ],
+}
+
+
+def index_name(model: IndexModel) -> str:
+    """Name MongoDB assigns to a registry entry"""
+    return model.document["name"]
+
+
+class IndexService:
+    def __init__(self, db):
+        self.db = db
+
+    async def ensure_indexes(self) -> Dict[str, List[str]]:
+        """Create every declared index; existing ones are left untouched"""
+        created: Dict[str, List[str]] = {}
+        for collection, models in INDEX_SPECS.items():
+            try:
+                created[collection] = await self.db[collection].create_indexes(models)
+            except Exception as e:
+                logger.error(f"Failed to create indexes on {collection}: {str(e)}")
+                created[collection] = []
+        return created
+
+    async def report_drift(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Compare the registry with the live server.
+
+        missing: declared but not present
+        undeclared: present on the server but not in the registry
+        unused: declared and present but with zero recorded accesses since
+                the last server restart ($indexStats)
+        """
+        report: Dict[str, Dict[str, Any]] = {}
+        for collection, models in INDEX_SPECS.items():
+            declared = {index_name(m) for m in models}
+            existing = set()
+            async for idx in self.db[collection].list_indexes():
+                if idx["name"] != "_id_":
+                    existing.add(idx["name"])
+
+            unused: List[str] = []
+            try:
+                async for stat in self.db[collection].aggregate([{"$indexStats": {}}]):
+                    name = stat.get("name")
+                    if name in declared and int(stat.get("accesses", {}).get("ops", 0)) == 0:
+                        unused.append(name)
+            except Exception:
+                # $indexStats needs clusterMonitor on some deployments
+                pass
+
+            entry = {
+                "missing": sorted(declared - existing),
+                "undeclared": sorted(existing - declared),
+                "unused": sorted(unused),
+            }
+            if any(entry.values()):
+                report[collection] = entry
+        return report
+
+    async def sync(self) -> Dict[str, Dict[str, Any]]:
+        """Apply the registry and log any remaining drift"""
+        await self.ensure_indexes()
+        drift = await self.report_drift()
+        for collection, entry in drift.items():
+            if entry["missing"]:
+                logger.warning(f"Index drift on {collection}: missing {entry['missing']}")
+            if entry["undeclared"]:
+                logger.info(f"Index drift on {collection}: undeclared {entry['undeclared']}")
+        return drift
@@ -1,55 +1,121 @@
 import os
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any
 from bson import ObjectId
 import asyncio
+
+from data_versions import data_versions
+from finance_rollups import FinanceRollups
+from ttl_cache import TTLCache
+
+TREND_GRANULARITIES = ("week", "month", "quarter")
+# $dateTrunc / $densify unit and step per trend granularity
+TREND_UNITS = {"week": ("week", 1), "month": ("month", 1), "quarter": ("month", 3)}
+DEFAULT_TREND_BUCKETS = 6
+
+# get_indicator_kpis results are cached per org until one of these
+# collections is written (see data_versions) or the TTL runs out
+INDICATOR_DEPENDENCIES = ("projects", "activities", "beneficiaries", "expenses")
+INDICATOR_CACHE_TTL = 60  # seconds
+INDICATOR_CACHE_SIZE = 256
+
+
+def _parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _bucket_start(value: datetime, granularity: str) -> datetime:
+    """Python equivalent of $dateTrunc for the trend granularities (weeks start Monday)"""
+    if granularity == "week":
+        day = value - timedelta(days=value.weekday())
+        return datetime(day.year, day.month, day.day)
+    if granularity == "quarter":
+        return datetime(value.year, (value.month - 1) // 3 * 3 + 1, 1)
+    return datetime(value.year, value.month, 1)
+
+
+def _next_bucket(bucket: datetime, granularity: str) -> datetime:
+    if granularity == "week":
+        return bucket + timedelta(days=7)
+    months = 3 if granularity == "quarter" else 1
+    month_index = bucket.month - 1 + months
+    return datetime(bucket.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def _bucket_label(bucket: datetime, granularity: str) -> str:
+    if granularity == "week":
+        year, week, _ = bucket.isocalendar()
+        return f"{year}-W{week:02d}"
+    if granularity == "quarter":
+        return f"Q{(bucket.month - 1) // 3 + 1} {bucket.year}"
+    return bucket.strftime("%b %Y")
+
+
 class KPIService:
     def __init__(self, db):
         self.db = db
+        self.rollups = FinanceRollups(db)
+        # (org, params, data versions) -> result
+        self.indicator_cache = TTLCache(INDICATOR_CACHE_SIZE, INDICATOR_CACHE_TTL)
 
     # -------------------- Indicator Level KPIs --------------------
-    async def get_indicator_kpis(self, organization_id: str, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
+    async def get_indicator_kpis(self, organization_id: str, date_from: Optional[str] = None, date_to: Optional[str] = None, granularity: str = "month") -> Dict[str, Any]:
         """Get high-level organization indicators"""
         try:
-            # Date filtering
-            date_filter = {"organization_id": organization_id}
-            if date_from and date_to:
-                date_filter["created_at"] = {
-                    "$gte": datetime.fromisoformat(date_from.replace('Z', '+00:00')),
-                    "$lte": datetime.fromisoformat(date_to.replace('Z', '+00:00'))
-                }
+            cache_key = (
+                organization_id, date_from, date_to, granularity,
+                data_versions.get(organization_id, *INDICATOR_DEPENDENCIES)
+            )
+            cached = self.indicator_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            count = lambda match: [{"$match": match}, {"$count": "n"}] if match else [{"$count": "n"}]
+            org = {"organization_id": organization_id}
+            projects, activities, total_beneficiaries, approved, trends = await asyncio.gather(
+                self.db.projects.aggregate([
+                    {"$match": org},
+                    {"$facet": {
+                        "total": count(None),
+                        "active": count({"status": "active"}),
+                        "completed": count({"status": "completed"}),
+                        "budget": [{"$group": {"_id": None, "total": {"$sum": "$budget"}}}],
+                    }},
+                ]).to_list(1),
+                self.db.activities.aggregate([
+                    {"$match": org},
+                    {"$facet": {
+                        "total": count(None),
+                        "completed": count({"status": "completed"}),
+                        "overdue": count({"end_date": {"$lt": datetime.utcnow()}, "status": {"$ne": "completed"}}),
+                    }},
+                ]).to_list(1),
+                self.db.beneficiaries.count_documents(org),
+                # Approved spend comes from finance_rollups rather than the raw expenses
+                self.rollups.spent_by(organization_id, [], approved_only=True),
+                self._get_indicator_trends(organization_id, date_from, date_to, granularity),
+            )
+            projects = projects[0] if projects else {}
+            activities = activities[0] if activities else {}
+            scalar = lambda facet, name, field="n": facet.get(name)[0][field] if facet.get(name) else 0
 
             # Overall Performance Indicators
-            total_projects = await self.db.projects.count_documents({"organization_id": organization_id})
-            active_projects = await self.db.projects.count_documents({"organization_id": organization_id, "status": "active"})
-            completed_projects = await self.db.projects.count_documents({"organization_id": organization_id, "status": "completed"})
-            
+            total_projects = scalar(projects, "total")
+            active_projects = scalar(projects, "active")
+            completed_projects = scalar(projects, "completed")
+
             # Activity Performance
-            total_activities = await self.db.activities.count_documents({"organization_id": organization_id})
-            completed_activities = await self.db.activities.count_documents({"organization_id": organization_id, "status": "completed"})
-            overdue_activities = await self.db.activities.count_documents({
-                "organization_id": organization_id,
-                "end_date": {"$lt": datetime.utcnow()},
-                "status": {"$ne": "completed"}
-            })
-
-            # Beneficiary Impact
-            total_beneficiaries = await self.db.beneficiaries.count_documents({"organization_id": organization_id})
-            
+            total_activities = scalar(activities, "total")
+            completed_activities = scalar(activities, "completed")
+            overdue_activities = scalar(activities, "overdue")
+
             # Budget Performance
-            total_budget = 0
-            utilized_budget = 0
-            async for project in self.db.projects.find({"organization_id": organization_id}):
-                project_budget = project.get("budget", 0)
-                if isinstance(project_budget, (int, float)):
-                    total_budget += project_budget
-            
-            # Get expenses
-            async for expense in self.db.expenses.find({"organization_id": organization_id, "approval_status": "approved"}):
-                expense_amount = expense.get("amount", 0)
-                if isinstance(expense_amount, (int, float)):
-                    utilized_budget += expense_amount
+            total_budget = scalar(projects, "budget", "total")
+            utilized_budget = sum(v["spent"] for v in approved.values())
 
             # Calculate key indicators
             project_completion_rate = (completed_projects / total_projects * 100) if total_projects > 0 else 0
@@ -57,7 +123,7 @@ class KPIService:
             budget_utilization_rate = (utilized_budget / total_budget * 100) if total_budget > 0 else 0
             overdue_rate = (overdue_activities / total_activities * 100) if total_activities > 0 else 0
 
-            return {
+            result = {
                 "overview": {
                     "total_projects": total_projects,
                     "active_projects": active_projects,
@@ -74,45 +140,81 @@ class KPIService:
                     "overdue_rate": round(overdue_rate, 2),
                     "on_time_delivery_rate": round(100 - overdue_rate, 2)
                 },
-                "trends": await self._get_indicator_trends(organization_id, date_from, date_to)
+                "trends": trends
             }
+
+            self.indicator_cache.set(cache_key, result)
+            return result
         except Exception as e:
             print(f"Error getting indicator KPIs: {e}")
-            return {"overview": {}, "performance_indicators": {}, "trends": {}}
+            raise
 
-    async def _get_indicator_trends(self, organization_id: str, date_from: Optional[str], date_to: Optional[str]) -> Dict[str, Any]:
-        """Get trend data for indicators over time"""
+    async def _get_indicator_trends(
+        self,
+        organization_id: str,
+        date_from: Optional[str],
+        date_to: Optional[str],
+        granularity: str = "month"
+    ) -> Dict[str, Any]:
+        """Get project/activity creation counts per week, month or quarter in one query"""
         try:
-            # Get data for the last 6 months
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=180)
-            
-            monthly_trends = []
-            for i in range(6):
-                month_start = start_date + timedelta(days=30 * i)
-                month_end = start_date + timedelta(days=30 * (i + 1))
-                
-                # Count projects and activities for this month
-                projects_count = await self.db.projects.count_documents({
-                    "organization_id": organization_id,
-                    "created_at": {"$gte": month_start, "$lt": month_end}
-                })
-                
-                activities_count = await self.db.activities.count_documents({
-                    "organization_id": organization_id,
-                    "created_at": {"$gte": month_start, "$lt": month_end}
-                })
-                
-                monthly_trends.append({
-                    "month": month_start.strftime("%b %Y"),
-                    "projects": projects_count,
-                    "activities": activities_count
-                })
-            
-            return {"monthly_trends": monthly_trends}
+            end_date = _parse_date(date_to) if date_to else datetime.utcnow()
+            if date_from:
+                start_date = _parse_date(date_from)
+            else:
+                start_date = _bucket_start(end_date, granularity)
+                for _ in range(DEFAULT_TREND_BUCKETS - 1):
+                    start_date = _bucket_start(start_date - timedelta(days=1), granularity)
+
+            lower = _bucket_start(start_date, granularity)
+            upper = _next_bucket(_bucket_start(end_date, granularity), granularity)
+            unit, step = TREND_UNITS[granularity]
+
+            def source(flag: str) -> List[Dict[str, Any]]:
+                return [
+                    {"$match": {"organization_id": organization_id, "created_at": {"$gte": start_date, "$lte": end_date}}},
+                    {"$project": {
+                        "_id": 0,
+                        "bucket": {"$dateTrunc": {"date": "$created_at", "unit": unit, "binSize": step, "startOfWeek": "monday"}},
+                        "projects": {"$literal": 1 if flag == "projects" else 0},
+                        "activities": {"$literal": 1 if flag == "activities" else 0},
+                    }},
+                ]
+
+            pipeline = source("projects") + [
+                {"$unionWith": {"coll": "activities", "pipeline": source("activities")}},
+                {"$group": {"_id": "$bucket", "projects": {"$sum": "$projects"}, "activities": {"$sum": "$activities"}}},
+                {"$project": {"_id": 0, "bucket": "$_id", "projects": 1, "activities": 1}},
+                # Zero-fill buckets with no documents
+                {"$densify": {"field": "bucket", "range": {"step": step, "unit": unit, "bounds": [lower, upper]}}},
+                {"$project": {
+                    "bucket": 1,
+                    "projects": {"$ifNull": ["$projects", 0]},
+                    "activities": {"$ifNull": ["$activities", 0]},
+                }},
+                {"$sort": {"bucket": 1}},
+            ]
+            rows = await self.db.projects.aggregate(pipeline).to_list(None)
+            if not rows:
+                # $densify has nothing to extend when no document matched
+                rows, bucket = [], lower
+                while bucket < upper:
+                    rows.append({"bucket": bucket, "projects": 0, "activities": 0})
+                    bucket = _next_bucket(bucket, granularity)
+
+            trends = [
+                {
+                    "month": _bucket_label(row["bucket"], granularity),
+                    "period_start": row["bucket"].isoformat(),
+                    "projects": row["projects"],
+                    "activities": row["activities"]
+                }
+                for row in rows
+            ]
+            return {"granularity": granularity, "monthly_trends": trends}
         except Exception as e:
             print(f"Error getting indicator trends: {e}")
-            return {"monthly_trends": []}
+            raise
 
     # -------------------- Activity Level KPIs --------------------
     async def get_activity_kpis(self, organization_id: str, project_id: Optional[str] = None) -> Dict[str, Any]:
@@ -199,7 +301,7 @@ class KPIService:
             }
         except Exception as e:
             print(f"Error getting activity KPIs: {e}")
-            return {"activities": [], "summary": {}, "analytics": {}}
+            raise
 
     # -------------------- Project Level KPIs --------------------
     async def get_project_kpis(self, organization_id: str, project_id: Optional[str] = None) -> Dict[str, Any]:
@@ -209,34 +311,76 @@ class KPIService:
             if project_id:
                 query["id"] = project_id
 
+            # One grouped aggregation per related collection, run alongside the project fetch
+            scope = {"organization_id": organization_id}
+            if project_id:
+                scope["project_id"] = project_id
+            now = datetime.utcnow()
+            planned_end = {"$ifNull": [
+                {"$convert": {"input": "$planned_end_date", "to": "date", "onError": None, "onNull": None}},
+                {"$convert": {"input": "$end_date", "to": "date", "onError": None, "onNull": None}},
+            ]}
+            activity_pipeline = [
+                {"$match": scope},
+                {"$group": {
+                    "_id": "$project_id",
+                    "total": {"$sum": 1},
+                    "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+                    # Same rule as _is_activity_overdue
+                    "overdue": {"$sum": {"$cond": [
+                        {"$and": [
+                            {"$ne": ["$status", "completed"]},
+                            {"$ne": [planned_end, None]},
+                            {"$lt": [planned_end, now]},
+                        ]}, 1, 0
+                    ]}},
+                    "progress_sum": {"$sum": "$progress_percentage"},
+                }},
+            ]
+            beneficiary_match = {"organization_id": organization_id}
+            if project_id:
+                beneficiary_match["project_ids"] = project_id
+            beneficiary_pipeline = [
+                {"$match": beneficiary_match},
+                # Count each beneficiary once per project, like count_documents({"project_ids": ...})
+                {"$project": {"project_ids": {"$cond": [
+                    {"$isArray": "$project_ids"}, {"$setUnion": ["$project_ids"]}, ["$project_ids"]
+                ]}}},
+                {"$unwind": "$project_ids"},
+                {"$group": {"_id": "$project_ids", "count": {"$sum": 1}}},
+            ]
+            expense_pipeline = [
+                {"$match": {**scope, "approval_status": "approved"}},
+                {"$group": {"_id": "$project_id", "amount": {"$sum": "$amount"}}},
+            ]
+            project_docs, activity_rows, beneficiary_rows, expense_rows = await asyncio.gather(
+                self.db.projects.find(query).to_list(None),
+                self.db.activities.aggregate(activity_pipeline).to_list(None),
+                self.db.beneficiaries.aggregate(beneficiary_pipeline).to_list(None),
+                self.db.expenses.aggregate(expense_pipeline).to_list(None),
+            )
+            activity_stats = {row["_id"]: row for row in activity_rows}
+            beneficiaries_by_project = {row["_id"]: row["count"] for row in beneficiary_rows}
+            expenses_by_project = {row["_id"]: row["amount"] for row in expense_rows}
+
             projects = []
-            async for project in self.db.projects.find(query):
+            for project in project_docs:
                 project["_id"] = str(project.get("_id"))
                 project_id_str = project.get("id", str(project.get("_id")))
-                
-                # Get project activities
-                project_activities = []
-                async for activity in self.db.activities.find({"project_id": project_id_str}):
-                    activity["_id"] = str(activity.get("_id"))
-                    project_activities.append(activity)
-                
-                # Get project beneficiaries
-                project_beneficiaries = await self.db.beneficiaries.count_documents({"project_ids": project_id_str})
-                
-                # Get project expenses
-                project_expenses = 0
-                async for expense in self.db.expenses.find({"project_id": project_id_str, "approval_status": "approved"}):
-                    project_expenses += expense.get("amount", 0)
+
+                stats = activity_stats.get(project_id_str, {})
+                project_beneficiaries = beneficiaries_by_project.get(project_id_str, 0)
+                project_expenses = expenses_by_project.get(project_id_str, 0)
 
                 # Calculate project KPIs
-                total_activities = len(project_activities)
-                completed_activities = len([a for a in project_activities if a.get("status") == "completed"])
-                overdue_activities = len([a for a in project_activities if self._is_activity_overdue(a)])
+                total_activities = stats.get("total", 0)
+                completed_activities = stats.get("completed", 0)
+                overdue_activities = stats.get("overdue", 0)
                 
                 project_budget = project.get("budget", 0)
                 budget_utilization = (project_expenses / project_budget * 100) if project_budget > 0 else 0
                 
-                avg_activity_progress = sum(a.get("progress_percentage", 0) for a in project_activities) / total_activities if total_activities > 0 else 0
+                avg_activity_progress = stats.get("progress_sum", 0) / total_activities if total_activities > 0 else 0
                 
                 target_beneficiaries = project.get("target_beneficiaries", 0)
                 beneficiary_achievement_rate = (project_beneficiaries / target_beneficiaries * 100) if target_beneficiaries > 0 else 0
@@ -292,7 +436,7 @@ class KPIService:
             }
         except Exception as e:
             print(f"Error getting project KPIs: {e}")
-            return {"projects": [], "summary": {}, "analytics": {}}
+            raise
 
     # -------------------- Helper Methods --------------------
     def _is_activity_overdue(self, activity: Dict) -> bool:
@@ -0,0 +1,355 @@
+"""
+Shared gateway for LLM calls (finance insights, report narratives).
+
+Every call goes through LLMGateway.complete(), which:
+
+- answers from a response cache keyed by a hash of the model, the call
+  parameters and the whitespace-normalized messages; entries live in memory
+  and in the llm_cache collection (expired by a TTL index), so identical
+  dashboard refreshes and report runs skip the model entirely;
+- lets concurrent identical calls share one provider request;
+- caps concurrent provider requests per organization and overall;
+- enforces a per-call deadline and returns the caller's heuristic fallback
+  when the deadline passes, the provider fails, or no provider is configured.
+
+LLMGateway.stream() yields a completion in chunks as the provider produces
+them (cache hits arrive as a single chunk) and stores the full text in the
+same cache, so streamed and non-streamed calls share entries.
+
+The provider is chosen by LLM_PROVIDER: "emergent" (the Emergent LLM client,
+needs EMERGENT_LLM_KEY) or "stub", a deterministic local stand-in used to
+benchmark the AI paths offline. With LLM_PROVIDER unset the Emergent client is
+used when a key is configured.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import typing
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-4o")
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_MAX_CONCURRENT = int(os.environ.get("LLM_MAX_CONCURRENT", "8"))
+LLM_MAX_CONCURRENT_PER_ORG = int(os.environ.get("LLM_MAX_CONCURRENT_PER_ORG", "2"))
+LLM_DEADLINE = float(os.environ.get("LLM_DEADLINE_SECONDS", "20"))
+# Upper bound for a provider request that outlives every caller's deadline
+LLM_CALL_TIMEOUT = float(os.environ.get("LLM_CALL_TIMEOUT_SECONDS", "120"))
+LLM_STUB_LATENCY_MS = float(os.environ.get("LLM_STUB_LATENCY_MS", "0"))
+
+Messages = List[Dict[str, str]]
+
+
+class LLMUnavailable(Exception):
+    """No provider is configured or it did not start answering in time"""
+
+
+@dataclass
+class LLMResult:
+    value: Any
+    # "cache", "llm" or "fallback"
+    source: str
+    error: Optional[str] = None
+
+    @property
+    def ai_used(self) -> bool:
+        return self.source != "fallback"
+
+
+def normalize_messages(messages: Messages) -> Messages:
+    """Collapse whitespace so indentation in prompt templates does not change the key"""
+    return [{"role": m.get("role", "user"), "content": " ".join(str(m.get("content", "")).split())} for m in messages]
+
+
+def prompt_key(model: str, messages: Messages, max_tokens: Optional[int] = None,
+               temperature: Optional[float] = None, schema: Optional[type] = None) -> str:
+    payload = json.dumps({
+        "model": model,
+        "messages": normalize_messages(messages),
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "schema": schema.__name__ if schema is not None else None,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _parse(text: str, schema: Optional[type]):
+    if schema is None:
+        return text
+    text = text.strip()
+    if text.startswith("```"):
+        # Models sometimes wrap JSON in a fenced block
+        text = text.strip("`")
+        text = text[text.find("{"):]
+    return schema(**json.loads(text))
+
+
+class EmergentProvider:
+    name = "emergent"
+    # The client has no incremental API; stream() yields the whole completion at once
+    incremental = False
+
+    def __init__(self, api_key: str, model: str):
+        from emergentintegrations import LLMClient
+        self.client = LLMClient(api_key=api_key, provider="openai", model=model)
+
+    async def complete(self, messages: Messages, max_tokens: Optional[int], temperature: Optional[float], schema: Optional[type]) -> str:
+        resp = await self.client.chat(messages=messages)
+        if isinstance(resp, dict):
+            return resp.get("content") or resp.get("text") or json.dumps(resp)
+        return str(resp)
+
+    async def stream(self, messages: Messages, max_tokens: Optional[int], temperature: Optional[float]) -> AsyncIterator[str]:
+        yield await self.complete(messages, max_tokens, temperature, None)
+
+
+class StubProvider:
+    """Deterministic stand-in: the same messages always produce the same output"""
+    name = "stub"
+    incremental = True
+
+    def __init__(self, latency_ms: float = LLM_STUB_LATENCY_MS):
+        self.latency = latency_ms / 1000.0
+
+    def _value(self, annotation, name: str, digest: str):
+        origin = typing.get_origin(annotation)
+        if origin is typing.Union:
+            annotation = next(a for a in typing.get_args(annotation) if a is not type(None))
+            origin = typing.get_origin(annotation)
+        if annotation is float:
+            return round(int(digest[:4], 16) / 0xFFFF, 2)
+        if annotation is int:
+            return int(digest[:4], 16) % 100
+        if annotation is bool:
+            return int(digest[0], 16) % 2 == 0
+        if origin is list or annotation is list:
+            return [f"Stub {name.replace('_', ' ')} {i + 1} ({digest[:6]})" for i in range(3)]
+        if origin is dict or annotation is dict:
+            return {"source": "stub", "digest": digest[:12]}
+        return f"Stub {name.replace('_', ' ')} ({digest[:8]})"
+
+    async def complete(self, messages: Messages, max_tokens: Optional[int], temperature: Optional[float], schema: Optional[type]) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._text(messages, schema)
+
+    async def stream(self, messages: Messages, max_tokens: Optional[int], temperature: Optional[float]) -> AsyncIterator[str]:
+        """The complete() text word by word, with the latency spread over the words"""
+        words = self._text(messages, None).split(" ")
+        delay = self.latency / len(words)
+        for i, word in enumerate(words):
+            if delay:
+                await asyncio.sleep(delay)
+            yield word if i == 0 else " " + word
+
+    def _text(self, messages: Messages, schema: Optional[type]) -> str:
+        digest = hashlib.sha256(json.dumps(normalize_messages(messages), sort_keys=True).encode("utf-8")).hexdigest()
+        if schema is not None:
+            return json.dumps({name: self._value(field.annotation, name, digest) for name, field in schema.model_fields.items()})
+        words = sum(len(m["content"].split()) for m in messages)
+        return (
+            f"# Summary\n\nThis is a deterministic stub response ({digest[:12]}) to a {words}-word prompt.\n\n"
+            f"## Details\n\nNo language model was called; set LLM_PROVIDER to use a real provider."
+        )
+
+
+def make_provider(name: Optional[str] = None, model: str = LLM_MODEL):
+    """Provider for name (default LLM_PROVIDER), or None when no model is available"""
+    name = (name if name is not None else os.environ.get("LLM_PROVIDER", "")).lower()
+    if name == "stub":
+        return StubProvider()
+    key = os.environ.get("EMERGENT_LLM_KEY")
+    if name in ("", "emergent") and key:
+        try:
+            return EmergentProvider(key, model)
+        except Exception as e:
+            logger.warning(f"LLM provider unavailable: {str(e)}")
+    return None
+
+
+class LLMGateway:
+    _UNSET = object()
+
+    def __init__(self, db=None, provider: Any = _UNSET, model: str = LLM_MODEL,
+                 max_concurrent: int = LLM_MAX_CONCURRENT, per_org: int = LLM_MAX_CONCURRENT_PER_ORG,
+                 ttl: float = LLM_CACHE_TTL, maxsize: int = LLM_CACHE_MAX_ENTRIES):
+        self.db = db
+        self.model = model
+        self.ttl = ttl
+        self.per_org = per_org
+        self._provider = provider
+        self.cache = TTLCache(maxsize, ttl)
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._org_limits: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {"llm_calls": 0, "persistent_hits": 0, "fallbacks": 0, "timeouts": 0, "errors": 0}
+
+    @property
+    def provider(self):
+        # Resolved on first use so importing the gateway never loads an SDK
+        if self._provider is LLMGateway._UNSET:
+            self._provider = make_provider(model=self.model)
+        return self._provider
+
+    def _org_limit(self, organization_id: Optional[str]) -> asyncio.Semaphore:
+        org = organization_id or "-"
+        if org not in self._org_limits:
+            self._org_limits[org] = asyncio.Semaphore(self.per_org)
+        return self._org_limits[org]
+
+    async def _cached(self, key: str) -> Optional[str]:
+        text = self.cache.get(key)
+        if text is not None or self.db is None:
+            return text
+        try:
+            doc = await self.db.llm_cache.find_one({"key": key, "expires_at": {"$gt": datetime.utcnow()}}, {"_id": 0, "text": 1})
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {str(e)}")
+            return None
+        if doc:
+            self.counters["persistent_hits"] += 1
+            self.cache.set(key, doc["text"])
+            return doc["text"]
+        return None
+
+    async def _store(self, key: str, text: str):
+        self.cache.set(key, text)
+        if self.db is None:
+            return
+        now = datetime.utcnow()
+        try:
+            await self.db.llm_cache.update_one(
+                {"key": key},
+                {"$set": {"key": key, "model": self.model, "text": text, "created_at": now,
+                          "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {str(e)}")
+
+    async def _call(self, key: str, organization_id: Optional[str], messages: Messages,
+                    max_tokens: Optional[int], temperature: Optional[float], schema: Optional[type]):
+        async with self._org_limit(organization_id), self._global:
+            self.counters["llm_calls"] += 1
+            text = await asyncio.wait_for(
+                self.provider.complete(messages, max_tokens, temperature, schema), LLM_CALL_TIMEOUT
+            )
+        value = _parse(text, schema)
+        await self._store(key, text)
+        return value
+
+    def _shared_call(self, key: str, *args) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._call(key, *args))
+            self._inflight[key] = task
+
+            def done(t: asyncio.Task):
+                self._inflight.pop(key, None)
+                if not t.cancelled():
+                    t.exception()  # retrieved even when every caller gave up
+            task.add_done_callback(done)
+        return task
+
+    async def complete(self, organization_id: Optional[str], messages: Messages, *,
+                       fallback: Callable[[], Any], schema: Optional[type] = None,
+                       deadline: float = LLM_DEADLINE, max_tokens: Optional[int] = None,
+                       temperature: Optional[float] = None) -> LLMResult:
+        """
+        Model output for messages, parsed into schema when given, or the value
+        of fallback() if no answer is available within deadline seconds
+        """
+        key = prompt_key(self.model, messages, max_tokens, temperature, schema)
+        started = time.monotonic()
+        try:
+            text = await self._cached(key)
+            if text is not None:
+                return LLMResult(_parse(text, schema), "cache")
+        except Exception as e:
+            # A cached answer that no longer fits the schema is ignored
+            logger.warning(f"Discarding cached LLM response: {str(e)}")
+
+        if self.provider is None:
+            self.counters["fallbacks"] += 1
+            return LLMResult(fallback(), "fallback", "No LLM provider configured")
+
+        task = self._shared_call(key, organization_id, messages, max_tokens, temperature, schema)
+        remaining = max(0.0, deadline - (time.monotonic() - started))
+        try:
+            value = await asyncio.wait_for(asyncio.shield(task), remaining)
+            return LLMResult(value, "llm")
+        except asyncio.TimeoutError:
+            # The shared request keeps running and fills the cache for the next caller
+            self.counters["timeouts"] += 1
+            error = f"No LLM response within {deadline:.0f}s"
+        except Exception as e:
+            self.counters["errors"] += 1
+            error = str(e) or type(e).__name__
+            logger.warning(f"LLM call failed: {error}")
+        self.counters["fallbacks"] += 1
+        return LLMResult(fallback(), "fallback", error)
+
+    async def stream(self, organization_id: Optional[str], messages: Messages, *,
+                     first_chunk_deadline: float = LLM_DEADLINE, deadline: float = LLM_DEADLINE,
+                     max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Completion chunks as they arrive. Raises LLMUnavailable when no
+        provider is configured or nothing arrives within first_chunk_deadline.
+        Providers without incremental output answer in one chunk, awaited for
+        up to deadline seconds
+        """
+        key = prompt_key(self.model, messages, max_tokens, temperature)
+        cached = await self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+        if self.provider is None:
+            self.counters["fallbacks"] += 1
+            raise LLMUnavailable("No LLM provider configured")
+
+        if not getattr(self.provider, "incremental", True):
+            # The whole answer arrives at once: share the call with complete() so a
+            # late answer still fills the cache for the next request
+            task = self._shared_call(key, organization_id, messages, max_tokens, temperature, None)
+            try:
+                text = await asyncio.wait_for(asyncio.shield(task), deadline)
+            except asyncio.TimeoutError:
+                self.counters["timeouts"] += 1
+                self.counters["fallbacks"] += 1
+                raise LLMUnavailable(f"No LLM response within {deadline:.0f}s")
+            yield text
+            return
+
+        parts: List[str] = []
+        async with self._org_limit(organization_id), self._global:
+            self.counters["llm_calls"] += 1
+            chunks = self.provider.stream(messages, max_tokens, temperature).__aiter__()
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), first_chunk_deadline)
+            except StopAsyncIteration:
+                first = ""
+            except asyncio.TimeoutError:
+                self.counters["timeouts"] += 1
+                self.counters["fallbacks"] += 1
+                raise LLMUnavailable(f"No LLM response within {first_chunk_deadline:.0f}s")
+            parts.append(first)
+            yield first
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        await self._store(key, "".join(parts))
+
+    def stats(self) -> Dict[str, Any]:
+        provider = self._provider
+        name = None if provider is LLMGateway._UNSET or provider is None else provider.name
+        return {**self.cache.stats(), **self.counters, "in_flight": len(self._inflight), "provider": name, "model": self.model}
@@ -104,6 +104,7 @@ class TokenData(SafeModel):
     user_id: str
     organization_id: Optional[str] = None
     role: Optional[UserRole] = None
+    exp: Optional[int] = None
 
 # -------------------- Projects --------------------
 class Project(SafeModel):
@@ -703,4 +704,18 @@ class DocumentUpload(SafeModel):
     content: str
     content_type: str
     size: int
-    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+# -------------------- Reporting Models --------------------
+class ProjectReportRequest(SafeModel):
+    project_id: str
+    report_type: str = 'monthly'
+    period_start: datetime
+    period_end: datetime
+    include_images: bool = True
+    ai_narrative: bool = True
+
+class NarrativeRequest(SafeModel):
+    project_id: str
+    report_type: str = 'monthly'
+    period_start: datetime
+    period_end: datetime
@@ -0,0 +1,229 @@
+"""
+Streamed report narratives, persisted as they are generated.
+
+A narrative is identified by the hash of its prompt, so the same project data
+for the same report type and period maps to one report_narratives document.
+Opening a narrative either replays a completed document, attaches to a
+generation already in progress, or claims the document and starts generating
+it in a background task that is independent of the client connection.
+
+Generated text is kept in memory for readers in this process and flushed to
+the document every NARRATIVE_FLUSH_SECONDS, refreshing a lease. Readers in
+other processes poll the document. Events are numbered "<generation>:<offset>";
+a client that reconnects with Last-Event-ID continues from its offset, or is
+told to reset if the narrative had to be regenerated since. A generation whose
+lease expired (its process died) is restarted by the next open().
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from llm_gateway import LLM_DEADLINE, LLMGateway, LLMUnavailable, prompt_key
+
+logger = logging.getLogger(__name__)
+
+NARRATIVE_FLUSH_SECONDS = float(os.environ.get("NARRATIVE_FLUSH_SECONDS", "0.5"))
+NARRATIVE_LEASE_SECONDS = float(os.environ.get("NARRATIVE_LEASE_SECONDS", "30"))
+NARRATIVE_FIRST_CHUNK_DEADLINE = float(os.environ.get("NARRATIVE_FIRST_CHUNK_DEADLINE_SECONDS", "20"))
+NARRATIVE_POLL_SECONDS = 0.5
+# Idle streams send an SSE comment this often so proxies keep them open
+HEARTBEAT_SECONDS = 15.0
+
+NARRATIVE_PROJECTION = {"_id": 0, "key": 0}
+
+
+def parse_event_id(last_event_id: Optional[str]) -> Tuple[int, int]:
+    """(generation, offset) from a Last-Event-ID header; (0, 0) when absent or malformed"""
+    try:
+        generation, offset = (last_event_id or "").split(":")
+        return int(generation), int(offset)
+    except ValueError:
+        return 0, 0
+
+
+class _Live:
+    """Text of a generation running in this process, with a condition readers wait on"""
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.text = ""
+        self.done = False
+        self.changed = asyncio.Condition()
+
+    async def append(self, chunk: str = "", done: bool = False):
+        async with self.changed:
+            self.text += chunk
+            self.done = self.done or done
+            self.changed.notify_all()
+
+
+class NarrativeStreams:
+    def __init__(self, db, llm: LLMGateway, params: Optional[Dict[str, Any]] = None, deadline: float = LLM_DEADLINE):
+        self.db = db
+        self.llm = llm
+        # max_tokens / temperature, shared with the non-streaming path so both hit one cache entry
+        self.params = params or {}
+        # Wait for providers that deliver the whole narrative at once
+        self.deadline = deadline
+        self.owner = uuid.uuid4().hex
+        self._live: Dict[str, _Live] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def open(self, organization_id: str, project_id: str, report_type: str, period_start: datetime,
+                   period_end: datetime, messages, fallback: Callable[[], str]) -> Dict[str, Any]:
+        """Find or create the narrative for messages and make sure it is being generated"""
+        key = prompt_key(self.llm.model, messages, self.params.get("max_tokens"), self.params.get("temperature"))
+        now = datetime.utcnow()
+        for attempt in range(2):
+            try:
+                doc = await self.db.report_narratives.find_one_and_update(
+                    {"organization_id": organization_id, "key": key},
+                    {"$setOnInsert": {
+                        "id": str(uuid.uuid4()), "organization_id": organization_id, "key": key,
+                        "project_id": project_id, "report_type": report_type,
+                        "period_start": period_start, "period_end": period_end,
+                        "status": "pending", "text": "", "generation": 0, "source": None,
+                        "error": None, "created_at": now, "updated_at": now,
+                    }},
+                    upsert=True,
+                    projection=NARRATIVE_PROJECTION,
+                    return_document=ReturnDocument.AFTER,
+                )
+                break
+            except DuplicateKeyError:
+                # A concurrent open() inserted it first
+                if attempt:
+                    raise
+        if doc["status"] == "completed" or doc["id"] in self._live:
+            return doc
+
+        # Claim the generation unless another live process holds it
+        claimed = await self.db.report_narratives.find_one_and_update(
+            {"id": doc["id"], "$or": [
+                {"status": {"$in": ["pending", "failed"]}},
+                {"status": "streaming", "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": "streaming", "text": "", "error": None, "owner": self.owner, "updated_at": now,
+                      "lease_until": now + timedelta(seconds=NARRATIVE_LEASE_SECONDS)},
+             "$inc": {"generation": 1}},
+            projection=NARRATIVE_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        if claimed is None:
+            return await self.db.report_narratives.find_one({"id": doc["id"]}, NARRATIVE_PROJECTION)
+
+        live = _Live(claimed["generation"])
+        self._live[claimed["id"]] = live
+        task = asyncio.create_task(self._generate(claimed["id"], organization_id, live, messages, fallback))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return claimed
+
+    async def get(self, organization_id: str, narrative_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.report_narratives.find_one({"organization_id": organization_id, "id": narrative_id}, NARRATIVE_PROJECTION)
+
+    async def _flush(self, narrative_id: str, live: _Live, **fields):
+        now = datetime.utcnow()
+        await self.db.report_narratives.update_one(
+            {"id": narrative_id, "owner": self.owner, "generation": live.generation},
+            {"$set": {"text": live.text, "updated_at": now,
+                      "lease_until": now + timedelta(seconds=NARRATIVE_LEASE_SECONDS), **fields}},
+        )
+
+    async def _generate(self, narrative_id: str, organization_id: str, live: _Live, messages, fallback: Callable[[], str]):
+        loop = asyncio.get_running_loop()
+        source = "llm"
+        try:
+            try:
+                flushed_at = loop.time()
+                chunks = self.llm.stream(organization_id, messages, first_chunk_deadline=NARRATIVE_FIRST_CHUNK_DEADLINE,
+                                         deadline=self.deadline, **self.params)
+                async for chunk in chunks:
+                    await live.append(chunk)
+                    if loop.time() - flushed_at >= NARRATIVE_FLUSH_SECONDS:
+                        await self._flush(narrative_id, live)
+                        flushed_at = loop.time()
+            except LLMUnavailable as e:
+                logger.warning(f"Narrative {narrative_id} uses the basic narrative: {str(e)}")
+                source = "fallback"
+                await live.append(fallback())
+            await self._flush(narrative_id, live, status="completed", source=source)
+        except Exception as e:
+            logger.error(f"Narrative {narrative_id} failed: {str(e)}")
+            try:
+                await self._flush(narrative_id, live, status="failed", error=str(e))
+            except Exception:
+                pass
+        finally:
+            await live.append(done=True)
+            self._live.pop(narrative_id, None)
+
+    async def events(self, organization_id: str, narrative_id: str, last_event_id: Optional[str] = None) -> AsyncIterator[Tuple[str, Any, Optional[str]]]:
+        """
+        (event, data, event_id) tuples: "chunk" with the next piece of text,
+        "reset" when the client's text belongs to an older generation,
+        "heartbeat" while waiting, and finally "done" or "error"
+        """
+        generation, offset = parse_event_id(last_event_id)
+        while True:
+            live = self._live.get(narrative_id)
+            if live is not None:
+                if generation and generation != live.generation:
+                    yield "reset", {"generation": live.generation}, None
+                    offset = 0
+                generation = live.generation
+                async with live.changed:
+                    try:
+                        await asyncio.wait_for(
+                            live.changed.wait_for(lambda: len(live.text) > offset or live.done), HEARTBEAT_SECONDS
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    text, finished = live.text, live.done
+                if len(text) <= offset and not finished:
+                    yield "heartbeat", None, None
+                    continue
+                if len(text) > offset:
+                    yield "chunk", text[offset:], f"{generation}:{len(text)}"
+                    offset = len(text)
+                if not finished:
+                    continue
+                # Final status is read from the document below
+
+            doc = await self.get(organization_id, narrative_id)
+            if doc is None:
+                yield "error", {"error": "Narrative not found"}, None
+                return
+            if generation and generation != doc["generation"]:
+                yield "reset", {"generation": doc["generation"]}, None
+                offset = 0
+            generation = doc["generation"]
+            text = doc.get("text") or ""
+            if len(text) > offset:
+                yield "chunk", text[offset:], f"{generation}:{len(text)}"
+                offset = len(text)
+            if doc["status"] == "completed":
+                yield "done", {"length": offset, "source": doc.get("source")}, None
+                return
+            if doc["status"] == "failed":
+                yield "error", {"error": doc.get("error") or "Narrative generation failed"}, None
+                return
+            if doc["status"] == "streaming" and doc.get("lease_until") and doc["lease_until"] < datetime.utcnow() and narrative_id not in self._live:
+                yield "error", {"error": "Narrative generation was interrupted; open it again to restart it"}, None
+                return
+            if narrative_id not in self._live:
+                # Generated by another process: follow its flushes
+                await asyncio.sleep(NARRATIVE_POLL_SECONDS)
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
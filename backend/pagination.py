@@ -0,0 +1,172 @@
+"""
+Shared pagination helpers for list endpoints.
+
+Two modes are supported:
+- page/page_size (offset pagination, kept for backward compatibility)
+- cursor (keyset pagination on the sort key plus _id)
+
+The cursor is an opaque URL-safe token; clients pass back the `next_cursor`
+of the previous response. The total can be skipped entirely ("off"), capped
+("estimated") or counted exactly ("exact").
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import Binary, Decimal128, Int64, ObjectId, Regex, Timestamp, json_util
+
+TOTAL_MODES = ("off", "estimated", "exact")
+
+# Upper bound for "estimated" totals; counting stops once this many match
+ESTIMATE_LIMIT = 10000
+
+# $type aliases of the BSON comparison brackets, in MongoDB sort order.
+# Null and missing sort first and are matched with {field: None}.
+TYPE_BRACKETS = (
+    None,
+    ["number"],
+    ["string", "symbol"],
+    ["object"],
+    ["binData"],
+    ["objectId"],
+    ["bool"],
+    ["date"],
+    ["timestamp"],
+    ["regex"],
+)
+
+
+def _type_bracket(value: Any) -> int:
+    """Index into TYPE_BRACKETS of a decoded cursor value"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 6
+    if isinstance(value, (int, float, Int64, Decimal128)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, (bytes, Binary)):
+        return 4
+    if isinstance(value, ObjectId):
+        return 5
+    if isinstance(value, datetime):
+        return 7
+    if isinstance(value, Timestamp):
+        return 8
+    if isinstance(value, Regex):
+        return 9
+    raise ValueError("Invalid pagination cursor")
+
+
+def encode_cursor(sort_value: Any, doc_id: Any) -> str:
+    """Encode the sort key and _id of the last returned document"""
+    raw = json_util.dumps({"v": sort_value, "id": doc_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return data["v"], data["id"]
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+def keyset_filter(query: Dict[str, Any], sort_field: str, direction: int, cursor: str) -> Dict[str, Any]:
+    """
+    Restrict query to documents strictly after the cursor position.
+
+    $lt/$gt only compare values of the same BSON type, so documents whose
+    sort key is null, missing or of another type (e.g. dates stored as
+    strings) are matched by type bracket, following the sort order.
+    """
+    value, last_id = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    bracket = _type_bracket(value)
+    later = range(bracket) if direction < 0 else range(bracket + 1, len(TYPE_BRACKETS))
+
+    branches = [{sort_field: value, "_id": {op: last_id}}]
+    if bracket:
+        branches.append({sort_field: {op: value}})
+    types = [alias for i in later if i for alias in TYPE_BRACKETS[i]]
+    if types:
+        branches.append({sort_field: {"$type": types}})
+    if direction < 0 and bracket:
+        branches.append({sort_field: None})
+    after = {"$or": branches}
+    if not query:
+        return after
+    return {"$and": [query, after]}
+
+
+async def count_total(collection, query: Dict[str, Any], mode: str) -> Tuple[Optional[int], bool]:
+    """Return (total, is_estimate) according to the requested total mode"""
+    if mode == "off":
+        return None, False
+    if mode == "estimated":
+        total = await collection.count_documents(query, limit=ESTIMATE_LIMIT)
+        return total, total >= ESTIMATE_LIMIT
+    return await collection.count_documents(query), False
+
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    sort_field: str,
+    direction: int = -1,
+    page: int = 1,
+    page_size: int = 20,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch one page of raw documents.
+
+    With a cursor the page is located by keyset instead of skip(). When
+    `total` is not given, page mode counts exactly (previous behaviour) and
+    cursor mode skips the count.
+    """
+    page = max(page, 1)
+    page_size = max(page_size, 1)
+    if total is None:
+        total = "off" if cursor else "exact"
+    if total not in TOTAL_MODES:
+        raise ValueError(f"total must be one of {', '.join(TOTAL_MODES)}")
+
+    find_query = keyset_filter(query, sort_field, direction, cursor) if cursor else query
+    sort_spec = [(sort_field, direction), ("_id", direction)]
+
+    # Fetch one extra document to know whether another page exists
+    db_cursor = collection.find(find_query, projection).sort(sort_spec)
+    if not cursor:
+        db_cursor = db_cursor.skip((page - 1) * page_size)
+    docs: List[Dict[str, Any]] = await db_cursor.limit(page_size + 1).to_list(page_size + 1)
+
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last.get("_id"))
+
+    total_count, is_estimate = await count_total(collection, query, total)
+    return {
+        "docs": docs,
+        "total": total_count,
+        "total_is_estimate": is_estimate,
+        "page": None if cursor else page,
+        "page_size": page_size,
+        "total_pages": (total_count + page_size - 1) // page_size if total_count is not None else None,
+        "next_cursor": next_cursor,
+    }
+
+
+def page_metadata(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Response metadata of a paginate() result, without the raw documents"""
+    return {k: v for k, v in result.items() if k != "docs"}
@@ -1,4 +1,5 @@
 import os
+import asyncio
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import uuid
@@ -14,6 +15,20 @@ from models import (
     ProjectDocument, ProjectDocumentCreate, ProjectDocumentUpdate,
     ProjectDashboardData, User
 )
+from pagination import paginate, page_metadata
+from data_versions import data_versions
+import beneficiary_search
+import beneficiary_geo
+
+
+def _facet_count(rows: List[Dict[str, Any]]) -> int:
+    """Value of a {"$count": "n"} facet, which is empty when nothing matched"""
+    return rows[0]["n"] if rows else 0
+
+
+def _round_or_zero(value: Optional[float]) -> float:
+    return round(value, 1) if value is not None else 0
+
 
 class ProjectService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -28,6 +43,7 @@ class ProjectService:
         project_dict["updated_at"] = datetime.utcnow()
         
         result = await self.db.projects.insert_one(project_dict)
+        data_versions.bump(organization_id, "projects")
         project_dict["_id"] = str(result.inserted_id)
         
         return Project(**project_dict)
@@ -66,7 +82,9 @@ class ProjectService:
         )
         
         if result.modified_count:
-            return await self.get_project(project_id)
+            project = await self.get_project(project_id)
+            data_versions.bump(project.organization_id if project else None, "projects")
+            return project
         return None
 
     async def delete_project(self, project_id: str) -> bool:
@@ -78,8 +96,10 @@ class ProjectService:
         await self.db.project_documents.delete_many({"project_id": project_id})
         
         # Delete the project
-        result = await self.db.projects.delete_one({"_id": ObjectId(project_id)})
-        return result.deleted_count > 0
+        project = await self.db.projects.find_one_and_delete({"_id": ObjectId(project_id)})
+        if project:
+            data_versions.bump(project.get("organization_id"), "projects", "activities", "budget_items", "kpi_indicators")
+        return project is not None
 
     # Activity Management
     async def create_activity(self, activity_data: ActivityCreate, organization_id: str, creator_id: str) -> Activity:
@@ -98,6 +118,7 @@ class ProjectService:
         activity_dict["updated_at"] = datetime.utcnow()
         
         result = await self.db.activities.insert_one(activity_dict)
+        data_versions.bump(organization_id, "activities")
         activity_dict["_id"] = str(result.inserted_id)
         # Ensure id field for response matching Activity model expectations
         if "id" not in activity_dict:
@@ -105,19 +126,15 @@ class ProjectService:
         
         return Activity(**activity_dict)
 
-    async def get_activities(self, organization_id: str, project_id: Optional[str] = None, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
-        """Get activities for an organization or project with pagination"""
+    async def get_activities(self, organization_id: str, project_id: Optional[str] = None, page: int = 1, page_size: int = 20, cursor: Optional[str] = None, total: Optional[str] = None) -> Dict[str, Any]:
+        """Get activities for an organization or project with page or cursor pagination"""
         query = {"organization_id": organization_id}
         if project_id:
             query["project_id"] = project_id
         
-        # Count total for pagination metadata
-        total = await self.db.activities.count_documents(query)
-        
-        # Apply pagination
-        cursor = self.db.activities.find(query).sort("start_date", 1).skip((page - 1) * page_size).limit(page_size)
+        result = await paginate(self.db.activities, query, "start_date", 1, page, page_size, cursor, total)
         activities = []
-        async for doc in cursor:
+        for doc in result["docs"]:
             # Normalize fields for backward compatibility
             doc["_id"] = str(doc.get("_id", doc.get("id", "")))
             doc["id"] = doc.get("id") or doc.get("_id") or str(uuid.uuid4())
@@ -129,13 +146,7 @@ class ProjectService:
             doc["schedule_variance_days"] = doc.get("schedule_variance_days", 0)
             activities.append(Activity(**doc))
         
-        return {
-            'items': activities,
-            'total': total,
-            'page': page,
-            'page_size': page_size,
-            'total_pages': (total + page_size - 1) // page_size
-        }
+        return {'items': activities, **page_metadata(result)}
 
     async def update_activity(self, activity_id: str, updates: ActivityUpdate) -> Optional[Activity]:
         """Update an activity. Supports lookup by Mongo _id or UUID id."""
@@ -157,6 +168,7 @@ class ProjectService:
             # Re-fetch using same query
             doc = await self.db.activities.find_one(query)
             if doc:
+                data_versions.bump(doc.get("organization_id"), "activities")
                 # Normalize fields for Activity model
                 doc["_id"] = str(doc.get("_id", doc.get("id", "")))
                 doc["id"] = doc.get("id") or doc.get("_id") or str(uuid.uuid4())
@@ -179,6 +191,7 @@ class ProjectService:
         budget_dict["updated_at"] = datetime.utcnow()
         
         result = await self.db.budget_items.insert_one(budget_dict)
+        data_versions.bump(organization_id, "budget_items")
         budget_dict["_id"] = str(result.inserted_id)
         
         return BudgetItem(**budget_dict)
@@ -234,6 +247,7 @@ class ProjectService:
         kpi_dict["updated_at"] = datetime.utcnow()
         
         result = await self.db.kpi_indicators.insert_one(kpi_dict)
+        data_versions.bump(organization_id, "kpi_indicators")
         kpi_dict["_id"] = str(result.inserted_id)
         
         return KPIIndicator(**kpi_dict)
@@ -261,6 +275,7 @@ class ProjectService:
         if result.modified_count:
             doc = await self.db.kpi_indicators.find_one({"_id": ObjectId(indicator_id)})
             if doc:
+                data_versions.bump(doc.get("organization_id"), "kpi_indicators")
                 doc["_id"] = str(doc["_id"])
                 return KPIIndicator(**doc)
         return None
@@ -281,7 +296,8 @@ class ProjectService:
         beneficiary_dict["created_at"] = datetime.utcnow()
         beneficiary_dict["updated_at"] = datetime.utcnow()
         
-        result = await self.db.beneficiaries.insert_one(beneficiary_dict)
+        result = await self.db.beneficiaries.insert_one({**beneficiary_dict, **beneficiary_search.search_fields(beneficiary_dict), **beneficiary_geo.geo_fields(beneficiary_dict)})
+        data_versions.bump(organization_id, "beneficiaries")
         beneficiary_dict["_id"] = str(result.inserted_id)
         
         return Beneficiary(**beneficiary_dict)
@@ -296,7 +312,7 @@ class ProjectService:
         total = await self.db.beneficiaries.count_documents(query)
         
         # Apply pagination
-        cursor = self.db.beneficiaries.find(query).sort("name", 1).skip((page - 1) * page_size).limit(page_size)
+        cursor = self.db.beneficiaries.find(query, beneficiary_geo.HIDE_DERIVED_FIELDS).sort("name", 1).skip((page - 1) * page_size).limit(page_size)
         beneficiaries = []
         async for doc in cursor:
             doc["_id"] = str(doc["_id"])
@@ -387,201 +403,57 @@ class ProjectService:
 
     # Dashboard Data
     async def get_dashboard_data(self, organization_id: str) -> ProjectDashboardData:
-        """Get comprehensive dashboard data for projects"""
-        # Project counts
-        total_projects = await self.db.projects.count_documents({"organization_id": organization_id})
-        active_projects = await self.db.projects.count_documents({
-            "organization_id": organization_id,
-            "status": ProjectStatus.ACTIVE
-        })
-        completed_projects = await self.db.projects.count_documents({
-            "organization_id": organization_id,
-            "status": ProjectStatus.COMPLETED
-        })
-        
-        # Budget calculations
-        total_budget = 0
-        budget_utilized = 0
-        projects_cursor = self.db.projects.find({"organization_id": organization_id})
-        async for project in projects_cursor:
-            total_budget += project.get("budget_total", 0)
-            budget_utilized += project.get("budget_utilized", 0)
-        
+        """Get comprehensive dashboard data for projects (one $facet round trip per collection)"""
+        current_date = datetime.utcnow()
+        six_months_ago = current_date - timedelta(days=180)
+
+        projects, activities, kpis, budget, total_beneficiaries = await asyncio.gather(
+            self._projects_dashboard_facet(organization_id, current_date),
+            self._activities_dashboard_facet(organization_id, current_date),
+            self._kpis_dashboard_facet(organization_id, six_months_ago),
+            self._budget_dashboard_facet(organization_id, six_months_ago),
+            self.db.beneficiaries.count_documents({"organization_id": organization_id}),
+        )
+
+        # Project counts and budget
+        projects_by_status = {
+            str(item["_id"]) if item["_id"] is not None else "unknown": item["count"]
+            for item in projects["by_status"]
+        }
+        total_projects = sum(projects_by_status.values())
+        active_projects = projects_by_status.get(ProjectStatus.ACTIVE.value, 0)
+        completed_projects = projects_by_status.get(ProjectStatus.COMPLETED.value, 0)
+        total_closed_projects = completed_projects + projects_by_status.get("cancelled", 0)
+
+        budget_totals = projects["budget"][0] if projects["budget"] else {}
+        total_budget = budget_totals.get("total_budget", 0)
+        budget_utilized = budget_totals.get("budget_utilized", 0)
         utilization_rate = (budget_utilized / total_budget * 100) if total_budget > 0 else 0
-        
-        # Beneficiary calculations
-        total_beneficiaries = 0
-        beneficiaries_reached = 0
-        beneficiaries_cursor = self.db.beneficiaries.find({"organization_id": organization_id})
-        async for _ in beneficiaries_cursor:
-            total_beneficiaries += 1
-            beneficiaries_reached += 1  # Assume all registered beneficiaries are reached
-        
+
         # KPI performance - average achievement rate
-        kpi_pipeline = [
-            {"$match": {"organization_id": organization_id}},
-            {"$addFields": {
-                "achievement_rate": {
-                    "$cond": [
-                        {"$and": [{"$ne": ["$target_value", None]}, {"$gt": ["$target_value", 0]}]},
-                        {"$multiply": [{"$divide": ["$current_value", "$target_value"]}, 100]},
-                        0
-                    ]
-                }
-            }},
-            {"$group": {
-                "_id": None,
-                "avg_achievement": {"$avg": "$achievement_rate"}
-            }}
-        ]
-        
-        kpi_result = await self.db.kpi_indicators.aggregate(kpi_pipeline).to_list(1)
-        kpi_achievement_rate = kpi_result[0]["avg_achievement"] if kpi_result and kpi_result[0]["avg_achievement"] is not None else 0
-        
-        # Budget by category
-        budget_pipeline = [
-            {"$match": {"organization_id": organization_id}},
-            {"$group": {
-                "_id": "$category",
-                "total": {"$sum": "$budgeted_amount"}
-            }}
-        ]
-        
-        budget_category_result = await self.db.budget_entries.aggregate(budget_pipeline).to_list(100)
+        kpi_overall = kpis["overall"][0] if kpis["overall"] else {}
+        kpi_achievement_rate = kpi_overall.get("avg_achievement") or 0
+
         budget_by_category = {
-            str(item["_id"]) if item["_id"] is not None else "uncategorized": item["total"] 
-            for item in budget_category_result
+            str(item["_id"]) if item["_id"] is not None else "uncategorized": item["total"]
+            for item in budget["by_category"]
         }
-        
-        # Projects by status
-        status_pipeline = [
-            {"$match": {"organization_id": organization_id}},
-            {"$group": {
-                "_id": "$status",
-                "count": {"$sum": 1}
-            }}
-        ]
-        
-        status_result = await self.db.projects.aggregate(status_pipeline).to_list(100)
-        projects_by_status = {
-            str(item["_id"]) if item["_id"] is not None else "unknown": item["count"] 
-            for item in status_result
-        }
-        
-        # Recent activities
-        recent_activities_cursor = self.db.activities.find(
-            {"organization_id": organization_id}
-        ).sort("updated_at", -1).limit(5)
-        
+
         recent_activities = []
-        async for activity in recent_activities_cursor:
+        for activity in activities["recent"]:
+            updated_at = activity.get("updated_at") or current_date
             recent_activities.append({
                 "id": str(activity.get("_id", activity.get("id", ""))),
                 "name": activity.get("name", "Unknown Activity"),
                 "status": activity.get("status", "unknown"),
                 "progress": activity.get("progress_percentage", 0),
-                "updated_at": activity.get("updated_at", datetime.utcnow()).isoformat()
+                "updated_at": updated_at.isoformat() if isinstance(updated_at, datetime) else str(updated_at)
             })
-        
-        # Calculate overdue activities
-        current_date = datetime.utcnow()
-        overdue_activities = await self.db.activities.count_documents({
-            "organization_id": organization_id,
-            "end_date": {"$lt": current_date},
-            "status": {"$ne": "completed"}
-        })
-        
-        # Calculate advanced analytics
-        activity_insights = await self._calculate_activity_insights(organization_id)
-        performance_trends = await self._calculate_performance_trends(organization_id)
-        risk_indicators = await self._calculate_risk_indicators(organization_id, current_date)
-        completion_analytics = await self._calculate_completion_analytics(organization_id)
-        
-        return ProjectDashboardData(
-            total_projects=total_projects,
-            active_projects=active_projects,
-            completed_projects=completed_projects,
-            total_budget=total_budget,
-            budget_utilized=budget_utilized,
-            utilization_rate=utilization_rate,
-            budget_utilization=utilization_rate,  # Same as utilization_rate for frontend compatibility
-            total_beneficiaries=total_beneficiaries,
-            beneficiaries_reached=beneficiaries_reached,
-            kpi_achievement_rate=kpi_achievement_rate,
-            kpi_performance={"average_achievement": kpi_achievement_rate},  # Structured for frontend
-            overdue_activities=overdue_activities,
-            recent_activities=recent_activities,
-            budget_by_category=budget_by_category,
-            projects_by_status=projects_by_status,
-            activity_insights=activity_insights,
-            performance_trends=performance_trends,
-            risk_indicators=risk_indicators,
-            completion_analytics=completion_analytics
-        )
 
-    async def _calculate_activity_insights(self, organization_id: str) -> Dict[str, Any]:
-        """Calculate insights from activity progress"""
-        
-        # Activity completion rates by status
-        activity_pipeline = [
-            {"$match": {"organization_id": organization_id}},
-            {"$group": {
-                "_id": "$status",
-                "count": {"$sum": 1},
-                "avg_progress": {"$avg": "$progress_percentage"},
-                "total_budget": {"$sum": "$budget_allocated"}
-            }}
-        ]
-        
-        activity_stats = await self.db.activities.aggregate(activity_pipeline).to_list(100)
-        
-        # Weekly activity completion trend (last 8 weeks)
-        eight_weeks_ago = datetime.utcnow() - timedelta(weeks=8)
-        completion_trend_pipeline = [
-            {"$match": {
-                "organization_id": organization_id,
-                "updated_at": {"$gte": eight_weeks_ago},
-                "status": "completed"
-            }},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$updated_at"},
-                    "week": {"$week": "$updated_at"}
-                },
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id.year": 1, "_id.week": 1}}
-        ]
-        
-        completion_trend = await self.db.activities.aggregate(completion_trend_pipeline).to_list(100)
-        
-        # Activity efficiency (avg days to complete)
-        efficiency_pipeline = [
-            {"$match": {
-                "organization_id": organization_id,
-                "status": "completed",
-                "start_date": {"$exists": True},
-                "end_date": {"$exists": True}
-            }},
-            {"$addFields": {
-                "completion_days": {
-                    "$divide": [
-                        {"$subtract": ["$end_date", "$start_date"]},
-                        86400000  # Convert milliseconds to days
-                    ]
-                }
-            }},
-            {"$group": {
-                "_id": None,
-                "avg_completion_days": {"$avg": "$completion_days"},
-                "median_completion_days": {"$push": "$completion_days"}
-            }}
-        ]
-        
-        efficiency_result = await self.db.activities.aggregate(efficiency_pipeline).to_list(1)
-        avg_completion_days = efficiency_result[0]["avg_completion_days"] if efficiency_result else 0
-        
-        return {
+        activity_stats = activities["by_status"]
+        efficiency = activities["efficiency"][0] if activities["efficiency"] else {}
+        avg_completion_days = efficiency.get("avg_completion_days") or 0
+        activity_insights = {
             "activity_status_breakdown": {
                 item["_id"] if item["_id"] else "unknown": {
                     "count": item["count"],
@@ -595,217 +467,220 @@ class ProjectService:
                     "week": f"{item['_id']['year']}-W{item['_id']['week']}",
                     "completed": item["count"]
                 }
-                for item in completion_trend
+                for item in activities["completion_trend"]
             ],
             "avg_completion_days": round(avg_completion_days, 1) if avg_completion_days else 0,
             "total_activities": sum(item["count"] for item in activity_stats)
         }
 
-    async def _calculate_performance_trends(self, organization_id: str) -> Dict[str, Any]:
-        """Calculate performance trends over time"""
-        
-        # Monthly budget utilization trend (last 6 months)
-        six_months_ago = datetime.utcnow() - timedelta(days=180)
-        
-        budget_trend_pipeline = [
-            {"$match": {
-                "organization_id": organization_id,
-                "created_at": {"$gte": six_months_ago}
-            }},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$created_at"},
-                    "month": {"$month": "$created_at"}
-                },
-                "total_spent": {"$sum": "$budgeted_amount"}
-            }},
-            {"$sort": {"_id.year": 1, "_id.month": 1}}
-        ]
-        
-        budget_trend = await self.db.budget_items.aggregate(budget_trend_pipeline).to_list(100)
-        
-        # KPI achievement trend
-        kpi_trend_pipeline = [
-            {"$match": {
-                "organization_id": organization_id,
-                "updated_at": {"$gte": six_months_ago}
-            }},
-            {"$addFields": {
-                "achievement_rate": {
-                    "$cond": [
-                        {"$and": [{"$ne": ["$target_value", None]}, {"$gt": ["$target_value", 0]}]},
-                        {"$multiply": [{"$divide": ["$current_value", "$target_value"]}, 100]},
-                        0
-                    ]
-                }
-            }},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$updated_at"},
-                    "month": {"$month": "$updated_at"}
-                },
-                "avg_achievement": {"$avg": "$achievement_rate"}
-            }},
-            {"$sort": {"_id.year": 1, "_id.month": 1}}
-        ]
-        
-        kpi_trend = await self.db.kpi_indicators.aggregate(kpi_trend_pipeline).to_list(100)
-        
-        return {
+        performance_trends = {
             "budget_trend_monthly": [
                 {
                     "month": f"{item['_id']['year']}-{item['_id']['month']:02d}",
                     "amount": item["total_spent"]
                 }
-                for item in budget_trend
+                for item in budget["trend"]
             ],
             "kpi_trend_monthly": [
                 {
                     "month": f"{item['_id']['year']}-{item['_id']['month']:02d}",
                     "achievement": round(item["avg_achievement"], 1) if item["avg_achievement"] is not None else 0
                 }
-                for item in kpi_trend
+                for item in kpis["trend"]
             ]
         }
 
-    async def _calculate_risk_indicators(self, organization_id: str, current_date: datetime) -> Dict[str, Any]:
-        """Calculate risk indicators for projects and activities"""
-        
-        # Budget risk (projects with high utilization)
-        budget_risk_pipeline = [
-            {"$match": {"organization_id": organization_id}},
-            {"$addFields": {
-                "utilization_rate": {
-                    "$cond": [
-                        {"$gt": ["$budget_total", 0]},
-                        {"$multiply": [{"$divide": ["$budget_utilized", "$budget_total"]}, 100]},
-                        0
-                    ]
-                }
-            }},
-            {"$match": {"utilization_rate": {"$gt": 80}}},
-            {"$count": "high_utilization_projects"}
-        ]
-        
-        high_utilization_result = await self.db.projects.aggregate(budget_risk_pipeline).to_list(1)
-        high_utilization_projects = high_utilization_result[0]["high_utilization_projects"] if high_utilization_result else 0
-        
-        # Timeline risk (projects approaching deadline)
-        thirty_days_ahead = current_date + timedelta(days=30)
-        timeline_risk = await self.db.projects.count_documents({
-            "organization_id": organization_id,
-            "end_date": {"$lte": thirty_days_ahead, "$gte": current_date},
-            "status": {"$ne": "completed"}
-        })
-        
-        # Performance risk (activities with low progress)
-        performance_risk = await self.db.activities.count_documents({
-            "organization_id": organization_id,
-            "progress_percentage": {"$lt": 50},
-            "status": {"$in": ["in_progress", "delayed"]},
-            "start_date": {"$lte": current_date - timedelta(days=30)}
-        })
-        
-        return {
+        risk_indicators = {
             "budget_risk": {
-                "high_utilization_projects": high_utilization_projects,
+                "high_utilization_projects": _facet_count(projects["high_utilization"]),
                 "threshold": 80,
                 "description": "Projects with >80% budget utilization"
             },
             "timeline_risk": {
-                "projects_due_soon": timeline_risk,
+                "projects_due_soon": _facet_count(projects["due_soon"]),
                 "threshold_days": 30,
                 "description": "Projects due within 30 days"
             },
             "performance_risk": {
-                "low_progress_activities": performance_risk,
+                "low_progress_activities": _facet_count(activities["low_progress"]),
                 "threshold": 50,
                 "description": "Activities with <50% progress after 30+ days"
             }
         }
 
-    async def _calculate_completion_analytics(self, organization_id: str) -> Dict[str, Any]:
-        """Calculate completion analytics and success rates"""
-        
-        # Project success rate
-        total_closed_projects = await self.db.projects.count_documents({
-            "organization_id": organization_id,
-            "status": {"$in": ["completed", "cancelled"]}
-        })
-        
-        successful_projects = await self.db.projects.count_documents({
-            "organization_id": organization_id,
-            "status": "completed"
-        })
-        
-        success_rate = (successful_projects / total_closed_projects * 100) if total_closed_projects > 0 else 0
-        
-        # Time-to-completion analysis
-        completion_analysis_pipeline = [
-            {"$match": {
-                "organization_id": organization_id,
-                "status": "completed",
-                "start_date": {"$exists": True},
-                "end_date": {"$exists": True}
-            }},
-            {"$addFields": {
-                "planned_duration": {
-                    "$divide": [
-                        {"$subtract": ["$end_date", "$start_date"]},
-                        86400000
-                    ]
-                },
-                "actual_duration": {
-                    "$divide": [
-                        {"$subtract": ["$updated_at", "$created_at"]},
-                        86400000
-                    ]
-                }
-            }},
-            {"$addFields": {
-                "schedule_variance": {
-                    "$subtract": ["$actual_duration", "$planned_duration"]
-                }
-            }},
-            {"$group": {
-                "_id": None,
-                "avg_planned_duration": {"$avg": "$planned_duration"},
-                "avg_actual_duration": {"$avg": "$actual_duration"},
-                "avg_schedule_variance": {"$avg": "$schedule_variance"},
-                "on_time_projects": {
-                    "$sum": {
-                        "$cond": [{"$lte": ["$schedule_variance", 0]}, 1, 0]
-                    }
-                },
-                "total_projects": {"$sum": 1}
-            }}
-        ]
-        
-        completion_result = await self.db.projects.aggregate(completion_analysis_pipeline).to_list(1)
-        
-        if completion_result:
-            data = completion_result[0]
-            on_time_rate = (data["on_time_projects"] / data["total_projects"] * 100) if data["total_projects"] > 0 else 0
-        else:
-            data = {
-                "avg_planned_duration": 0,
-                "avg_actual_duration": 0,
-                "avg_schedule_variance": 0,
-                "on_time_projects": 0,
-                "total_projects": 0
-            }
-            on_time_rate = 0
-        
-        return {
+        success_rate = (completed_projects / total_closed_projects * 100) if total_closed_projects > 0 else 0
+        completion = projects["completion"][0] if projects["completion"] else {}
+        completion_total = completion.get("total_projects", 0)
+        on_time_rate = (completion.get("on_time_projects", 0) / completion_total * 100) if completion_total > 0 else 0
+        completion_analytics = {
             "project_success_rate": round(success_rate, 1),
             "on_time_completion_rate": round(on_time_rate, 1),
-            "avg_planned_duration_days": round(data["avg_planned_duration"], 1) if data["avg_planned_duration"] is not None else 0,
-            "avg_actual_duration_days": round(data["avg_actual_duration"], 1) if data["avg_actual_duration"] is not None else 0,
-            "avg_schedule_variance_days": round(data["avg_schedule_variance"], 1) if data["avg_schedule_variance"] is not None else 0,
-            "total_completed_projects": successful_projects,
+            "avg_planned_duration_days": _round_or_zero(completion.get("avg_planned_duration")),
+            "avg_actual_duration_days": _round_or_zero(completion.get("avg_actual_duration")),
+            "avg_schedule_variance_days": _round_or_zero(completion.get("avg_schedule_variance")),
+            "total_completed_projects": completed_projects,
             "total_closed_projects": total_closed_projects
         }
 
+        return ProjectDashboardData(
+            total_projects=total_projects,
+            active_projects=active_projects,
+            completed_projects=completed_projects,
+            total_budget=total_budget,
+            budget_utilized=budget_utilized,
+            utilization_rate=utilization_rate,
+            budget_utilization=utilization_rate,  # Same as utilization_rate for frontend compatibility
+            total_beneficiaries=total_beneficiaries,
+            beneficiaries_reached=total_beneficiaries,  # Assume all registered beneficiaries are reached
+            kpi_achievement_rate=kpi_achievement_rate,
+            kpi_performance={"average_achievement": kpi_achievement_rate},  # Structured for frontend
+            overdue_activities=_facet_count(activities["overdue"]),
+            recent_activities=recent_activities,
+            budget_by_category=budget_by_category,
+            projects_by_status=projects_by_status,
+            activity_insights=activity_insights,
+            performance_trends=performance_trends,
+            risk_indicators=risk_indicators,
+            completion_analytics=completion_analytics
+        )
+
+    async def _facet(self, collection, organization_id: str, facets: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Run several sub-pipelines over one organization's documents in a single round trip"""
+        pipeline = [{"$match": {"organization_id": organization_id}}, {"$facet": facets}]
+        result = await collection.aggregate(pipeline, allowDiskUse=True).to_list(1)
+        return result[0] if result else {name: [] for name in facets}
+
+    async def _projects_dashboard_facet(self, organization_id: str, current_date: datetime) -> Dict[str, List[Dict[str, Any]]]:
+        thirty_days_ahead = current_date + timedelta(days=30)
+        return await self._facet(self.db.projects, organization_id, {
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "budget": [{"$group": {
+                "_id": None,
+                "total_budget": {"$sum": "$budget_total"},
+                "budget_utilized": {"$sum": "$budget_utilized"}
+            }}],
+            # Budget risk (projects with high utilization)
+            "high_utilization": [
+                {"$addFields": {
+                    "utilization_rate": {
+                        "$cond": [
+                            {"$gt": ["$budget_total", 0]},
+                            {"$multiply": [{"$divide": ["$budget_utilized", "$budget_total"]}, 100]},
+                            0
+                        ]
+                    }
+                }},
+                {"$match": {"utilization_rate": {"$gt": 80}}},
+                {"$count": "n"}
+            ],
+            # Timeline risk (projects approaching deadline)
+            "due_soon": [
+                {"$match": {"end_date": {"$lte": thirty_days_ahead, "$gte": current_date}, "status": {"$ne": "completed"}}},
+                {"$count": "n"}
+            ],
+            # Time-to-completion analysis
+            "completion": [
+                {"$match": {"status": "completed", "start_date": {"$exists": True}, "end_date": {"$exists": True}}},
+                {"$addFields": {
+                    "planned_duration": {"$divide": [{"$subtract": ["$end_date", "$start_date"]}, 86400000]},
+                    "actual_duration": {"$divide": [{"$subtract": ["$updated_at", "$created_at"]}, 86400000]}
+                }},
+                {"$addFields": {"schedule_variance": {"$subtract": ["$actual_duration", "$planned_duration"]}}},
+                {"$group": {
+                    "_id": None,
+                    "avg_planned_duration": {"$avg": "$planned_duration"},
+                    "avg_actual_duration": {"$avg": "$actual_duration"},
+                    "avg_schedule_variance": {"$avg": "$schedule_variance"},
+                    "on_time_projects": {"$sum": {"$cond": [{"$lte": ["$schedule_variance", 0]}, 1, 0]}},
+                    "total_projects": {"$sum": 1}
+                }}
+            ],
+        })
+
+    async def _activities_dashboard_facet(self, organization_id: str, current_date: datetime) -> Dict[str, List[Dict[str, Any]]]:
+        eight_weeks_ago = current_date - timedelta(weeks=8)
+        return await self._facet(self.db.activities, organization_id, {
+            "recent": [
+                {"$sort": {"updated_at": -1}},
+                {"$limit": 5},
+                {"$project": {"id": 1, "name": 1, "status": 1, "progress_percentage": 1, "updated_at": 1}}
+            ],
+            "overdue": [
+                {"$match": {"end_date": {"$lt": current_date}, "status": {"$ne": "completed"}}},
+                {"$count": "n"}
+            ],
+            # Activity completion rates by status
+            "by_status": [{"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "avg_progress": {"$avg": "$progress_percentage"},
+                "total_budget": {"$sum": "$budget_allocated"}
+            }}],
+            # Weekly activity completion trend (last 8 weeks)
+            "completion_trend": [
+                {"$match": {"updated_at": {"$gte": eight_weeks_ago}, "status": "completed"}},
+                {"$group": {
+                    "_id": {"year": {"$year": "$updated_at"}, "week": {"$week": "$updated_at"}},
+                    "count": {"$sum": 1}
+                }},
+                {"$sort": {"_id.year": 1, "_id.week": 1}}
+            ],
+            # Activity efficiency (avg days to complete)
+            "efficiency": [
+                {"$match": {"status": "completed", "start_date": {"$exists": True}, "end_date": {"$exists": True}}},
+                {"$group": {
+                    "_id": None,
+                    "avg_completion_days": {"$avg": {"$divide": [{"$subtract": ["$end_date", "$start_date"]}, 86400000]}}
+                }}
+            ],
+            # Performance risk (activities with low progress)
+            "low_progress": [
+                {"$match": {
+                    "progress_percentage": {"$lt": 50},
+                    "status": {"$in": ["in_progress", "delayed"]},
+                    "start_date": {"$lte": current_date - timedelta(days=30)}
+                }},
+                {"$count": "n"}
+            ],
+        })
+
+    async def _kpis_dashboard_facet(self, organization_id: str, since: datetime) -> Dict[str, List[Dict[str, Any]]]:
+        achievement = {"$addFields": {
+            "achievement_rate": {
+                "$cond": [
+                    {"$and": [{"$ne": ["$target_value", None]}, {"$gt": ["$target_value", 0]}]},
+                    {"$multiply": [{"$divide": ["$current_value", "$target_value"]}, 100]},
+                    0
+                ]
+            }
+        }}
+        return await self._facet(self.db.kpi_indicators, organization_id, {
+            "overall": [achievement, {"$group": {"_id": None, "avg_achievement": {"$avg": "$achievement_rate"}}}],
+            "trend": [
+                {"$match": {"updated_at": {"$gte": since}}},
+                achievement,
+                {"$group": {
+                    "_id": {"year": {"$year": "$updated_at"}, "month": {"$month": "$updated_at"}},
+                    "avg_achievement": {"$avg": "$achievement_rate"}
+                }},
+                {"$sort": {"_id.year": 1, "_id.month": 1}}
+            ],
+        })
+
+    async def _budget_dashboard_facet(self, organization_id: str, since: datetime) -> Dict[str, List[Dict[str, Any]]]:
+        return await self._facet(self.db.budget_items, organization_id, {
+            "by_category": [{"$group": {"_id": "$category", "total": {"$sum": "$budgeted_amount"}}}],
+            # Monthly budget trend (last 6 months)
+            "trend": [
+                {"$match": {"created_at": {"$gte": since}}},
+                {"$group": {
+                    "_id": {"year": {"$year": "$created_at"}, "month": {"$month": "$created_at"}},
+                    "total_spent": {"$sum": "$budgeted_amount"}
+                }},
+                {"$sort": {"_id.year": 1, "_id.month": 1}}
+            ],
+        })
+
     # Enhanced Activity Management Methods
     async def update_activity_progress(self, activity_id: str, progress_data: Dict[str, Any], user_id: str) -> Dict[str, Any]:
         """Update activity progress with variance analysis"""
@@ -880,6 +755,7 @@ class ProjectService:
             {"_id": ObjectId(activity_id)},
             {"$set": update_data}
         )
+        data_versions.bump(activity_doc.get("organization_id"), "activities")
         
         # Log progress update
         progress_log = {
@@ -1174,4 +1050,6 @@ class ProjectService:
                 "progress": activity["progress_percentage"]
             })
         
+        if flagged_activities:
+            data_versions.bump(organization_id, "activities")
         return flagged_activities
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+Report datasets shared by the CSV / XLSX / PDF finance report renderers.
+
+A dataset gathers every input a report family needs concurrently, once, and
+is cached briefly under (kind, org, scope, date range, data versions), so
+downloading the same report in several formats computes it a single time.
+Concurrent requests for the same key share one in-flight computation.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+from data_versions import data_versions
+from ttl_cache import TTLCache
+
+REPORT_DATASET_TTL = float(os.environ.get('REPORT_DATASET_TTL_SECONDS', '120'))
+REPORT_DATASET_CACHE_SIZE = 128
+REPORT_DEPENDENCIES = ('expenses', 'budget_items')
+
+
+class ReportDatasets:
+    def __init__(self, finance_service, ttl: float = REPORT_DATASET_TTL, maxsize: int = REPORT_DATASET_CACHE_SIZE):
+        self.finance = finance_service
+        self.cache = TTLCache(maxsize, ttl)
+
+    def _key(self, kind: str, organization_id: str, scope: Optional[str], date_from: Optional[str], date_to: Optional[str]):
+        return (kind, organization_id, scope, date_from, date_to, data_versions.get(organization_id, *REPORT_DEPENDENCIES))
+
+    async def project(self, organization_id: str, project_id: str, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
+        """Budget details plus the burn-rate, variance and funding series of one project"""
+        async def build():
+            details, burn_rate, variance, funding = await asyncio.gather(
+                self.finance.project_budget_details(organization_id, project_id, date_from, date_to),
+                self.finance.burn_rate(organization_id, 'monthly', project_id, date_from, date_to),
+                self.finance.budget_vs_actual(organization_id, project_id, date_from, date_to),
+                self.finance.funding_utilization(organization_id, None, date_from, date_to, project_id),
+            )
+            return {'details': details, 'burn_rate': burn_rate, 'variance': variance, 'funding': funding}
+        return await self.cache.get_or_build(self._key('project', organization_id, project_id, date_from, date_to), build)
+
+    async def all_projects(self, organization_id: str, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
+        """Budget vs actual for every project of the organization"""
+        async def build():
+            return {'variance': await self.finance.budget_vs_actual(organization_id, None, date_from, date_to)}
+        return await self.cache.get_or_build(self._key('all_projects', organization_id, None, date_from, date_to), build)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), 'in_flight': self.cache.in_flight}
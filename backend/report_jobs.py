@@ -0,0 +1,239 @@
+"""
+Background queue for AI project reports.
+
+A submitted report is stored in generated_reports (the collection that also
+holds finished report metadata) as a job with status queued. Worker tasks
+claim queued jobs atomically, build them with
+AIReportingService.build_project_report and record completed or failed.
+
+Jobs that are queued or running carry active=True. A partial unique index on
+dedupe_key over active jobs makes duplicate submissions for the same project,
+report type and period coalesce onto the existing job, also across API
+processes. Per-organization concurrency is enforced per process. A job whose
+lease expires because its process died is requeued, up to
+REPORT_JOB_MAX_ATTEMPTS times.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+REPORT_JOBS_PER_ORG = int(os.environ.get("REPORT_JOBS_PER_ORG", "1"))
+REPORT_JOB_TIMEOUT = float(os.environ.get("REPORT_JOB_TIMEOUT_SECONDS", "600"))
+REPORT_JOB_MAX_ATTEMPTS = int(os.environ.get("REPORT_JOB_MAX_ATTEMPTS", "3"))
+# Fallback poll for jobs submitted through other processes
+REPORT_QUEUE_POLL_SECONDS = float(os.environ.get("REPORT_QUEUE_POLL_SECONDS", "5"))
+
+JOB_PROJECTION = {"_id": 0, "active": 0, "dedupe_key": 0}
+
+
+def dedupe_key(organization_id: str, project_id: str, report_type: str, period_start: datetime,
+               period_end: datetime, include_images: bool, ai_narrative: bool) -> str:
+    """Identity of a report request; equal keys produce the same PDF"""
+    return "|".join([
+        organization_id, project_id, report_type.lower(), period_start.isoformat(), period_end.isoformat(),
+        "images" if include_images else "-", "ai" if ai_narrative else "-",
+    ])
+
+
+class ReportJobQueue:
+    def __init__(self, db, reporting, workers: int = REPORT_WORKERS, per_org: int = REPORT_JOBS_PER_ORG,
+                 job_timeout: float = REPORT_JOB_TIMEOUT, poll_seconds: float = REPORT_QUEUE_POLL_SECONDS):
+        self.db = db
+        self.reporting = reporting
+        self.workers = workers
+        self.per_org = per_org
+        self.job_timeout = job_timeout
+        self.poll_seconds = poll_seconds
+        self.worker_id = uuid.uuid4().hex
+        self._running: Dict[str, int] = {}
+        self._claim_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def submit(self, organization_id: str, user_id: str, project_id: str, report_type: str,
+                     period_start: datetime, period_end: datetime, include_images: bool = True,
+                     ai_narrative: bool = True) -> Tuple[Dict[str, Any], bool]:
+        """Queue a report; returns (job, coalesced) where coalesced means an active duplicate was reused"""
+        key = dedupe_key(organization_id, project_id, report_type, period_start, period_end, include_images, ai_narrative)
+        for _ in range(3):
+            existing = await self.db.generated_reports.find_one({"dedupe_key": key, "active": True}, JOB_PROJECTION)
+            if existing:
+                return existing, True
+            now = datetime.utcnow()
+            job = {
+                "id": str(uuid.uuid4()),
+                "organization_id": organization_id,
+                "project_id": project_id,
+                "report_type": report_type,
+                "period_start": period_start,
+                "period_end": period_end,
+                "include_images": include_images,
+                "ai_narrative": ai_narrative,
+                "requested_by": user_id,
+                "status": "queued",
+                "active": True,
+                "dedupe_key": key,
+                "attempts": 0,
+                "error": None,
+                "pdf_path": None,
+                "created_at": now,
+                "updated_at": now,
+                "started_at": None,
+                "finished_at": None,
+            }
+            try:
+                await self.db.generated_reports.insert_one(job)
+            except DuplicateKeyError:
+                # Lost the race to an identical submission; pick that job up
+                continue
+            self._wake.set()
+            return {k: v for k, v in job.items() if k not in JOB_PROJECTION}, False
+        raise RuntimeError("Could not queue report, please retry")
+
+    async def get_job(self, organization_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.generated_reports.find_one({"organization_id": organization_id, "id": job_id}, JOB_PROJECTION)
+
+    async def list_jobs(self, organization_id: str, project_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"organization_id": organization_id}
+        if project_id:
+            query["project_id"] = project_id
+        cursor = self.db.generated_reports.find(query, JOB_PROJECTION).sort("created_at", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers; jobs they were running go back to the queue"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "per_org_limit": self.per_org,
+            "running": sum(self._running.values()),
+            # Only a count: the stats are served to admins of any organization
+            "organizations_running": len(self._running),
+        }
+
+    async def requeue_expired(self) -> int:
+        """Return jobs abandoned by a dead process to the queue, or fail them once out of attempts"""
+        now = datetime.utcnow()
+        expired = {"status": "running", "lease_until": {"$lt": now}}
+        await self.db.generated_reports.update_many(
+            {**expired, "attempts": {"$gte": REPORT_JOB_MAX_ATTEMPTS}},
+            {"$set": {"status": "failed", "error": "Report generation did not finish", "finished_at": now, "updated_at": now},
+             "$unset": {"active": ""}},
+        )
+        result = await self.db.generated_reports.update_many(
+            expired, {"$set": {"status": "queued", "updated_at": now}}
+        )
+        if result.modified_count:
+            self._wake.set()
+        return result.modified_count
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        query: Dict[str, Any] = {"status": "queued"}
+        saturated = [org for org, count in self._running.items() if count >= self.per_org]
+        if saturated:
+            query["organization_id"] = {"$nin": saturated}
+        now = datetime.utcnow()
+        return await self.db.generated_reports.find_one_and_update(
+            query,
+            {"$set": {"status": "running", "started_at": now, "updated_at": now, "worker": self.worker_id,
+                      "lease_until": now + timedelta(seconds=self.job_timeout)},
+             "$inc": {"attempts": 1}},
+            sort=[("created_at", 1)],
+            projection=JOB_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _worker(self):
+        await self.requeue_expired()
+        while True:
+            self._wake.clear()
+            try:
+                # Claims are serialized so the per-organization count is exact in this process
+                async with self._claim_lock:
+                    job = await self._claim()
+                    if job is not None:
+                        self._running[job["organization_id"]] = self._running.get(job["organization_id"], 0) + 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Report queue claim failed: {str(e)}")
+                await asyncio.sleep(self.poll_seconds)
+                continue
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    try:
+                        await self.requeue_expired()
+                    except Exception as e:
+                        logger.error(f"Report queue recovery failed: {str(e)}")
+                continue
+
+            org = job["organization_id"]
+            try:
+                await self._run(job)
+            finally:
+                self._running[org] -= 1
+                if not self._running[org]:
+                    del self._running[org]
+                # A slot for this organization opened up
+                self._wake.set()
+
+    async def _finish(self, job_id: str, fields: Dict[str, Any], release: bool = True):
+        now = datetime.utcnow()
+        update: Dict[str, Any] = {"$set": {**fields, "updated_at": now}}
+        if release:
+            update["$set"]["finished_at"] = now
+            update["$unset"] = {"active": ""}
+        await self.db.generated_reports.update_one({"id": job_id, "worker": self.worker_id}, update)
+
+    async def _run(self, job: Dict[str, Any]):
+        try:
+            report = await asyncio.wait_for(
+                self.reporting.build_project_report(
+                    job["id"], job["project_id"], job["report_type"], job["period_start"], job["period_end"],
+                    job.get("include_images", True), job.get("ai_narrative", True),
+                ),
+                self.job_timeout,
+            )
+        except asyncio.CancelledError:
+            # Shutting down: hand the job to the next worker that starts
+            await self._finish(job["id"], {"status": "queued", "started_at": None}, release=False)
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"Report job {job['id']} timed out")
+            await self._finish(job["id"], {"status": "failed", "error": f"Timed out after {self.job_timeout:.0f}s"})
+        except Exception as e:
+            logger.error(f"Report job {job['id']} failed: {str(e)}")
+            await self._finish(job["id"], {"status": "failed", "error": str(e)})
+        else:
+            metadata = report["metadata"]
+            await self._finish(job["id"], {
+                "status": "completed",
+                "error": None,
+                "pdf_path": metadata["pdf_path"],
+                "generated_at": metadata["generated_at"],
+                "narrative_length": metadata["narrative_length"],
+                "charts_count": metadata["charts_count"],
+            })
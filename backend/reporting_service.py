@@ -14,40 +14,42 @@ from pathlib import Path
 import base64
 import io
 
-# For PDF generation and chart creation
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # Use non-GUI backend
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    REPORTING_DEPENDENCIES = True
-except ImportError:
-    REPORTING_DEPENDENCIES = False
+import os
+from importlib.util import find_spec
+
+# For PDF generation and chart creation. reportlab is imported where the PDF
+# is built and matplotlib only in the chart_renderer worker processes.
+REPORTING_DEPENDENCIES = all(find_spec(name) is not None for name in ("matplotlib", "reportlab"))
+if not REPORTING_DEPENDENCIES:
     logging.warning("Reporting dependencies not installed. Install with: pip install matplotlib seaborn reportlab")
 
+from chart_renderer import chart_renderer
+from llm_gateway import LLMGateway
+
 logger = logging.getLogger(__name__)
 
+# Shared look of the report charts
+CHART_STYLE = {"style": "seaborn-v0_8", "palette": "husl", "dpi": 300}
+
+REPORTS_DIR = os.environ.get("REPORTS_DIR", "/app/generated_reports")
+# Rows loaded for the narrative prompt and the KPI chart; totals come from aggregations
+PROMPT_ACTIVITY_LIMIT = 5
+CHART_KPI_LIMIT = 8
+NARRATIVE_DEADLINE = float(os.environ.get("NARRATIVE_DEADLINE_SECONDS", "60"))
+# Shared by the PDF and streaming paths so both hit the same gateway cache entry
+NARRATIVE_PARAMS = {"max_tokens": 2500, "temperature": 0.7}
+
 class AIReportingService:
     """
     AI-Enhanced Reporting Service for DataRW Projects
     Generates comprehensive reports with AI narratives, visualizations, and PDF exports
     """
     
-    def __init__(self, db):
+    def __init__(self, db, llm: Optional[LLMGateway] = None):
         self.db = db
-        self.reports_dir = Path("/app/generated_reports")
-        self.reports_dir.mkdir(exist_ok=True)
-        
-        # Chart styling
-        if REPORTING_DEPENDENCIES:
-            plt.style.use('seaborn-v0_8')
-            sns.set_palette("husl")
+        self.llm = llm or LLMGateway(db)
+        # Created on first write, so importing the server needs no writable REPORTS_DIR
+        self.reports_dir = Path(REPORTS_DIR)
     
     async def generate_project_report(
         self, 
@@ -62,58 +64,18 @@ class AIReportingService:
         Generate comprehensive project report with AI narrative
         """
         try:
-            logger.info(f"Generating {report_type} report for project {project_id}")
-            
-            # Gather project data
-            project_data = await self._collect_project_data(project_id, period_start, period_end)
-            
-            if not project_data:
-                raise Exception(f"No data found for project {project_id}")
-            
-            # Generate AI narrative
-            narrative = ""
-            if ai_narrative:
-                narrative = await self._generate_ai_narrative(project_data, report_type, period_start, period_end)
-            
-            # Create visualizations
-            charts = []
-            if include_images:
-                charts = await self._generate_visualizations(project_data, project_id)
-            
-            # Generate report document
-            report_id = str(uuid.uuid4())
-            pdf_path = await self._generate_pdf_report(
-                report_id, 
-                project_data, 
-                narrative, 
-                charts, 
-                report_type,
-                period_start,
-                period_end
+            report = await self.build_project_report(
+                str(uuid.uuid4()), project_id, report_type, period_start, period_end, include_images, ai_narrative
             )
-            
-            # Save report metadata
-            report_metadata = {
-                "id": report_id,
-                "project_id": project_id,
-                "report_type": report_type,
-                "period_start": period_start,
-                "period_end": period_end,
-                "generated_at": datetime.utcnow(),
-                "pdf_path": str(pdf_path),
-                "narrative_length": len(narrative),
-                "charts_count": len(charts),
-                "status": "completed"
-            }
-            
+            report_metadata = report["metadata"]
             await self.db.generated_reports.insert_one(report_metadata)
             
             return {
                 "success": True,
-                "report_id": report_id,
-                "pdf_path": str(pdf_path),
-                "narrative": narrative,
-                "charts": charts,
+                "report_id": report_metadata["id"],
+                "pdf_path": report["pdf_path"],
+                "narrative": report["narrative"],
+                "charts": report["charts"],
                 "metadata": report_metadata
             }
             
@@ -124,56 +86,156 @@ class AIReportingService:
                 "error": str(e)
             }
     
+    async def build_project_report(
+        self,
+        report_id: str,
+        project_id: str,
+        report_type: str,
+        period_start: datetime,
+        period_end: datetime,
+        include_images: bool = True,
+        ai_narrative: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Collect data, write the narrative, render charts and the PDF for report_id.
+        Raises on failure; the caller decides where the metadata is stored.
+        """
+        logger.info(f"Generating {report_type} report for project {project_id}")
+        
+        # Gather project data
+        project_data = await self._collect_project_data(project_id, period_start, period_end)
+        
+        if not project_data:
+            raise Exception(f"No data found for project {project_id}")
+        
+        # Generate AI narrative
+        narrative = ""
+        if ai_narrative:
+            narrative = await self._generate_ai_narrative(project_data, report_type, period_start, period_end)
+        
+        # Create visualizations
+        charts = []
+        if include_images:
+            charts = await self._generate_visualizations(project_data, project_id)
+        
+        # Generate report document
+        pdf_path = await self._generate_pdf_report(
+            report_id, 
+            project_data, 
+            narrative, 
+            charts, 
+            report_type,
+            period_start,
+            period_end
+        )
+        
+        return {
+            "pdf_path": str(pdf_path),
+            "narrative": narrative,
+            "charts": charts,
+            "metadata": {
+                "id": report_id,
+                "project_id": project_id,
+                "report_type": report_type,
+                "period_start": period_start,
+                "period_end": period_end,
+                "generated_at": datetime.utcnow(),
+                "pdf_path": str(pdf_path),
+                "narrative_length": len(narrative),
+                "charts_count": len(charts),
+                "status": "completed"
+            }
+        }
+    
     async def _collect_project_data(self, project_id: str, period_start: datetime, period_end: datetime) -> Dict[str, Any]:
         """
-        Collect comprehensive project data for report generation
+        Collect comprehensive project data for report generation.
+        Only the fields the narrative and charts use are loaded; counts and
+        sums are computed by MongoDB, so memory does not grow with the number
+        of beneficiaries. Activities overlapping the period and beneficiaries
+        enrolled by its end are included.
         """
         try:
             # Get project details
-            project = await self.db.projects.find_one({"id": project_id})
+            project = await self.db.projects.find_one(
+                {"id": project_id},
+                {"_id": 0, "id": 1, "name": 1, "description": 1, "project_manager_id": 1, "organization_id": 1}
+            )
             if not project:
                 return None
             
-            # Get activities
-            activities = []
-            async for activity in self.db.activities.find({"project_id": project_id}):
-                activities.append(activity)
-            
-            # Get budget items
-            budget_items = []
-            async for budget in self.db.budget_items.find({"project_id": project_id}):
-                budget_items.append(budget)
-            
-            # Get KPIs
-            kpis = []
-            async for kpi in self.db.kpi_indicators.find({"project_id": project_id}):
-                kpis.append(kpi)
+            scope = {"project_id": project_id}
+            if project.get("organization_id"):
+                scope["organization_id"] = project["organization_id"]
+            in_period = {"start_date": {"$lte": period_end}, "end_date": {"$gte": period_start}}
+            beneficiary_scope = {k: v for k, v in scope.items() if k != "project_id"}
+            beneficiary_scope.update({"project_ids": project_id, "enrollment_date": {"$lte": period_end}})
+            
+            activities, activity_statuses, budget_groups, kpis, kpi_counts, beneficiary_groups = await asyncio.gather(
+                self.db.activities.find(
+                    {**scope, **in_period},
+                    {"_id": 0, "name": 1, "status": 1, "progress_percentage": 1}
+                ).sort("start_date", 1).limit(PROMPT_ACTIVITY_LIMIT).to_list(PROMPT_ACTIVITY_LIMIT),
+                self.db.activities.aggregate([
+                    {"$match": {**scope, **in_period}},
+                    {"$group": {"_id": {"$ifNull": ["$status", "not_started"]}, "count": {"$sum": 1}}},
+                ]).to_list(None),
+                self.db.budget_items.aggregate([
+                    {"$match": scope},
+                    {"$group": {
+                        "_id": {"$ifNull": ["$category", "other"]},
+                        "budgeted": {"$sum": "$budgeted_amount"},
+                        "utilized": {"$sum": "$utilized_amount"},
+                    }},
+                ]).to_list(None),
+                self.db.kpi_indicators.find(
+                    scope,
+                    {"_id": 0, "name": 1, "target_value": 1, "current_value": 1, "achievement_percentage": 1}
+                ).limit(CHART_KPI_LIMIT).to_list(CHART_KPI_LIMIT),
+                self.db.kpi_indicators.aggregate([
+                    {"$match": scope},
+                    {"$group": {
+                        "_id": None,
+                        "total": {"$sum": 1},
+                        "achieved": {"$sum": {"$cond": [{"$gte": ["$achievement_percentage", 100]}, 1, 0]}},
+                    }},
+                ]).to_list(None),
+                self.db.beneficiaries.aggregate([
+                    {"$match": beneficiary_scope},
+                    {"$group": {
+                        "_id": {"$ifNull": ["$gender", "other"]},
+                        "count": {"$sum": 1},
+                        "new": {"$sum": {"$cond": [{"$gte": ["$enrollment_date", period_start]}, 1, 0]}},
+                    }},
+                ], allowDiskUse=True).to_list(None),
+            )
             
-            # Get beneficiaries
-            beneficiaries = []
-            async for beneficiary in self.db.beneficiaries.find({"project_id": project_id}):
-                beneficiaries.append(beneficiary)
+            activity_status_counts = {row["_id"]: row["count"] for row in activity_statuses}
+            budget_by_category = {
+                row["_id"]: {"budgeted": row["budgeted"] or 0, "utilized": row["utilized"] or 0} for row in budget_groups
+            }
+            beneficiaries_by_gender = {row["_id"]: row["count"] for row in beneficiary_groups}
             
             # Calculate summary statistics
-            total_budget = sum(item.get("budgeted_amount", 0) for item in budget_items)
-            utilized_budget = sum(item.get("utilized_amount", 0) for item in budget_items)
+            total_budget = sum(c["budgeted"] for c in budget_by_category.values())
+            utilized_budget = sum(c["utilized"] for c in budget_by_category.values())
             budget_utilization = (utilized_budget / total_budget * 100) if total_budget > 0 else 0
             
-            completed_activities = len([a for a in activities if a.get("status") == "completed"])
-            total_activities = len(activities)
+            completed_activities = activity_status_counts.get("completed", 0)
+            total_activities = sum(activity_status_counts.values())
             activity_completion = (completed_activities / total_activities * 100) if total_activities > 0 else 0
             
             kpi_achievement = 0
-            if kpis:
-                achieved_kpis = sum(1 for kpi in kpis if kpi.get("achievement_percentage", 0) >= 100)
-                kpi_achievement = (achieved_kpis / len(kpis) * 100)
+            if kpi_counts and kpi_counts[0]["total"]:
+                kpi_achievement = (kpi_counts[0]["achieved"] / kpi_counts[0]["total"] * 100)
             
             return {
                 "project": project,
                 "activities": activities,
-                "budget_items": budget_items,
+                "activity_status_counts": activity_status_counts,
+                "budget_by_category": budget_by_category,
                 "kpis": kpis,
-                "beneficiaries": beneficiaries,
+                "beneficiaries_by_gender": beneficiaries_by_gender,
                 "summary": {
                     "total_budget": total_budget,
                     "utilized_budget": utilized_budget,
@@ -181,7 +243,8 @@ class AIReportingService:
                     "total_activities": total_activities,
                     "completed_activities": completed_activities,
                     "activity_completion": activity_completion,
-                    "total_beneficiaries": len(beneficiaries),
+                    "total_beneficiaries": sum(beneficiaries_by_gender.values()),
+                    "new_beneficiaries": sum(row["new"] for row in beneficiary_groups),
                     "kpi_achievement": kpi_achievement,
                     "period_start": period_start,
                     "period_end": period_end
@@ -202,17 +265,52 @@ class AIReportingService:
         """
         Generate AI-powered narrative for the report
         """
-        try:
-            # Use emergentintegrations for AI generation
-            from emergentintegrations import LLMIntegration
-            
-            llm = LLMIntegration()
-            
-            project = project_data["project"]
-            summary = project_data["summary"]
-            
-            # Create comprehensive prompt for AI narrative
-            prompt = f"""
+        # Identical prompts are served from the gateway cache; past the deadline
+        # or without a model the basic narrative is used instead
+        result = await self.llm.complete(
+            project_data["project"].get("organization_id"),
+            self._narrative_messages(project_data, report_type, period_start, period_end),
+            fallback=lambda: self._generate_basic_narrative(project_data, report_type, period_start, period_end),
+            deadline=NARRATIVE_DEADLINE,
+            **NARRATIVE_PARAMS,
+        )
+        if result.error:
+            logger.warning(f"AI narrative unavailable, using basic narrative: {result.error}")
+        return result.value
+    
+    async def prepare_narrative(
+        self,
+        project_id: str,
+        report_type: str,
+        period_start: datetime,
+        period_end: datetime
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Prompt messages and basic-narrative fallback for streaming a report narrative
+        """
+        project_data = await self._collect_project_data(project_id, period_start, period_end)
+        if not project_data:
+            return None
+        return {
+            "messages": self._narrative_messages(project_data, report_type, period_start, period_end),
+            "fallback": lambda: self._generate_basic_narrative(project_data, report_type, period_start, period_end),
+        }
+    
+    def _narrative_messages(
+        self,
+        project_data: Dict[str, Any],
+        report_type: str,
+        period_start: datetime,
+        period_end: datetime
+    ) -> List[Dict[str, str]]:
+        """
+        Build the narrative prompt
+        """
+        project = project_data["project"]
+        summary = project_data["summary"]
+        
+        # Create comprehensive prompt for AI narrative
+        prompt = f"""
             Generate a comprehensive, professional project report narrative for the following project:
             
             **Project Information:**
@@ -226,14 +324,14 @@ class AIReportingService:
             - Total Budget: {summary["total_budget"]:,.0f} RWF
             - Budget Utilized: {summary["utilized_budget"]:,.0f} RWF ({summary["budget_utilization"]:.1f}%)
             - Activities Completed: {summary["completed_activities"]}/{summary["total_activities"]} ({summary["activity_completion"]:.1f}%)
-            - Beneficiaries Reached: {summary["total_beneficiaries"]}
+            - Beneficiaries Reached: {summary["total_beneficiaries"]} ({summary.get("new_beneficiaries", 0)} enrolled this period)
             - KPI Achievement: {summary["kpi_achievement"]:.1f}%
             
             **Activities Overview:**
             {self._format_activities_for_prompt(project_data["activities"])}
             
             **Budget Breakdown:**
-            {self._format_budget_for_prompt(project_data["budget_items"])}
+            {self._format_budget_for_prompt(project_data["budget_by_category"])}
             
             **KPI Performance:**
             {self._format_kpis_for_prompt(project_data["kpis"])}
@@ -251,20 +349,7 @@ class AIReportingService:
             Include specific data points and percentages where relevant.
             Focus on insights, trends, and actionable recommendations.
             """
-            
-            # Generate narrative using emergent AI
-            response = await llm.generate_text(
-                prompt=prompt,
-                max_tokens=2500,
-                temperature=0.7
-            )
-            
-            return response.get("text", "AI narrative generation unavailable at this time.")
-            
-        except Exception as e:
-            logger.error(f"Error generating AI narrative: {str(e)}")
-            # Fallback to basic narrative
-            return self._generate_basic_narrative(project_data, report_type, period_start, period_end)
+        return [{"role": "user", "content": prompt}]
     
     def _generate_basic_narrative(
         self, 
@@ -322,23 +407,15 @@ class AIReportingService:
         
         return "\n".join(formatted)
     
-    def _format_budget_for_prompt(self, budget_items: List[Dict]) -> str:
-        """Format budget data for AI prompt"""
-        if not budget_items:
+    def _format_budget_for_prompt(self, categories: Dict[str, Dict[str, float]]) -> str:
+        """Format budget totals by category for AI prompt"""
+        if not categories:
             return "No budget data available."
         
-        categories = {}
-        for item in budget_items:
-            category = item.get("category", "other")
-            if category not in categories:
-                categories[category] = {"budgeted": 0, "utilized": 0}
-            categories[category]["budgeted"] += item.get("budgeted_amount", 0)
-            categories[category]["utilized"] += item.get("utilized_amount", 0)
-        
         formatted = []
         for category, amounts in categories.items():
             utilization = (amounts["utilized"] / amounts["budgeted"] * 100) if amounts["budgeted"] > 0 else 0
-            formatted.append(f"- {category.title()}: {amounts['utilized']:,.0f}/{amounts['budgeted']:,.0f} RWF ({utilization:.1f}%)")
+            formatted.append(f"- {str(category).title()}: {amounts['utilized']:,.0f}/{amounts['budgeted']:,.0f} RWF ({utilization:.1f}%)")
         
         return "\n".join(formatted)
     
@@ -366,16 +443,16 @@ class AIReportingService:
         
         charts = []
         chart_dir = self.reports_dir / f"charts_{project_id}"
-        chart_dir.mkdir(exist_ok=True)
+        chart_dir.mkdir(parents=True, exist_ok=True)
         
         try:
             # 1. Budget Utilization Chart
-            budget_chart = await self._create_budget_chart(project_data["budget_items"], chart_dir)
+            budget_chart = await self._create_budget_chart(project_data["budget_by_category"], chart_dir)
             if budget_chart:
                 charts.append(budget_chart)
             
             # 2. Activity Progress Chart
-            activity_chart = await self._create_activity_chart(project_data["activities"], chart_dir)
+            activity_chart = await self._create_activity_chart(project_data["activity_status_counts"], chart_dir)
             if activity_chart:
                 charts.append(activity_chart)
             
@@ -385,7 +462,7 @@ class AIReportingService:
                 charts.append(kpi_chart)
             
             # 4. Beneficiary Demographics Chart
-            beneficiary_chart = await self._create_beneficiary_chart(project_data["beneficiaries"], chart_dir)
+            beneficiary_chart = await self._create_beneficiary_chart(project_data["beneficiaries_by_gender"], chart_dir)
             if beneficiary_chart:
                 charts.append(beneficiary_chart)
             
@@ -400,49 +477,37 @@ class AIReportingService:
             logger.error(f"Error generating visualizations: {str(e)}")
             return []
     
-    async def _create_budget_chart(self, budget_items: List[Dict], chart_dir: Path) -> Optional[Dict[str, Any]]:
-        """Create budget utilization chart"""
+    async def _save_chart(self, spec: Dict[str, Any], chart_path: Path) -> None:
+        """Render spec in the chart worker pool (or take it from cache) and write the PNG"""
+        png = await chart_renderer.render(spec)
+        await asyncio.to_thread(chart_path.write_bytes, png)
+
+    async def _create_budget_chart(self, categories: Dict[str, Dict[str, float]], chart_dir: Path) -> Optional[Dict[str, Any]]:
+        """Create budget utilization chart from budget totals by category"""
         try:
-            if not budget_items:
-                return None
-            
-            # Group by category
-            categories = {}
-            for item in budget_items:
-                category = item.get("category", "other")
-                if category not in categories:
-                    categories[category] = {"budgeted": 0, "utilized": 0}
-                categories[category]["budgeted"] += item.get("budgeted_amount", 0)
-                categories[category]["utilized"] += item.get("utilized_amount", 0)
-            
             if not categories:
                 return None
             
-            # Create chart
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
             category_names = list(categories.keys())
-            budgeted_amounts = [categories[cat]["budgeted"] for cat in category_names]
-            utilized_amounts = [categories[cat]["utilized"] for cat in category_names]
-            
-            x = range(len(category_names))
-            width = 0.35
-            
-            ax.bar([i - width/2 for i in x], budgeted_amounts, width, label='Budgeted', color='#3B82F6')
-            ax.bar([i + width/2 for i in x], utilized_amounts, width, label='Utilized', color='#10B981')
-            
-            ax.set_xlabel('Budget Categories')
-            ax.set_ylabel('Amount (RWF)')
-            ax.set_title('Budget Utilization by Category')
-            ax.set_xticks(x)
-            ax.set_xticklabels([cat.title() for cat in category_names], rotation=45)
-            ax.legend()
-            
-            plt.tight_layout()
+            spec = {
+                **CHART_STYLE,
+                "kind": "bar",
+                "size": [10, 6],
+                "title": "Budget Utilization by Category",
+                "xlabel": "Budget Categories",
+                "ylabel": "Amount (RWF)",
+                "labels": [str(cat).title() for cat in category_names],
+                "series": [
+                    {"label": "Budgeted", "values": [categories[cat]["budgeted"] for cat in category_names], "color": "#3B82F6"},
+                    {"label": "Utilized", "values": [categories[cat]["utilized"] for cat in category_names], "color": "#10B981"},
+                ],
+                "group_width": 0.7,
+                "xtick_rotation": 45,
+                "legend": True,
+            }
             
             chart_path = chart_dir / "budget_utilization.png"
-            plt.savefig(chart_path, dpi=300, bbox_inches='tight')
-            plt.close()
+            await self._save_chart(spec, chart_path)
             
             return {
                 "title": "Budget Utilization by Category",
@@ -455,36 +520,25 @@ class AIReportingService:
             logger.error(f"Error creating budget chart: {str(e)}")
             return None
     
-    async def _create_activity_chart(self, activities: List[Dict], chart_dir: Path) -> Optional[Dict[str, Any]]:
-        """Create activity progress chart"""
+    async def _create_activity_chart(self, status_counts: Dict[str, int], chart_dir: Path) -> Optional[Dict[str, Any]]:
+        """Create activity progress chart from activity counts by status"""
         try:
-            if not activities:
-                return None
-            
-            # Count activities by status
-            status_counts = {}
-            for activity in activities:
-                status = activity.get("status", "not_started")
-                status_counts[status] = status_counts.get(status, 0) + 1
-            
             if not status_counts:
                 return None
             
-            # Create pie chart
-            fig, ax = plt.subplots(figsize=(8, 8))
-            
-            labels = [status.replace("_", " ").title() for status in status_counts.keys()]
-            sizes = list(status_counts.values())
+            labels = [str(status).replace("_", " ").title() for status in status_counts.keys()]
             colors = ['#10B981', '#3B82F6', '#F59E0B', '#EF4444', '#8B5CF6']
-            
-            ax.pie(sizes, labels=labels, colors=colors[:len(labels)], autopct='%1.1f%%', startangle=90)
-            ax.set_title('Activity Status Distribution')
-            
-            plt.tight_layout()
+            spec = {
+                **CHART_STYLE,
+                "kind": "pie",
+                "size": [8, 8],
+                "title": "Activity Status Distribution",
+                "labels": labels,
+                "series": [{"values": list(status_counts.values()), "color": colors[:len(labels)]}],
+            }
             
             chart_path = chart_dir / "activity_status.png"
-            plt.savefig(chart_path, dpi=300, bbox_inches='tight')
-            plt.close()
+            await self._save_chart(spec, chart_path)
             
             return {
                 "title": "Activity Status Distribution",
@@ -516,29 +570,21 @@ class AIReportingService:
             if not kpi_names:
                 return None
             
-            # Create horizontal bar chart
-            fig, ax = plt.subplots(figsize=(12, 8))
-            
-            bars = ax.barh(kpi_names, achievements)
-            
-            # Color bars based on achievement
-            for i, bar in enumerate(bars):
-                if achievements[i] >= 100:
-                    bar.set_color('#10B981')  # Green for achieved
-                elif achievements[i] >= 75:
-                    bar.set_color('#F59E0B')  # Yellow for near achievement
-                else:
-                    bar.set_color('#EF4444')  # Red for behind target
-            
-            ax.set_xlabel('Achievement Percentage (%)')
-            ax.set_title('KPI Achievement Status')
-            ax.axvline(x=100, color='gray', linestyle='--', alpha=0.7)
-            
-            plt.tight_layout()
+            # Color bars based on achievement: achieved, near achievement, behind target
+            colors = ['#10B981' if a >= 100 else '#F59E0B' if a >= 75 else '#EF4444' for a in achievements]
+            spec = {
+                **CHART_STYLE,
+                "kind": "barh",
+                "size": [12, 8],
+                "title": "KPI Achievement Status",
+                "xlabel": "Achievement Percentage (%)",
+                "labels": kpi_names,
+                "series": [{"values": achievements, "color": colors}],
+                "vline": 100,
+            }
             
             chart_path = chart_dir / "kpi_achievement.png"
-            plt.savefig(chart_path, dpi=300, bbox_inches='tight')
-            plt.close()
+            await self._save_chart(spec, chart_path)
             
             return {
                 "title": "KPI Achievement Status",
@@ -551,48 +597,25 @@ class AIReportingService:
             logger.error(f"Error creating KPI chart: {str(e)}")
             return None
     
-    async def _create_beneficiary_chart(self, beneficiaries: List[Dict], chart_dir: Path) -> Optional[Dict[str, Any]]:
-        """Create beneficiary demographics chart"""
+    async def _create_beneficiary_chart(self, gender_counts: Dict[str, int], chart_dir: Path) -> Optional[Dict[str, Any]]:
+        """Create beneficiary demographics chart from beneficiary counts by gender"""
         try:
-            if not beneficiaries:
-                return None
-            
-            # Analyze gender distribution
-            gender_counts = {}
-            for beneficiary in beneficiaries:
-                gender = beneficiary.get("gender", "other")
-                gender_counts[gender] = gender_counts.get(gender, 0) + 1
-            
             if not gender_counts:
                 return None
             
-            # Create donut chart
-            fig, ax = plt.subplots(figsize=(8, 8))
-            
-            labels = [gender.replace("_", " ").title() for gender in gender_counts.keys()]
-            sizes = list(gender_counts.values())
+            labels = [str(gender).replace("_", " ").title() for gender in gender_counts.keys()]
             colors = ['#3B82F6', '#EC4899', '#10B981', '#F59E0B']
-            
-            wedges, texts, autotexts = ax.pie(
-                sizes, 
-                labels=labels, 
-                colors=colors[:len(labels)], 
-                autopct='%1.1f%%',
-                pctdistance=0.85,
-                startangle=90
-            )
-            
-            # Create donut effect
-            centre_circle = plt.Circle((0,0), 0.70, fc='white')
-            ax.add_artist(centre_circle)
-            
-            ax.set_title('Beneficiary Gender Distribution')
-            
-            plt.tight_layout()
+            spec = {
+                **CHART_STYLE,
+                "kind": "donut",
+                "size": [8, 8],
+                "title": "Beneficiary Gender Distribution",
+                "labels": labels,
+                "series": [{"values": list(gender_counts.values()), "color": colors[:len(labels)]}],
+            }
             
             chart_path = chart_dir / "beneficiary_demographics.png"
-            plt.savefig(chart_path, dpi=300, bbox_inches='tight')
-            plt.close()
+            await self._save_chart(spec, chart_path)
             
             return {
                 "title": "Beneficiary Gender Distribution",
@@ -609,27 +632,24 @@ class AIReportingService:
         """Create monthly progress trend chart"""
         try:
             # This would require historical data - for now, create a sample trend
-            fig, ax = plt.subplots(figsize=(12, 6))
-            
-            # Sample monthly progress data
-            months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
-            budget_progress = [10, 25, 45, 60, 75, 85]
-            activity_progress = [15, 30, 50, 65, 80, 90]
-            
-            ax.plot(months, budget_progress, marker='o', label='Budget Utilization %', linewidth=2)
-            ax.plot(months, activity_progress, marker='s', label='Activity Completion %', linewidth=2)
-            
-            ax.set_xlabel('Month')
-            ax.set_ylabel('Progress (%)')
-            ax.set_title('Project Progress Trends')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            
-            plt.tight_layout()
+            spec = {
+                **CHART_STYLE,
+                "kind": "line",
+                "size": [12, 6],
+                "title": "Project Progress Trends",
+                "xlabel": "Month",
+                "ylabel": "Progress (%)",
+                "labels": ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+                "series": [
+                    {"label": "Budget Utilization %", "values": [10, 25, 45, 60, 75, 85], "marker": "o", "linewidth": 2},
+                    {"label": "Activity Completion %", "values": [15, 30, 50, 65, 80, 90], "marker": "s", "linewidth": 2},
+                ],
+                "legend": True,
+                "grid": True,
+            }
             
             chart_path = chart_dir / "progress_trends.png"
-            plt.savefig(chart_path, dpi=300, bbox_inches='tight')
-            plt.close()
+            await self._save_chart(spec, chart_path)
             
             return {
                 "title": "Project Progress Trends",
@@ -655,6 +675,7 @@ class AIReportingService:
         """
         Generate PDF report with narrative and visualizations
         """
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
         if not REPORTING_DEPENDENCIES:
             # Create a simple text file if PDF generation not available
             txt_path = self.reports_dir / f"report_{report_id}.txt"
@@ -666,6 +687,12 @@ class AIReportingService:
             return txt_path
         
         try:
+            from reportlab.lib import colors
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.units import inch
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
+
             pdf_path = self.reports_dir / f"report_{report_id}.pdf"
             doc = SimpleDocTemplate(str(pdf_path), pagesize=A4)
             
@@ -771,8 +798,8 @@ class AIReportingService:
                     else:
                         content.append(Paragraph(para.strip(), normal_style))
             
-            # Build PDF
-            doc.build(content)
+            # Build PDF; layout is CPU bound, keep it off the event loop
+            await asyncio.to_thread(doc.build, content)
             
             logger.info(f"PDF report generated successfully: {pdf_path}")
             return pdf_path
@@ -832,10 +859,10 @@ class AIReportingService:
                     "id": report["id"],
                     "project_id": report["project_id"],
                     "report_type": report["report_type"],
-                    "generated_at": report["generated_at"],
+                    "generated_at": report.get("generated_at"),
                     "status": report["status"],
-                    "pdf_path": report["pdf_path"],
-                    "file_size": self._get_file_size(report["pdf_path"])
+                    "pdf_path": report.get("pdf_path"),
+                    "file_size": self._get_file_size(report["pdf_path"]) if report.get("pdf_path") else None
                 })
             
             return reports
@@ -0,0 +1,80 @@
+"""
+Per-organization analytics response cache with ETag support.
+
+Entries are keyed by (org, endpoint, normalized params) plus the current
+data versions of the collections the endpoint reads (data_versions.py), so
+any write to those collections makes the entry unreachable. Each cached body
+carries a content ETag; requests whose If-None-Match matches get a 304.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from data_versions import data_versions
+from ttl_cache import TTLCache
+
+ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', '120'))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', '1024'))
+
+
+def _normalize(params: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in params.items() if v is not None and v != ''))
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = ANALYTICS_CACHE_MAX_ENTRIES, ttl: float = ANALYTICS_CACHE_TTL):
+        self.entries = TTLCache(maxsize, ttl)
+        self.not_modified = 0
+
+    async def respond(
+        self,
+        request: Request,
+        organization_id: str,
+        endpoint: str,
+        params: Dict[str, Any],
+        dependencies: Iterable[str],
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Response:
+        """Serve endpoint from cache, computing and storing it on a miss.
+
+        compute must raise on failure rather than return a placeholder body;
+        the exception propagates and nothing is cached.
+        """
+        key = (organization_id, endpoint, _normalize(params), data_versions.get(organization_id, *dependencies))
+        entry = self.entries.get(key)
+        status = 'HIT'
+        if entry is None:
+            status = 'MISS'
+            payload = jsonable_encoder(await compute())
+            # Same encoding as JSONResponse
+            body = json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode('utf-8')
+            entry = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+            self.entries.set(key, entry)
+
+        body, etag = entry
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'X-Cache': status}
+        if _etag_matches(request.headers.get('if-none-match', ''), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.entries.stats(), 'not_modified': self.not_modified}
+
+
+analytics_cache = ResponseCache()
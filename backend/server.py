@@ -1,12 +1,16 @@
 import os
 import uuid
-from typing import Optional, Dict, Any, List
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, TYPE_CHECKING
 from datetime import datetime
 
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, UploadFile, File, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi.responses import PlainTextResponse, JSONResponse, FileResponse
 
 from models import (
     Project, ProjectCreate, ProjectUpdate, ProjectStatus,
@@ -16,12 +20,24 @@ from models import (
     Beneficiary, BeneficiaryCreate, BeneficiaryUpdate,
     ProjectDocument, ProjectDashboardData,
     Expense, ExpenseCreate, ExpenseUpdate,
-    User, Organization
+    User, Organization, TokenData, ProjectReportRequest, NarrativeRequest
 )
 from project_service import ProjectService
 from finance_service import FinanceService
-from kpi_service import KPIService
+from kpi_service import KPIService, TREND_GRANULARITIES
 from beneficiary_service import BeneficiaryService
+from index_service import IndexService
+from expense_import import ExpenseImporter, IMPORT_FIELDS
+from report_datasets import ReportDatasets
+from chart_renderer import chart_renderer
+from reporting_service import AIReportingService, NARRATIVE_DEADLINE, NARRATIVE_PARAMS
+from report_jobs import ReportJobQueue
+from llm_gateway import LLMGateway
+from narrative_stream import NarrativeStreams
+from xlsx_reports import XLSX_MEDIA_TYPE, Formatted, render_workbook, iter_file
+from pagination import paginate, page_metadata
+from response_cache import analytics_cache
+from db_selection import configured_db_name, select_database
 
 # Auth utilities
 import auth as auth_util
@@ -30,20 +46,13 @@ from models import UserRole
 # Environment loader (fallback to .env file)
 from pathlib import Path
 
-# AI Finance insights
-from ai_service import FinanceAI
-
-# For XLSX/PDF streaming and charts
+# For XLSX/PDF streaming and charts. The AI client, reportlab, matplotlib
+# and openpyxl are imported on first use to keep worker cold start fast.
 from io import BytesIO
 from fastapi.responses import StreamingResponse
-import pandas as pd
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+
+if TYPE_CHECKING:
+    from reportlab.lib.utils import ImageReader
 
 
 def _load_env_if_needed():
@@ -69,48 +78,77 @@ MONGO_URL = os.environ.get('MONGO_URL')
 if not MONGO_URL:
     raise RuntimeError('MONGO_URL not configured')
 
+CONFIGURED_DB_NAME = configured_db_name()
+
+# Creating the client does no I/O; the connection is made on first use
 client = AsyncIOMotorClient(MONGO_URL)
 
-# Auto-detect database containing prior data if configured DB is empty
-def select_database(client: AsyncIOMotorClient) -> Any:
-    configured = os.environ.get('DB_NAME') or os.environ.get('MONGO_DB_NAME') or 'datarw_database'
+def _bind_database(database) -> None:
+    """Point the module-level db handle and services used by the routes at database"""
+    global db, project_service, finance_service, kpi_service, beneficiary_service, index_service, expense_importer, report_datasets, report_jobs, llm_gateway, reporting_service, narrative_streams
+    db = database
+    auth_util.db = database
+    project_service = ProjectService(database)
+    finance_service = FinanceService(database)
+    kpi_service = KPIService(database)
+    beneficiary_service = BeneficiaryService(database)
+    index_service = IndexService(database)
+    expense_importer = ExpenseImporter(database, finance_service.rollups)
+    report_datasets = ReportDatasets(finance_service)
+    llm_gateway = LLMGateway(database)
+    reporting_service = AIReportingService(database, llm_gateway)
+    report_jobs = ReportJobQueue(database, reporting_service)
+    narrative_streams = NarrativeStreams(database, llm_gateway, NARRATIVE_PARAMS, NARRATIVE_DEADLINE)
+
+# Bound to the configured database until the lifespan hook has probed for data
+_bind_database(client[CONFIGURED_DB_NAME])
+
+_finance_ai = None
+
+def get_finance_ai():
+    global _finance_ai
+    if _finance_ai is None or _finance_ai.llm is not llm_gateway:
+        from ai_service import FinanceAI
+        _finance_ai = FinanceAI(llm_gateway)
+    return _finance_ai
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    selected = await select_database(client, CONFIGURED_DB_NAME)
+    if selected.name != db.name:
+        logger.info(f"Using database '{selected.name}' instead of empty '{db.name}'")
+        _bind_database(selected)
+    # Warm the connection pool and provision the declared indexes before serving traffic
     try:
-        db = client[configured]
-        if db.projects.estimated_document_count() > 0 or db.activities.estimated_document_count() > 0:
-            return db
-        for name in client.list_database_names():
-            if name in ('admin', 'local', 'config'):
-                continue
-            cand = client[name]
-            try:
-                if cand.projects.estimated_document_count() > 0 or cand.activities.estimated_document_count() > 0:
-                    return cand
-            except Exception:
-                continue
-        return db
-    except Exception:
-        return client[configured]
-
-_db = select_database(client)
-db = _db
-
-auth_util.db = db
-
-project_service = ProjectService(db)
-finance_service = FinanceService(db)
-kpi_service = KPIService(db)
-beneficiary_service = BeneficiaryService(db)
-finance_ai = FinanceAI()
-
-app = FastAPI(title='DataRW API', version='1.0.0')
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=['*'],
-    allow_credentials=True,
-    allow_methods=['*'],
-    allow_headers=['*']
-)
+        await client.admin.command('ping')
+        await index_service.sync()
+    except Exception as e:
+        logger.error(f"Index provisioning failed: {str(e)}")
+    try:
+        await expense_importer.fail_expired()
+    except Exception as e:
+        logger.error(f"Expense import recovery failed: {str(e)}")
+    report_jobs.start()
+    yield
+    await expense_importer.stop()
+    await report_jobs.stop()
+    await narrative_streams.stop()
+    chart_renderer.shutdown()
+
+def create_app() -> FastAPI:
+    """Build the ASGI application; routes are registered on the module-level router"""
+    application = FastAPI(title='DataRW API', version='1.0.0', lifespan=lifespan)
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=['*'],
+        allow_credentials=True,
+        allow_methods=['*'],
+        allow_headers=['*']
+    )
+    application.include_router(api)
+    return application
 
 api = APIRouter(prefix='/api')
 
@@ -134,6 +172,10 @@ async def register_user(payload: RegisterRequest):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
+    # Hash before any insert: a saturated hashing pool answers 503 and must
+    # not leave an organization without its user behind
+    password_hash = await auth_util.get_password_hash_async(payload.password)
+    
     # Create org if not exists for this email domain (simple default org per user)
     org_name = f"{payload.name.split(' ')[0]}'s Organization"
     org_doc = {
@@ -146,7 +188,6 @@ async def register_user(payload: RegisterRequest):
     await db.organizations.insert_one(org_doc)
 
     # Create user
-    password_hash = auth_util.get_password_hash(payload.password)
     user_doc = {
         'id': str(uuid.uuid4()),
         'name': payload.name,
@@ -182,7 +223,7 @@ async def register_user(payload: RegisterRequest):
 @api.post('/auth/login')
 async def login_user(payload: LoginRequest):
     user = await auth_util.get_user_by_email(payload.email.lower())
-    if not user or not auth_util.verify_password(payload.password, user.password_hash or ''):
+    if not user or not await auth_util.verify_password_async(payload.password, user.password_hash or ''):
         raise HTTPException(status_code=401, detail='Invalid credentials')
     # get org
     org = await db.organizations.find_one({'id': user.organization_id})
@@ -273,6 +314,8 @@ async def list_fin_expenses(
     date_to: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
     current_user: UserModel = Depends(auth_util.get_current_active_user)
 ):
     filters = {
@@ -284,7 +327,10 @@ async def list_fin_expenses(
         'date_to': date_to,
     }
     filters = {k: v for k, v in filters.items() if v not in (None, '', [])}
-    return await finance_service.list_expenses(current_user.organization_id, filters, page, page_size)
+    try:
+        return await finance_service.list_expenses(current_user.organization_id, filters, page, page_size, cursor, total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @api.put('/finance/expenses/{expense_id}')
 async def update_fin_expense(expense_id: str, updates: ExpenseUpdate, current_user: UserModel = Depends(auth_util.get_current_active_user)):
@@ -356,40 +402,59 @@ async def get_pending_approvals(current_user: UserModel = Depends(auth_util.get_
         raise HTTPException(status_code=400, detail=str(e))
 
 # -------------------- KPI Dashboard Routes --------------------
+KPI_DEPENDENCIES = ('projects', 'activities', 'beneficiaries', 'expenses')
+FINANCE_DEPENDENCIES = ('expenses', 'budget_items')
+
 @api.get('/kpi/indicators')
 async def get_indicator_kpis(
+    request: Request,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    current_user: UserModel = Depends(auth_util.get_current_active_user)
+    granularity: str = 'month',
+    current_user: TokenData = Depends(auth_util.get_token_principal)
 ):
     """Get organization-level indicator KPIs"""
+    if granularity not in TREND_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(TREND_GRANULARITIES)}")
     try:
-        kpis = await kpi_service.get_indicator_kpis(current_user.organization_id, date_from, date_to)
-        return kpis
+        return await analytics_cache.respond(
+            request, current_user.organization_id, 'kpi/indicators',
+            {'date_from': date_from, 'date_to': date_to, 'granularity': granularity},
+            KPI_DEPENDENCIES,
+            lambda: kpi_service.get_indicator_kpis(current_user.organization_id, date_from, date_to, granularity),
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api.get('/kpi/activities')
 async def get_activity_kpis(
+    request: Request,
     project_id: Optional[str] = None,
-    current_user: UserModel = Depends(auth_util.get_current_active_user)
+    current_user: TokenData = Depends(auth_util.get_token_principal)
 ):
     """Get activity-level KPIs with drill-down capabilities"""
     try:
-        kpis = await kpi_service.get_activity_kpis(current_user.organization_id, project_id)
-        return kpis
+        return await analytics_cache.respond(
+            request, current_user.organization_id, 'kpi/activities', {'project_id': project_id},
+            ('activities', 'projects'),
+            lambda: kpi_service.get_activity_kpis(current_user.organization_id, project_id),
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api.get('/kpi/projects')
 async def get_project_kpis(
+    request: Request,
     project_id: Optional[str] = None,
-    current_user: UserModel = Depends(auth_util.get_current_active_user)
+    current_user: TokenData = Depends(auth_util.get_token_principal)
 ):
     """Get project-level KPIs with drill-down capabilities"""
     try:
-        kpis = await kpi_service.get_project_kpis(current_user.organization_id, project_id)
-        return kpis
+        return await analytics_cache.respond(
+            request, current_user.organization_id, 'kpi/projects', {'project_id': project_id},
+            KPI_DEPENDENCIES,
+            lambda: kpi_service.get_project_kpis(current_user.organization_id, project_id),
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -421,6 +486,8 @@ async def get_beneficiaries(
     page: int = 1,
     page_size: int = 20,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
     current_user: UserModel = Depends(auth_util.get_current_active_user)
 ):
     """Get beneficiaries with filtering and pagination"""
@@ -433,12 +500,50 @@ async def get_beneficiaries(
             risk_level=risk_level,
             page=page,
             page_size=page_size,
-            search=search
+            search=search,
+            cursor=cursor,
+            total=total
         )
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Static /beneficiaries/... paths are registered before /beneficiaries/{beneficiary_id},
+# which would otherwise capture them as beneficiary ids
+@api.get('/beneficiaries/analytics')
+async def get_beneficiary_analytics(
+    request: Request,
+    project_id: Optional[str] = None,
+    current_user: TokenData = Depends(auth_util.get_token_principal)
+):
+    """Get beneficiary analytics and insights"""
+    try:
+        return await analytics_cache.respond(
+            request, current_user.organization_id, 'beneficiaries/analytics', {'project_id': project_id},
+            ('beneficiaries', 'service_records'),
+            lambda: beneficiary_service.get_beneficiary_analytics(current_user.organization_id, project_id),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api.get('/beneficiaries/map-data')
+async def get_beneficiary_map_data(
+    project_id: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description='min_lng,min_lat,max_lng,max_lat'),
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+    current_user: UserModel = Depends(auth_util.get_current_active_user)
+):
+    """Get beneficiary clusters (low zoom) or points (high zoom) inside bbox for mapping"""
+    try:
+        return await beneficiary_service.get_beneficiary_map_data(
+            current_user.organization_id,
+            project_id,
+            bbox,
+            zoom
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @api.get('/beneficiaries/{beneficiary_id}')
 async def get_beneficiary(
     beneficiary_id: str,
@@ -495,36 +600,6 @@ async def delete_beneficiary(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@api.get('/beneficiaries/analytics')
-async def get_beneficiary_analytics(
-    project_id: Optional[str] = None,
-    current_user: UserModel = Depends(auth_util.get_current_active_user)
-):
-    """Get beneficiary analytics and insights"""
-    try:
-        analytics = await beneficiary_service.get_beneficiary_analytics(
-            current_user.organization_id,
-            project_id
-        )
-        return analytics
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@api.get('/beneficiaries/map-data')
-async def get_beneficiary_map_data(
-    project_id: Optional[str] = None,
-    current_user: UserModel = Depends(auth_util.get_current_active_user)
-):
-    """Get beneficiary location data for mapping"""
-    try:
-        map_data = await beneficiary_service.get_beneficiary_map_data(
-            current_user.organization_id,
-            project_id
-        )
-        return {"map_points": map_data}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
 # -------------------- Service Records Routes --------------------
 @api.post('/service-records')
 async def create_service_record(
@@ -553,12 +628,19 @@ async def create_batch_service_records(
     try:
         from models import BatchServiceRecord
         batch = BatchServiceRecord(**batch_data)
-        results = await beneficiary_service.create_batch_service_records(
+        report = await beneficiary_service.create_batch_service_records(
             batch,
             current_user.organization_id,
             current_user.id
         )
-        return {"success": True, "service_records": results, "count": len(results)}
+        return {
+            "success": report["failed_count"] == 0,
+            "service_records": report["service_records"],
+            "count": report["created_count"],
+            "skipped_count": report["skipped_count"],
+            "failed_count": report["failed_count"],
+            "results": report["results"],
+        }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -572,6 +654,8 @@ async def get_service_records(
     date_to: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
     current_user: UserModel = Depends(auth_util.get_current_active_user)
 ):
     """Get service records with filtering"""
@@ -589,7 +673,9 @@ async def get_service_records(
             date_from=date_from_dt,
             date_to=date_to_dt,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            total=total
         )
         return result
     except Exception as e:
@@ -671,27 +757,45 @@ async def calculate_risk_scores(
 
 # Analytics
 @api.get('/finance/burn-rate')
-async def fin_burn_rate(period: str = 'monthly', project_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, current_user: UserModel = Depends(auth_util.get_current_active_user)):
-    return await finance_service.burn_rate(current_user.organization_id, period, project_id, date_from, date_to)
+async def fin_burn_rate(request: Request, period: str = 'monthly', project_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, current_user: TokenData = Depends(auth_util.get_token_principal)):
+    return await analytics_cache.respond(
+        request, current_user.organization_id, 'finance/burn-rate',
+        {'period': period, 'project_id': project_id, 'date_from': date_from, 'date_to': date_to},
+        FINANCE_DEPENDENCIES,
+        lambda: finance_service.burn_rate(current_user.organization_id, period, project_id, date_from, date_to),
+    )
 
 @api.get('/finance/variance')
-async def fin_variance(project_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, current_user: UserModel = Depends(auth_util.get_current_active_user)):
-    return await finance_service.budget_vs_actual(current_user.organization_id, project_id, date_from, date_to)
+async def fin_variance(request: Request, project_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, current_user: TokenData = Depends(auth_util.get_token_principal)):
+    return await analytics_cache.respond(
+        request, current_user.organization_id, 'finance/variance',
+        {'project_id': project_id, 'date_from': date_from, 'date_to': date_to},
+        FINANCE_DEPENDENCIES,
+        lambda: finance_service.budget_vs_actual(current_user.organization_id, project_id, date_from, date_to),
+    )
 
 @api.get('/finance/forecast')
-async def fin_forecast(current_user: UserModel = Depends(auth_util.get_current_active_user)):
-    return await finance_service.forecast(current_user.organization_id)
+async def fin_forecast(request: Request, current_user: TokenData = Depends(auth_util.get_token_principal)):
+    return await analytics_cache.respond(
+        request, current_user.organization_id, 'finance/forecast', {},
+        FINANCE_DEPENDENCIES,
+        lambda: finance_service.forecast(current_user.organization_id),
+    )
 
 @api.get('/finance/funding-utilization')
-async def fin_funding_util(donor: Optional[str] = None, project_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, current_user: UserModel = Depends(auth_util.get_current_active_user)):
-    return await finance_service.funding_utilization(current_user.organization_id, donor, date_from, date_to, project_id)
+async def fin_funding_util(request: Request, donor: Optional[str] = None, project_id: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, current_user: TokenData = Depends(auth_util.get_token_principal)):
+    return await analytics_cache.respond(
+        request, current_user.organization_id, 'finance/funding-utilization',
+        {'donor': donor, 'project_id': project_id, 'date_from': date_from, 'date_to': date_to},
+        FINANCE_DEPENDENCIES,
+        lambda: finance_service.funding_utilization(current_user.organization_id, donor, date_from, date_to, project_id),
+    )
 
 # AI Insights
 @api.post('/finance/ai/insights')
 async def fin_ai_insights(payload: Dict[str, Any] = Body({}), current_user: UserModel = Depends(auth_util.get_current_active_user)):
     try:
-        result = await finance_ai.finance_insights(payload)
-        return result
+        return await get_finance_ai().finance_insights(payload, current_user.organization_id)
     except Exception:
         # Fallback basic insights
         anomalies = payload.get('anomalies') or []
@@ -708,164 +812,173 @@ async def fin_ai_insights(payload: Dict[str, Any] = Body({}), current_user: User
 
 # Expenses CSV export/import (basic)
 import csv
-@api.get('/finance/expenses/export-csv')
-async def fin_expenses_export_csv(project_id: Optional[str] = None, funding_source: Optional[str] = None, vendor: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, current_user: UserModel = Depends(auth_util.get_current_active_user)):
-    data = await finance_service.list_expenses(current_user.organization_id, {k:v for k,v in {'project_id':project_id,'funding_source':funding_source,'vendor':vendor,'date_from':date_from,'date_to':date_to}.items() if v}, page=1, page_size=10000)
-    
-    # Use StringIO for CSV text content
-    from io import StringIO
+import zlib
+from io import StringIO
+
+EXPENSE_CSV_COLUMNS = ['date','project_id','vendor','amount','currency','funding_source','cost_center','invoice_no','notes']
+
+def _expense_csv_row(it: Dict[str, Any]) -> List[Any]:
+    date = it.get('date')
+    return [
+        date.isoformat() if hasattr(date, 'isoformat') else date,
+        it.get('project_id') or '',
+        it.get('vendor') or '',
+        it.get('amount') or 0,
+        it.get('currency') or '',
+        it.get('funding_source') or '',
+        it.get('cost_center') or '',
+        it.get('invoice_no') or '',
+        it.get('notes') or ''
+    ]
+
+async def _stream_csv(header: List[str], rows, to_row, gzip: bool = False, rows_per_chunk: int = 500):
+    """Encode rows from an async iterator as CSV chunks, optionally gzipped.
+
+    The header goes out immediately; memory is bounded by rows_per_chunk.
+    """
     buf = StringIO()
     writer = csv.writer(buf)
-    writer.writerow(['date','project_id','vendor','amount','currency','funding_source','cost_center','invoice_no','notes'])
-    for it in data['items']:
-        writer.writerow([
-            (it.get('date') or datetime.utcnow()).isoformat() if hasattr(it.get('date'), 'isoformat') else it.get('date'),
-            it.get('project_id') or '',
-            it.get('vendor') or '',
-            it.get('amount') or 0,
-            it.get('currency') or '',
-            it.get('funding_source') or '',
-            it.get('cost_center') or '',
-            it.get('invoice_no') or '',
-            it.get('notes') or ''
-        ])
-    
-    # Convert to bytes for streaming
-    csv_content = buf.getvalue()
-    buf.close()
-    
+    # wbits=31 produces a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def drain(flush: bool = False) -> bytes:
+        data = buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+        if compressor is None:
+            return data
+        out = compressor.compress(data)
+        return out + compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    writer.writerow(header)
+    yield drain(flush=True)
+    pending = 0
+    async for row in rows:
+        writer.writerow(to_row(row))
+        pending += 1
+        if pending >= rows_per_chunk:
+            pending = 0
+            chunk = drain()
+            if chunk:
+                yield chunk
+    tail = drain()
+    if compressor is not None:
+        tail += compressor.flush()
+    if tail:
+        yield tail
+
+@api.get('/finance/expenses/export-csv')
+async def fin_expenses_export_csv(project_id: Optional[str] = None, funding_source: Optional[str] = None, vendor: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, gzip: bool = False, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    filters = {k:v for k,v in {'project_id':project_id,'funding_source':funding_source,'vendor':vendor,'date_from':date_from,'date_to':date_to}.items() if v}
+    try:
+        rows = finance_service.iter_expenses(current_user.organization_id, filters, EXPENSE_CSV_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = 'expenses.csv.gz' if gzip else 'expenses.csv'
     return StreamingResponse(
-        BytesIO(csv_content.encode('utf-8')), 
-        media_type='text/csv', 
-        headers={"Content-Disposition": "attachment; filename=expenses.csv"}
+        _stream_csv(EXPENSE_CSV_COLUMNS, rows, _expense_csv_row, gzip=gzip),
+        media_type='application/gzip' if gzip else 'text/csv',
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 from fastapi import UploadFile
-@api.post('/finance/expenses/import-csv')
+@api.post('/finance/expenses/import-csv', status_code=202)
 async def fin_expenses_import_csv(file: UploadFile, current_user: UserModel = Depends(auth_util.get_current_active_user)):
-    # Stub: accept file and return success without processing
-    return {'success': True, 'message': 'Import received (stub)'}
+    """Start a background import of a CSV or XLSX expense ledger"""
+    try:
+        job = await expense_importer.start(current_user.organization_id, current_user.id, file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'success': True, 'job': job}
+
+@api.get('/finance/expenses/import-jobs/{job_id}')
+async def fin_expenses_import_job(job_id: str, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    job = await expense_importer.get_job(current_user.organization_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Import job not found')
+    return job
+
+@api.get('/finance/expenses/import-jobs/{job_id}/errors-csv')
+async def fin_expenses_import_errors(job_id: str, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    """Rejected and skipped rows of an import, with the reason, as CSV"""
+    if not await expense_importer.get_job(current_user.organization_id, job_id):
+        raise HTTPException(status_code=404, detail='Import job not found')
+    rows = expense_importer.error_rows(current_user.organization_id, job_id)
+    to_row = lambda e: [e['row'], e['error'], *[(e.get('data') or {}).get(f) or '' for f in IMPORT_FIELDS]]
+    return StreamingResponse(
+        _stream_csv(['row', 'error', *IMPORT_FIELDS], rows, to_row),
+        media_type='text/csv',
+        headers={"Content-Disposition": f"attachment; filename=expense_import_{job_id}_errors.csv"}
+    )
 
 # XLSX Reports (refined with multiple sheets and formatting)
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
-
-
-def _apply_header(ws, row=1):
-    for cell in ws[row]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color='FFEFF6FF', end_color='FFEFF6FF', fill_type='solid')
-        cell.alignment = Alignment(horizontal='center')
-
-def _autosize(ws):
-    for col in ws.columns:
-        max_length = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            try:
-                val = str(cell.value) if cell.value is not None else ''
-                if len(val) > max_length:
-                    max_length = len(val)
-            except Exception:
-                pass
-        ws.column_dimensions[col_letter].width = min(50, max(12, max_length + 2))
+MONEY_FORMAT = '#,##0.00'
+PERCENT_FORMAT = '0.0%'
+
+async def _xlsx_response(sheets: List[Dict[str, Any]], filename: str) -> StreamingResponse:
+    # openpyxl is CPU bound; render on a worker thread into a spooled file
+    fh = await asyncio.to_thread(render_workbook, sheets)
+    return StreamingResponse(iter_file(fh), media_type=XLSX_MEDIA_TYPE, headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+def _activity_spend_sheet(details: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'title': 'ExpensesByActivity',
+        'header': ['Activity ID','Transactions','Spent'],
+        'rows': ([aid, row['transactions'], row['spent']] for aid, row in details['spent_by_activity'].items()),
+        'formats': {2: MONEY_FORMAT},
+    }
 
 @api.get('/finance/reports/project-xlsx')
 async def finance_report_project_xlsx(project_id: str, organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    details = await finance_service.project_budget_details(org, project_id, date_from, date_to)
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = 'Overview'
-    ws1.append(['Metric','Value'])
-    ws1.append(['Total Budgeted', details['total_budgeted']])
-    ws1.append(['Total Allocated', details['total_allocated']])
-    ws1.append(['Total Spent', details['total_spent']])
-    ws1.append(['Variance Amount', details['variance_amount']])
-    ws1.append(['Variance %', details['variance_pct']/100])
-    _apply_header(ws1)
-    for r in ws1.iter_rows(min_row=2, min_col=2, max_col=2):
-        for cell in r:
-            if isinstance(cell.value, float):
-                cell.number_format = '#,##0.00'
-    ws1['B6'].number_format = '0.0%'
-    _autosize(ws1)
-
-    ws2 = wb.create_sheet('BudgetLines')
-    ws2.append(['Category','Activity ID','Budgeted','Allocated','Utilized (PI)'])
-    for bl in details['budget_lines']:
-        ws2.append([bl['category'], bl['activity_id'], bl['budgeted'], bl['allocated'], bl['utilized_pi']])
-    _apply_header(ws2)
-    for row in ws2.iter_rows(min_row=2, min_col=3, max_col=5):
-        for cell in row:
-            cell.number_format = '#,##0.00'
-    _autosize(ws2)
-
-    ws3 = wb.create_sheet('ExpensesByActivity')
-    ws3.append(['Activity ID','Transactions','Spent'])
-    for aid, row in details['spent_by_activity'].items():
-        ws3.append([aid, row['transactions'], row['spent']])
-    _apply_header(ws3)
-    for row in ws3.iter_rows(min_row=2, min_col=3, max_col=3):
-        for cell in row:
-            cell.number_format = '#,##0.00'
-    _autosize(ws3)
-
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return StreamingResponse(buf, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={"Content-Disposition": f"attachment; filename=finance_project_{project_id}.xlsx"})
+    dataset = await report_datasets.project(org, project_id, date_from, date_to)
+    details = dataset['details']
+    overview = {
+        'title': 'Overview',
+        'header': ['Metric','Value'],
+        'rows': [
+            ['Total Budgeted', details['total_budgeted']],
+            ['Total Allocated', details['total_allocated']],
+            ['Total Spent', details['total_spent']],
+            ['Variance Amount', details['variance_amount']],
+            ['Variance %', Formatted(details['variance_pct']/100, PERCENT_FORMAT)],
+        ],
+        'formats': {1: MONEY_FORMAT},
+    }
+    budget_lines = {
+        'title': 'BudgetLines',
+        'header': ['Category','Activity ID','Budgeted','Allocated','Utilized (PI)'],
+        'rows': ([bl['category'], bl['activity_id'], bl['budgeted'], bl['allocated'], bl['utilized_pi']] for bl in details['budget_lines']),
+        'formats': {2: MONEY_FORMAT, 3: MONEY_FORMAT, 4: MONEY_FORMAT},
+    }
+    return await _xlsx_response([overview, budget_lines, _activity_spend_sheet(details)], f"finance_project_{project_id}.xlsx")
 
 @api.get('/finance/reports/activities-xlsx')
 async def finance_report_activities_xlsx(project_id: str, organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    details = await finance_service.project_budget_details(org, project_id, date_from, date_to)
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'ExpensesByActivity'
-    ws.append(['Activity ID','Transactions','Spent'])
-    for aid, row in details['spent_by_activity'].items():
-        ws.append([aid, row['transactions'], row['spent']])
-    _apply_header(ws)
-    for row in ws.iter_rows(min_row=2, min_col=3, max_col=3):
-        for cell in row:
-            cell.number_format = '#,##0.00'
-    _autosize(ws)
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return StreamingResponse(buf, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={"Content-Disposition": f"attachment; filename=finance_activities_{project_id}.xlsx"})
+    dataset = await report_datasets.project(org, project_id, date_from, date_to)
+    details = dataset['details']
+    return await _xlsx_response([_activity_spend_sheet(details)], f"finance_activities_{project_id}.xlsx")
 
 @api.get('/finance/reports/all-projects-xlsx')
 async def finance_report_all_projects_xlsx(organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    var = await finance_service.budget_vs_actual(org, None, date_from, date_to)
+    var = (await report_datasets.all_projects(org, date_from, date_to))['variance']
     rows = var.get('by_project', [])
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'ByProject'
-    ws.append(['Project ID','Planned','Allocated','Actual','Variance','Variance %'])
-    for r in rows:
-        ws.append([r['project_id'], r['planned'], r['allocated'], r['actual'], r['variance_amount'], r['variance_pct']/100])
-    _apply_header(ws)
-    for row in ws.iter_rows(min_row=2, min_col=2, max_col=5):
-        for cell in row:
-            cell.number_format = '#,##0.00'
-    for cell in ws.iter_rows(min_row=2, min_col=6, max_col=6):
-        for c in cell:
-            c.number_format = '0.0%'
-    _autosize(ws)
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return StreamingResponse(buf, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={"Content-Disposition": "attachment; filename=finance_all_projects.xlsx"})
+    sheet = {
+        'title': 'ByProject',
+        'header': ['Project ID','Planned','Allocated','Actual','Variance','Variance %'],
+        'rows': ([r['project_id'], r['planned'], r['allocated'], r['actual'], r['variance_amount'], r['variance_pct']/100] for r in rows),
+        'formats': {1: MONEY_FORMAT, 2: MONEY_FORMAT, 3: MONEY_FORMAT, 4: MONEY_FORMAT, 5: PERCENT_FORMAT},
+    }
+    return await _xlsx_response([sheet], "finance_all_projects.xlsx")
 
 # CSV Reports (simple)
 @api.get('/finance/reports/project-csv')
 async def finance_report_project_csv(project_id: str, organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    details = await finance_service.project_budget_details(org, project_id, date_from, date_to)
+    dataset = await report_datasets.project(org, project_id, date_from, date_to)
+    details = dataset['details']
     
     # Use StringIO for CSV text content
     from io import StringIO
@@ -891,7 +1004,8 @@ async def finance_report_project_csv(project_id: str, organization_id: Optional[
 @api.get('/finance/reports/activities-csv')
 async def finance_report_activities_csv(project_id: str, organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    details = await finance_service.project_budget_details(org, project_id, date_from, date_to)
+    dataset = await report_datasets.project(org, project_id, date_from, date_to)
+    details = dataset['details']
     
     # Use StringIO for CSV text content
     from io import StringIO
@@ -914,7 +1028,7 @@ async def finance_report_activities_csv(project_id: str, organization_id: Option
 @api.get('/finance/reports/all-projects-csv')
 async def finance_report_all_projects_csv(organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    var = await finance_service.budget_vs_actual(org, None, date_from, date_to)
+    var = (await report_datasets.all_projects(org, date_from, date_to))['variance']
     rows = var.get('by_project', [])
     
     # Use StringIO for CSV text content
@@ -940,109 +1054,194 @@ async def finance_report_all_projects_csv(organization_id: Optional[str] = Query
 async def health():
     return {'status': 'ok', 'time': datetime.utcnow().isoformat()}
 
+@api.get('/system/index-drift')
+async def index_drift(current_user: UserModel = Depends(auth_util.require_admin())):
+    """Report indexes that are missing, undeclared or unused"""
+    return {'drift': await index_service.report_drift()}
+
+@api.get('/system/cache-stats')
+async def cache_stats(current_user: UserModel = Depends(auth_util.require_admin())):
+    """Hit/miss counters of the in-process caches"""
+    return {
+        'analytics': analytics_cache.stats(),
+        'kpi_indicators': kpi_service.indicator_cache.stats(),
+        'auth': auth_util.auth_cache_stats(),
+        'password_hashing': auth_util.password_hashing_stats(),
+        'report_datasets': report_datasets.stats(),
+        'charts': chart_renderer.stats(),
+        'report_jobs': report_jobs.stats(),
+        'llm': llm_gateway.stats(),
+    }
+
+# --------------- AI Project Reports (background jobs) ---------------
+@api.post('/reports/project-reports', status_code=202)
+async def submit_project_report(req: ProjectReportRequest, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    """Queue an AI project report; identical pending requests share one job"""
+    if req.period_end < req.period_start:
+        raise HTTPException(status_code=400, detail='period_end must not be before period_start')
+    project = await db.projects.find_one({'id': req.project_id, 'organization_id': current_user.organization_id}, {'_id': 1})
+    if not project:
+        raise HTTPException(status_code=404, detail='Project not found')
+    job, coalesced = await report_jobs.submit(
+        current_user.organization_id, current_user.id, req.project_id, req.report_type,
+        req.period_start, req.period_end, req.include_images, req.ai_narrative,
+    )
+    return {'success': True, 'job': job, 'coalesced': coalesced}
+
+@api.get('/reports/project-reports')
+async def list_project_reports(project_id: Optional[str] = Query(None), limit: int = Query(50, ge=1, le=200), current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    return await report_jobs.list_jobs(current_user.organization_id, project_id, limit)
+
+@api.get('/reports/project-reports/{job_id}')
+async def get_project_report(job_id: str, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    job = await report_jobs.get_job(current_user.organization_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Report not found')
+    return job
+
+@api.get('/reports/project-reports/{job_id}/download')
+async def download_project_report(job_id: str, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    job = await report_jobs.get_job(current_user.organization_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Report not found')
+    if job['status'] != 'completed':
+        raise HTTPException(status_code=409, detail=f"Report is {job['status']}")
+    path = Path(job['pdf_path'])
+    if not path.is_file():
+        raise HTTPException(status_code=410, detail='Report file is no longer available')
+    media_type = 'application/pdf' if path.suffix == '.pdf' else 'text/plain'
+    return FileResponse(path, media_type=media_type, filename=f"{job['report_type']}_report_{job['project_id']}{path.suffix}")
+
+# --------------- AI Report Narratives (Server-Sent Events) ---------------
+@api.post('/reports/narratives', status_code=202)
+async def open_narrative(req: NarrativeRequest, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    """Start (or join) generating a project report narrative; read it from the stream endpoint"""
+    if req.period_end < req.period_start:
+        raise HTTPException(status_code=400, detail='period_end must not be before period_start')
+    project = await db.projects.find_one({'id': req.project_id, 'organization_id': current_user.organization_id}, {'_id': 1})
+    if not project:
+        raise HTTPException(status_code=404, detail='Project not found')
+    prepared = await reporting_service.prepare_narrative(req.project_id, req.report_type, req.period_start, req.period_end)
+    if not prepared:
+        raise HTTPException(status_code=404, detail='Project not found')
+    narrative = await narrative_streams.open(
+        current_user.organization_id, req.project_id, req.report_type, req.period_start, req.period_end,
+        prepared['messages'], prepared['fallback'],
+    )
+    return {'success': True, 'narrative': narrative}
+
+@api.get('/reports/narratives/{narrative_id}')
+async def get_narrative(narrative_id: str, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    narrative = await narrative_streams.get(current_user.organization_id, narrative_id)
+    if not narrative:
+        raise HTTPException(status_code=404, detail='Narrative not found')
+    return narrative
+
+def _sse(event: str, data: Any, event_id: Optional[str] = None) -> str:
+    lines = [f'event: {event}']
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+@api.get('/reports/narratives/{narrative_id}/stream')
+async def stream_narrative(narrative_id: str, request: Request, current_user: UserModel = Depends(auth_util.get_current_active_user)):
+    """
+    Narrative text as Server-Sent Events. Reconnecting with Last-Event-ID
+    continues where the client stopped; it never restarts generation
+    """
+    narrative = await narrative_streams.get(current_user.organization_id, narrative_id)
+    if not narrative:
+        raise HTTPException(status_code=404, detail='Narrative not found')
+
+    async def body():
+        yield 'retry: 3000\n\n'
+        async for event, data, event_id in narrative_streams.events(
+            current_user.organization_id, narrative_id, request.headers.get('last-event-id')
+        ):
+            if event == 'heartbeat':
+                if await request.is_disconnected():
+                    return
+                yield ': keep-alive\n\n'
+            else:
+                yield _sse(event, data, event_id)
+
+    return StreamingResponse(body(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # --------------- Helpers: Charts for PDFs ---------------
-def _fig_to_image_reader(fig) -> ImageReader:
-    buf = BytesIO()
-    fig.tight_layout()
-    fig.savefig(buf, format='png', dpi=140)
-    plt.close(fig)
-    buf.seek(0)
-    return ImageReader(buf)
+# Charts are declared as specs and rendered by chart_renderer in worker processes
 
-async def _chart_burn_rate(organization_id: str, project_id: Optional[str], date_from: Optional[str], date_to: Optional[str]) -> Optional[ImageReader]:
-    try:
-        data = await finance_service.burn_rate(organization_id, 'monthly', project_id, date_from, date_to)
-        series = data.get('series', [])
-        if not series:
-            return None
-        x = [s['period'] for s in series]
-        y = [s['spent'] for s in series]
-        fig, ax = plt.subplots(figsize=(6, 2.4))
-        ax.plot(x, y, marker='o')
-        ax.set_title('Burn Rate (Monthly)')
-        ax.set_xlabel('Period')
-        ax.set_ylabel('Spent')
-        ax.tick_params(axis='x', rotation=45)
-        return _fig_to_image_reader(fig)
-    except Exception:
+async def _chart_images(*specs: Optional[Dict[str, Any]]) -> List[Optional['ImageReader']]:
+    from reportlab.lib.utils import ImageReader
+    images = await chart_renderer.render_many(*specs)
+    return [ImageReader(BytesIO(png)) if png else None for png in images]
+
+def _chart_burn_rate(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    series = data.get('series', [])
+    if not series:
         return None
+    return {
+        'kind': 'line', 'size': [6, 2.4], 'title': 'Burn Rate (Monthly)', 'xlabel': 'Period', 'ylabel': 'Spent',
+        'labels': [s['period'] for s in series],
+        'series': [{'values': [s['spent'] for s in series], 'marker': 'o'}],
+        'xtick_rotation': 45,
+    }
 
-async def _chart_variance_project(organization_id: str, project_id: str, date_from: Optional[str], date_to: Optional[str]) -> Optional[ImageReader]:
-    try:
-        var = await finance_service.budget_vs_actual(organization_id, project_id, date_from, date_to)
-        rows = var.get('by_project', [])
-        if not rows:
-            return None
-        row = next((r for r in rows if r.get('project_id') == project_id), rows[0])
-        labels = ['Planned','Actual']
-        values = [row.get('planned',0), row.get('actual',0)]
-        fig, ax = plt.subplots(figsize=(4, 2.4))
-        ax.bar(labels, values, color=['#60a5fa','#34d399'])
-        ax.set_title('Budget vs Actual')
-        return _fig_to_image_reader(fig)
-    except Exception:
+def _chart_variance_project(var: Dict[str, Any], project_id: str) -> Optional[Dict[str, Any]]:
+    rows = var.get('by_project', [])
+    if not rows:
         return None
+    row = next((r for r in rows if r.get('project_id') == project_id), rows[0])
+    return {
+        'kind': 'bar', 'size': [4, 2.4], 'title': 'Budget vs Actual',
+        'labels': ['Planned', 'Actual'],
+        'series': [{'values': [row.get('planned', 0), row.get('actual', 0)], 'color': ['#60a5fa', '#34d399']}],
+    }
 
-async def _chart_funding_util(organization_id: str, project_id: Optional[str], date_from: Optional[str], date_to: Optional[str]) -> Optional[ImageReader]:
-    try:
-        util = await finance_service.funding_utilization(organization_id, donor=None, date_from=date_from, date_to=date_to, project_id=project_id)
-        rows = util.get('by_funding_source', [])
-        rows = [r for r in rows if r.get('funding_source')]
-        if not rows:
-            return None
-        x = [r['funding_source'] for r in rows][:10]
-        y = [r['spent'] for r in rows][:10]
-        fig, ax = plt.subplots(figsize=(6, 2.4))
-        ax.barh(x, y, color='#f59e0b')
-        ax.set_title('Funding Utilization by Source')
-        ax.set_xlabel('Spent')
-        return _fig_to_image_reader(fig)
-    except Exception:
+def _chart_funding_util(util: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    rows = [r for r in util.get('by_funding_source', []) if r.get('funding_source')][:10]
+    if not rows:
         return None
+    return {
+        'kind': 'barh', 'size': [6, 2.4], 'title': 'Funding Utilization by Source', 'xlabel': 'Spent',
+        'labels': [r['funding_source'] for r in rows],
+        'series': [{'values': [r['spent'] for r in rows], 'color': '#f59e0b'}],
+    }
 
-async def _chart_activities_spend(details: Dict[str, Any]) -> Optional[ImageReader]:
-    try:
-        rows = [(k or '(none)', v.get('spent',0.0)) for k, v in details.get('spent_by_activity', {}).items()]
-        rows.sort(key=lambda x: x[1], reverse=True)
-        rows = rows[:10]
-        if not rows:
-            return None
-        labels = [r[0] for r in rows]
-        values = [r[1] for r in rows]
-        fig, ax = plt.subplots(figsize=(6, 2.4))
-        ax.barh(labels, values, color='#10b981')
-        ax.set_title('Top Activities by Spend')
-        ax.set_xlabel('Spent')
-        return _fig_to_image_reader(fig)
-    except Exception:
+def _chart_activities_spend(details: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    rows = [(k or '(none)', v.get('spent', 0.0)) for k, v in details.get('spent_by_activity', {}).items()]
+    rows.sort(key=lambda x: x[1], reverse=True)
+    rows = rows[:10]
+    if not rows:
         return None
+    return {
+        'kind': 'barh', 'size': [6, 2.4], 'title': 'Top Activities by Spend', 'xlabel': 'Spent',
+        'labels': [r[0] for r in rows],
+        'series': [{'values': [r[1] for r in rows], 'color': '#10b981'}],
+    }
 
-async def _chart_all_projects_variance(org: str, date_from: Optional[str], date_to: Optional[str]) -> Optional[ImageReader]:
-    try:
-        var = await finance_service.budget_vs_actual(org, None, date_from, date_to)
-        rows = var.get('by_project', [])[:10]
-        if not rows:
-            return None
-        labels = [r.get('project_id') for r in rows]
-        planned = [r.get('planned',0) for r in rows]
-        actual = [r.get('actual',0) for r in rows]
-        x = range(len(labels))
-        fig, ax = plt.subplots(figsize=(6, 2.8))
-        ax.bar([i-0.2 for i in x], planned, width=0.4, label='Planned')
-        ax.bar([i+0.2 for i in x], actual, width=0.4, label='Actual')
-        ax.set_xticks(list(x))
-        ax.set_xticklabels(labels, rotation=45, ha='right')
-        ax.set_title('Planned vs Actual by Project')
-        ax.legend()
-        return _fig_to_image_reader(fig)
-    except Exception:
+def _chart_all_projects_variance(var: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    rows = var.get('by_project', [])[:10]
+    if not rows:
         return None
+    return {
+        'kind': 'bar', 'size': [6, 2.8], 'title': 'Planned vs Actual by Project',
+        'labels': [str(r.get('project_id')) for r in rows],
+        'series': [
+            {'label': 'Planned', 'values': [r.get('planned', 0) for r in rows]},
+            {'label': 'Actual', 'values': [r.get('actual', 0) for r in rows]},
+        ],
+        'xtick_rotation': 45, 'xtick_ha': 'right', 'legend': True,
+    }
 
 # --------------- Finance Reports (PDF with charts) ---------------
 @api.get('/finance/reports/project-pdf')
 async def finance_report_project_pdf(project_id: str, organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    details = await finance_service.project_budget_details(org, project_id, date_from, date_to)
+    dataset = await report_datasets.project(org, project_id, date_from, date_to)
+    details = dataset['details']
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     width, height = A4
@@ -1071,9 +1270,11 @@ async def finance_report_project_pdf(project_id: str, organization_id: Optional[
     c.drawString(50, y, f"Variance: {details['variance_amount']:.2f} ({details['variance_pct']:.1f}%)")
 
     # Charts
-    br_img = await _chart_burn_rate(org, project_id, date_from, date_to)
-    var_img = await _chart_variance_project(org, project_id, date_from, date_to)
-    fu_img = await _chart_funding_util(org, project_id, date_from, date_to)
+    br_img, var_img, fu_img = await _chart_images(
+        _chart_burn_rate(dataset['burn_rate']),
+        _chart_variance_project(dataset['variance'], project_id),
+        _chart_funding_util(dataset['funding']),
+    )
 
     y_chart = y - 30
     if br_img:
@@ -1127,7 +1328,10 @@ async def finance_report_project_pdf(project_id: str, organization_id: Optional[
 @api.get('/finance/reports/activities-pdf')
 async def finance_report_activities_pdf(project_id: str, organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    details = await finance_service.project_budget_details(org, project_id, date_from, date_to)
+    dataset = await report_datasets.project(org, project_id, date_from, date_to)
+    details = dataset['details']
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     width, height = A4
@@ -1139,7 +1343,7 @@ async def finance_report_activities_pdf(project_id: str, organization_id: Option
     c.drawString(50, height - 80, f"Project ID: {project_id}")
 
     # Chart: Top activities by spend
-    chart_img = await _chart_activities_spend(details)
+    chart_img, = await _chart_images(_chart_activities_spend(details))
     y = height - 110
     if chart_img:
         c.drawImage(chart_img, 50, y - 180, width=500, height=170, preserveAspectRatio=True, mask='auto')
@@ -1166,8 +1370,10 @@ async def finance_report_activities_pdf(project_id: str, organization_id: Option
 @api.get('/finance/reports/all-projects-pdf')
 async def finance_report_all_projects_pdf(organization_id: Optional[str] = Query(None), date_from: Optional[str] = Query(None), date_to: Optional[str] = Query(None)):
     org = organization_id or 'org'
-    var = await finance_service.budget_vs_actual(org, None, date_from, date_to)
+    var = (await report_datasets.all_projects(org, date_from, date_to))['variance']
     rows = var.get('by_project', [])
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     width, height = A4
@@ -1177,7 +1383,7 @@ async def finance_report_all_projects_pdf(organization_id: Optional[str] = Query
     c.drawString(50, height - 60, 'All Projects Finance Summary')
 
     # Chart
-    chart = await _chart_all_projects_variance(org, date_from, date_to)
+    chart, = await _chart_images(_chart_all_projects_variance(var))
     y = height - 90
     if chart:
         c.drawImage(chart, 50, y - 180, width=500, height=170, preserveAspectRatio=True, mask='auto')
@@ -1208,20 +1414,21 @@ async def list_surveys(
     page: int = 1,
     page_size: int = 20,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
     current_user: User = Depends(auth_util.get_current_active_user)
 ):
-    """Get surveys with server-side pagination and filtering"""
+    """Get surveys with server-side page or cursor pagination and filtering"""
     query = {'organization_id': current_user.organization_id}
     if status:
         query['status'] = status
     
-    # Count total for pagination metadata
-    total = await db.surveys.count_documents(query)
-    
-    # Apply pagination
-    cursor = db.surveys.find(query).sort('updated_at', -1).skip((page - 1) * page_size).limit(page_size)
+    try:
+        result = await paginate(db.surveys, query, 'updated_at', -1, page, page_size, cursor, total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     items = []
-    async for doc in cursor:
+    for doc in result['docs']:
         doc.pop('_id', None)
         # Ensure required fields exist
         doc.setdefault('id', doc.get('id') or str(uuid.uuid4()))
@@ -1231,13 +1438,7 @@ async def list_surveys(
         doc.setdefault('updated_at', doc.get('updated_at') or datetime.utcnow())
         items.append(doc)
     
-    return {
-        'items': items,
-        'total': total,
-        'page': page,
-        'page_size': page_size,
-        'total_pages': (total + page_size - 1) // page_size
-    }
+    return {'items': items, **page_metadata(result)}
 
 @api.get('/analytics')
 async def get_analytics(current_user: User = Depends(auth_util.get_current_active_user)):
@@ -1269,15 +1470,22 @@ async def get_activities(
     project_id: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
     current_user: User = Depends(auth_util.get_current_active_user)
 ):
     """Get activities with server-side pagination and filtering"""
-    result = await project_service.get_activities(
-        organization_id=current_user.organization_id,
-        project_id=project_id,
-        page=page,
-        page_size=page_size
-    )
+    try:
+        result = await project_service.get_activities(
+            organization_id=current_user.organization_id,
+            project_id=project_id,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            total=total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return result
 
 @api.get('/beneficiaries')
@@ -1300,55 +1508,21 @@ async def get_beneficiaries(
 async def get_projects_dashboard(current_user: User = Depends(auth_util.get_current_active_user)):
     """Get dashboard data for projects overview"""
     try:
-        # Get basic project stats
-        org_id = current_user.organization_id
-        total_projects = await db.projects.count_documents({'organization_id': org_id})
-        active_projects = await db.projects.count_documents({'organization_id': org_id, 'status': 'active'})
-        completed_projects = await db.projects.count_documents({'organization_id': org_id, 'status': 'completed'})
-        
-        # Get recent activities (simplified)
-        recent_activities = []
-        cursor = db.activities.find({'organization_id': org_id}).sort('updated_at', -1).limit(5)
-        async for doc in cursor:
-            doc.pop('_id', None)
-            recent_activities.append(doc)
-        
-        # Basic dashboard structure
-        dashboard_data = {
-            'total_projects': total_projects,
-            'active_projects': active_projects, 
-            'completed_projects': completed_projects,
-            'overdue_activities': 0,  # Placeholder
-            'budget_utilization': 0.0,  # Placeholder
-            'kpi_performance': 0.0,  # Placeholder
-            'recent_activities': recent_activities,
-            'projects_by_status': {
-                'active': active_projects,
-                'completed': completed_projects,
-                'planning': max(0, total_projects - active_projects - completed_projects)
-            },
-            'budget_by_category': {
-                'operations': 30.0,
-                'personnel': 40.0, 
-                'equipment': 20.0,
-                'other': 10.0
-            }
-        }
-        
-        return dashboard_data
-        
+        dashboard = await project_service.get_dashboard_data(current_user.organization_id)
+        return dashboard.model_dump()
     except Exception as e:
         # Return basic empty structure on error
+        logger.error(f"Failed to build projects dashboard: {str(e)}")
         return {
             'total_projects': 0,
             'active_projects': 0,
             'completed_projects': 0,
             'overdue_activities': 0,
             'budget_utilization': 0.0,
-            'kpi_performance': 0.0,
+            'kpi_performance': {'average_achievement': 0.0},
             'recent_activities': [],
-            'projects_by_status': {'active': 0, 'completed': 0, 'planning': 0},
-            'budget_by_category': {'operations': 0.0, 'personnel': 0.0, 'equipment': 0.0, 'other': 0.0}
+            'projects_by_status': {},
+            'budget_by_category': {}
         }
 
-app.include_router(api)
\ No newline at end of file
+app = create_app()
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Write-only XLSX rendering for the finance reports.
+
+A sheet is described as a dict:
+
+    {"title": str, "header": [...], "rows": iterable of row sequences,
+     "formats": {column_index: number_format}}
+
+A single value can carry its own format as Formatted(value, number_format).
+
+render_workbook() writes the sheets with openpyxl in write-only mode into a
+spooled temporary file; call it through asyncio.to_thread and stream the
+result with iter_file(). openpyxl needs column widths before the first row
+is written, so widths are sized from the header and a bounded sample of
+leading rows that is buffered while their lengths are measured.
+"""
+
+import tempfile
+from itertools import islice
+from typing import Any, Dict, Iterator, List, NamedTuple
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+WIDTH_SAMPLE_ROWS = 1000
+MIN_COLUMN_WIDTH = 12
+MAX_COLUMN_WIDTH = 50
+# Workbooks up to this size stay in memory; larger ones spill to disk
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class Formatted(NamedTuple):
+    value: Any
+    number_format: str
+
+
+def _write_sheet(wb, sheet: Dict[str, Any]):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(sheet['title'])
+    header = list(sheet['header'])
+    formats = sheet.get('formats') or {}
+    rows = iter(sheet['rows'])
+
+    sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+    widths = [len(str(h)) for h in header]
+    for row in sample:
+        for i, value in enumerate(row):
+            if isinstance(value, Formatted):
+                value = value.value
+            length = len(str(value)) if value is not None else 0
+            if i >= len(widths):
+                widths.append(length)
+            elif length > widths[i]:
+                widths[i] = length
+    for i, width in enumerate(widths):
+        ws.column_dimensions[get_column_letter(i + 1)].width = min(MAX_COLUMN_WIDTH, max(MIN_COLUMN_WIDTH, width + 2))
+
+    font = Font(bold=True)
+    fill = PatternFill(start_color='FFEFF6FF', end_color='FFEFF6FF', fill_type='solid')
+    alignment = Alignment(horizontal='center')
+    header_cells = []
+    for title in header:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font, cell.fill, cell.alignment = font, fill, alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    def write(row):
+        out = []
+        for i, value in enumerate(row):
+            if isinstance(value, Formatted):
+                cell = WriteOnlyCell(ws, value=value.value)
+                cell.number_format = value.number_format
+                out.append(cell)
+            elif i in formats and isinstance(value, (int, float)):
+                cell = WriteOnlyCell(ws, value=value)
+                cell.number_format = formats[i]
+                out.append(cell)
+            else:
+                out.append(value)
+        ws.append(out)
+
+    for row in sample:
+        write(row)
+    for row in rows:
+        write(row)
+
+
+def render_workbook(sheets: List[Dict[str, Any]]):
+    """Render sheets into a spooled temp file positioned at the start (blocking)"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for sheet in sheets:
+        _write_sheet(wb, sheet)
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    try:
+        wb.save(out)
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return out
+
+
+def iter_file(fh, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield fh in chunks and close it once exhausted"""
+    try:
+        while chunk := fh.read(chunk_size):
+            yield chunk
+    finally:
+        fh.close()
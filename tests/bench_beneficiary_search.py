@@ -0,0 +1,123 @@
+"""
+Beneficiary search benchmark: the previous unanchored case-insensitive $regex
+over five fields against the indexed search fields, on a scratch database
+(dropped afterwards) of one organization's beneficiaries.
+
+    python tests/bench_beneficiary_search.py [--beneficiaries 1000000] [--queries 50] [--keep]
+
+Seeding 1M documents takes a few minutes; --keep leaves the database in
+place and a later run with the same --beneficiaries reuses it. Each query is
+a typed prefix of a seeded name or an exact identifier. Not collected by pytest.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+import beneficiary_search  # noqa: E402
+from index_service import INDEX_SPECS  # noqa: E402
+from pagination import paginate  # noqa: E402
+from tests.mongo_helpers import mongo_url  # noqa: E402
+
+ORG = "org-search-bench"
+FIRST = ["Jean", "Éric", "Aline", "Uwase", "Claude", "Divine", "Innocent", "Josée", "Patrick", "Grâce", "Emmanuel", "Chantal"]
+LAST = ["Ngabo", "Mukamana", "Habimana", "Uwimana", "Niyonzima", "Mutoni", "Nshimiyimana", "Ingabire", "Hakizimana", "Umutoni"]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _person(i: int, rng: random.Random):
+    first, last = rng.choice(FIRST), rng.choice(LAST) + rng.choice(["", "", "wase", "zima", "na"])
+    doc = {
+        "id": f"b{i}", "organization_id": ORG, "name": f"{first} {last}", "first_name": first, "last_name": last,
+        "gender": rng.choice(["male", "female"]), "national_id": f"11990{i:011d}", "system_id": f"BEN-{i:08d}",
+        "created_at": datetime(2024, 1, 1) + timedelta(seconds=i),
+    }
+    return {**doc, **beneficiary_search.search_fields(doc)}
+
+
+def _regex_query(search: str):
+    return {"organization_id": ORG, "$or": [
+        {field: {"$regex": search, "$options": "i"}} for field in ("name", "first_name", "last_name", "national_id", "system_id")
+    ]}
+
+
+async def _seed(db, count: int):
+    if await db.beneficiaries.estimated_document_count() == count:
+        return
+    await db.beneficiaries.drop()
+    await db.beneficiaries.create_indexes(INDEX_SPECS["beneficiaries"])
+    rng = random.Random(7)
+    for start in range(0, count, 10000):
+        await db.beneficiaries.insert_many([_person(i, rng) for i in range(start, min(count, start + 10000))], ordered=False)
+        print(f"\rseeded {min(count, start + 10000)}/{count}", end="", flush=True)
+    print()
+
+
+async def _run(args):
+    client = AsyncIOMotorClient(mongo_url())
+    db = client[f"datarw_search_bench_{args.beneficiaries}"]
+    try:
+        await _seed(db, args.beneficiaries)
+        rng = random.Random(11)
+        queries = []
+        for _ in range(args.queries):
+            if rng.random() < 0.2:
+                queries.append(f"11990{rng.randrange(args.beneficiaries):011d}")
+            else:
+                name = rng.choice(FIRST + LAST)
+                queries.append(name[:rng.randint(2, len(name))])
+
+        timings = {"regex": [], "indexed": []}
+        for search in queries:
+            start = time.perf_counter()
+            await paginate(db.beneficiaries, _regex_query(search), "created_at", -1, 1, 20)
+            timings["regex"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            await beneficiary_search.search_page(db.beneficiaries, {"organization_id": ORG}, search, 1, 20, "estimated",
+                                                 beneficiary_search.HIDE_SEARCH_FIELDS)
+            timings["indexed"].append(time.perf_counter() - start)
+
+        sample = queries[0]
+        regex_plan = await db.beneficiaries.find(_regex_query(sample)).limit(21).explain()
+        clause, _ = beneficiary_search.search_filter(sample)
+        search_plan = await db.beneficiaries.find({"organization_id": ORG, **clause}).limit(21).explain()
+
+        print(f"{args.beneficiaries} beneficiaries, {len(queries)} searches (page 1 of 20)")
+        print(f"{'path':<9}{'p50 ms':>9}{'p99 ms':>9}{'total s':>9}")
+        for path, values in timings.items():
+            ms = [v * 1000 for v in values]
+            print(f"{path:<9}{statistics.median(ms):>9.1f}{_percentile(ms, 99):>9.1f}{sum(values):>9.2f}")
+        for path, plan in (("regex", regex_plan), ("indexed", search_plan)):
+            stats = plan["executionStats"]
+            print(f"{path} '{sample}': {stats['totalDocsExamined']} docs / {stats['totalKeysExamined']} keys examined")
+    finally:
+        if not args.keep:
+            await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--beneficiaries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--keep", action="store_true")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
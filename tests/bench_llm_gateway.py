@@ -0,0 +1,77 @@
+"""
+Dashboard refresh benchmark for the finance AI insights path, run offline
+against the deterministic stub provider with a simulated model latency.
+
+    python tests/bench_llm_gateway.py [--refreshes 200] [--rounds 3] [--orgs 4] [--payloads 5] [--latency-ms 800]
+
+Each round fires --refreshes concurrent refreshes. "direct" gives every call
+its own gateway (no cache, no shared requests, no limits, like the previous
+direct client calls); "gateway" shares one, so only the first round reaches
+the model, queued behind the per-organization limit. Not collected by pytest.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from ai_service import FinanceAI  # noqa: E402
+from llm_gateway import LLMGateway, StubProvider  # noqa: E402
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _refreshes(mode: str, args):
+    shared = FinanceAI(LLMGateway(provider=StubProvider(args.latency_ms)))
+    latencies = []
+    calls = 0
+
+    async def refresh(i: int):
+        nonlocal calls
+        org = f"org-{i % args.orgs}"
+        payload = {"summary": {"page": 1, "total": i % args.payloads, "filters": {"org": org}},
+                   "anomalies": [{"id": f"e{i % args.payloads}", "amount": 2_000_000}]}
+        ai = shared if mode == "gateway" else FinanceAI(LLMGateway(provider=StubProvider(args.latency_ms), per_org=args.refreshes))
+        start = time.perf_counter()
+        await ai.finance_insights(payload, org)
+        latencies.append(time.perf_counter() - start)
+        if mode == "direct":
+            calls += ai.llm.counters["llm_calls"]
+
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        await asyncio.gather(*(refresh(i) for i in range(args.refreshes)))
+    elapsed = time.perf_counter() - started
+    if mode == "gateway":
+        calls = shared.llm.counters["llm_calls"]
+    return elapsed, latencies, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--orgs", type=int, default=4)
+    parser.add_argument("--payloads", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    print(f"{args.rounds} x {args.refreshes} refreshes, {args.orgs} orgs, {args.payloads} distinct payloads per org, "
+          f"{args.latency_ms:.0f} ms model latency")
+    print(f"{'mode':<9}{'total s':>9}{'calls':>7}{'p50 ms':>9}{'p99 ms':>9}")
+    for mode in ("direct", "gateway"):
+        elapsed, latencies, calls = asyncio.run(_refreshes(mode, args))
+        ms = [d * 1000 for d in latencies]
+        print(f"{mode:<9}{elapsed:>9.2f}{calls:>7}{statistics.median(ms):>9.1f}{_percentile(ms, 99):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
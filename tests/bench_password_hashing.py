@@ -0,0 +1,81 @@
+"""
+Login storm benchmark: event-loop latency seen by unrelated requests while
+many logins verify bcrypt passwords, with hashing inline vs on auth's pool.
+
+    python tests/bench_password_hashing.py [--logins 64] [--concurrency 16]
+
+"Unrelated request" latency is measured by a probe coroutine that sleeps
+5 ms and records how late it wakes up, i.e. how long the loop was blocked.
+Not collected by pytest; needs a bcrypt backend for passlib.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import auth  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _storm(mode: str, hashed: str, logins: int, concurrency: int):
+    gate = asyncio.Semaphore(concurrency)
+    delays = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            delays.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+    async def login():
+        async with gate:
+            if mode == "inline":
+                auth.verify_password("correct horse", hashed)
+                await asyncio.sleep(0)
+            else:
+                await auth.verify_password_async("correct horse", hashed)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+    return elapsed, delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    try:
+        hashed = auth.get_password_hash("correct horse")
+    except Exception as e:
+        sys.exit(f"bcrypt backend unavailable: {e}")
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent, {auth.PASSWORD_HASH_WORKERS} hash workers")
+    print(f"{'mode':<8}{'total s':>9}{'probes':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for mode in ("inline", "pool"):
+        elapsed, delays = asyncio.run(_storm(mode, hashed, args.logins, args.concurrency))
+        ms = [d * 1000 for d in delays] or [0.0]
+        print(f"{mode:<8}{elapsed:>9.2f}{len(delays):>8}{statistics.median(ms):>9.1f}"
+              f"{_percentile(ms, 99):>9.1f}{max(ms):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
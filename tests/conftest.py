@@ -0,0 +1,40 @@
+"""
+Shared MongoDB fixture: a scratch-database runner for tests that exercise
+the services against a real server. Tests using it are skipped when no
+server is reachable.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from tests.mongo_helpers import mongo_url
+
+
+@pytest.fixture
+def mongo_db():
+    """
+    Runner for `async def scenario(db)`: runs it in a fresh event loop
+    against a scratch database that is dropped afterwards
+    """
+    motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+
+    def run(scenario):
+        async def runner():
+            client = motor_asyncio.AsyncIOMotorClient(mongo_url(), serverSelectionTimeoutMS=1500)
+            try:
+                await client.admin.command("ping")
+            except Exception:
+                client.close()
+                pytest.skip("MongoDB not reachable")
+            name = f"datarw_test_{uuid.uuid4().hex[:8]}"
+            try:
+                await scenario(client[name])
+            finally:
+                await client.drop_database(name)
+                client.close()
+
+        asyncio.run(runner())
+
+    return run
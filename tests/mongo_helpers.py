@@ -0,0 +1,22 @@
+"""
+MongoDB connection settings shared by the tests and benchmarks that run
+against a real server.
+"""
+
+import os
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+def mongo_url() -> str:
+    """MONGO_URL from the environment or backend/.env, else a local server"""
+    url = os.environ.get("MONGO_URL")
+    if url:
+        return url
+    env_path = BACKEND_DIR / ".env"
+    if env_path.exists():
+        for line in env_path.read_text().splitlines():
+            if line.startswith("MONGO_URL="):
+                return line.split("=", 1)[1].strip().strip('"').strip("'")
+    return "mongodb://localhost:27017"
@@ -0,0 +1,87 @@
+"""Cached token -> user resolution in auth.get_current_user."""
+
+import asyncio
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("jose")
+pytest.importorskip("passlib")
+
+from fastapi import HTTPException  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+import auth  # noqa: E402
+
+
+class _Users:
+    def __init__(self, docs):
+        self.docs = docs
+        self.lookups = 0
+
+    async def find_one(self, query):
+        self.lookups += 1
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                return dict(doc)
+        return None
+
+
+class _DB:
+    def __init__(self, docs):
+        self.users = _Users(docs)
+
+
+@pytest.fixture
+def users(monkeypatch):
+    db = _DB([{
+        "id": "u1", "email": "a@example.org", "name": "A",
+        "organization_id": "org-1", "role": "Admin", "status": "active",
+    }])
+    monkeypatch.setattr(auth, "db", db)
+    auth._user_cache.clear()
+    return db.users
+
+
+def _credentials(expires=None, sub="u1"):
+    token = auth.create_access_token({"sub": sub, "org_id": "org-1", "role": "Admin"}, expires)
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_repeat_requests_skip_the_user_lookup(users):
+    creds = _credentials()
+    first = asyncio.run(auth.get_current_user(creds))
+    second = asyncio.run(auth.get_current_user(creds))
+    assert first.id == second.id == "u1"
+    assert users.lookups == 1
+
+
+def test_invalidate_user_forces_a_fresh_lookup(users):
+    creds = _credentials()
+    asyncio.run(auth.get_current_user(creds))
+    users.docs[0]["status"] = "inactive"
+    assert auth.invalidate_user("u1") == 1
+
+    user = asyncio.run(auth.get_current_user(creds))
+    assert user.status == "inactive"
+    assert users.lookups == 2
+
+
+def test_expired_and_unknown_tokens_are_rejected(users):
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.get_current_user(_credentials(timedelta(seconds=-1))))
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.get_current_user(_credentials(sub="missing")))
+    assert len(auth._user_cache) == 0
+
+
+def test_trusted_claims_skip_the_database(users, monkeypatch):
+    monkeypatch.setattr(auth, "TRUST_TOKEN_CLAIMS", True)
+    principal = asyncio.run(auth.get_token_principal(_credentials()))
+    assert principal.organization_id == "org-1"
+    assert users.lookups == 0
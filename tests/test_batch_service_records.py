@@ -0,0 +1,52 @@
+"""
+Batch service records: one record per beneficiary built from the declared
+batch fields only, with a per-item report (skipped when no MongoDB server is
+reachable).
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("motor.motor_asyncio")
+
+ORG = "org-batch-services"
+
+
+def test_batch_ignores_extra_id_and_organization_fields(mongo_db):
+    from beneficiary_service import BeneficiaryService
+    from models import BatchServiceRecord
+
+    async def scenario(db):
+        await db.beneficiaries.insert_many([{"id": f"b{i}", "organization_id": ORG, "name": f"B{i}"} for i in range(3)])
+        batch = BatchServiceRecord(**{
+            "beneficiary_ids": ["b0", "b1", "b2", "b1"],
+            "project_id": "p1",
+            "service_type": "training",
+            "service_name": "Savings group",
+            "service_date": datetime(2024, 5, 2),
+            "cost_per_beneficiary": 12.5,
+            # Not declared on BatchServiceRecord; kept by extra='allow'
+            "id": "client-id",
+            "organization_id": "other-org",
+        })
+
+        result = await BeneficiaryService(db).create_batch_service_records(batch, ORG, "u1")
+
+        assert (result["created_count"], result["skipped_count"], result["failed_count"]) == (3, 1, 0)
+        assert [(r["row"], r["beneficiary_id"], r["status"]) for r in result["results"]] == [
+            (0, "b0", "created"), (1, "b1", "created"), (2, "b2", "created"), (3, "b1", "skipped"),
+        ]
+        records = await db.service_records.find({}, {"_id": 0}).to_list(None)
+        assert len({r["id"] for r in records}) == 3 and "client-id" not in {r["id"] for r in records}
+        assert {r["organization_id"] for r in records} == {ORG}
+        assert {r["cost"] for r in records} == {12.5}
+        updated = await db.beneficiaries.count_documents({"organization_id": ORG, "last_service_date": datetime(2024, 5, 2)})
+        assert updated == 3
+
+    mongo_db(scenario)
@@ -0,0 +1,168 @@
+"""
+Beneficiary map data: GeoJSON locations, bounding boxes and grid clusters
+computed in MongoDB (MongoDB parts are skipped when no server is reachable).
+"""
+
+import math
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("pymongo")
+
+import beneficiary_geo  # noqa: E402
+from beneficiary_geo import location_filter, location_of, parse_bbox  # noqa: E402
+
+ORG = "org-beneficiary-geo"
+KIGALI = (30.06, -1.95)
+HUYE = (29.74, -2.60)
+
+
+def test_location_of_validates_coordinates():
+    assert location_of({"gps_latitude": -1.95, "gps_longitude": 30}) == {"type": "Point", "coordinates": [30.0, -1.95]}
+    assert location_of({"gps_latitude": None, "gps_longitude": 30.0}) is None
+    assert location_of({"gps_latitude": 95.0, "gps_longitude": 30.0}) is None
+    assert location_of({"gps_latitude": "1", "gps_longitude": 30.0}) is None
+
+
+def test_parse_bbox_and_filter():
+    assert parse_bbox(None) is None
+    assert parse_bbox("28.8,-2.9,30.9,-1.0") == (28.8, -2.9, 30.9, -1.0)
+    for bad in ("1,2,3", "a,b,c,d", "30,-1,29,-2", "0,0,181,10"):
+        with pytest.raises(ValueError):
+            parse_bbox(bad)
+    rwanda = location_filter((28.8, -2.9, 30.9, -1.0))
+    assert "$geoWithin" in rwanda["location"]
+    assert rwanda["location.coordinates.1"] == {"$gte": -2.9, "$lte": -1.0}
+    # Wider than a hemisphere or reaching a pole: plain coordinate ranges instead of a polygon
+    assert "location" not in location_filter((-180, -90, 180, 90))
+    assert "location" not in location_filter((0, 0, 10, 90))
+
+
+def _midpoint_lat(a, b):
+    """Latitude of the great-circle midpoint between two [lng, lat] points"""
+    vectors = [(math.cos(math.radians(lat)) * math.cos(math.radians(lng)),
+                math.cos(math.radians(lat)) * math.sin(math.radians(lng)),
+                math.sin(math.radians(lat))) for lng, lat in (a, b)]
+    x, y, z = (u + v for u, v in zip(*vectors))
+    return math.degrees(math.atan2(z, math.hypot(x, y)))
+
+
+@pytest.mark.parametrize("bbox", [(0.0, 40.0, 60.0, 50.0), (28.8, -2.9, 30.9, -1.0), (-170.0, -60.0, 5.0, 70.0)])
+def test_polygon_edges_do_not_cut_into_the_box(bbox):
+    min_lng, min_lat, max_lng, max_lat = bbox
+    ring = location_filter(bbox)["location"]["$geoWithin"]["$geometry"]["coordinates"][0]
+    for a, b in zip(ring, ring[1:]):
+        if a[1] == b[1]:
+            # A vertex every degree, and each geodesic edge stays outside the box
+            assert abs(b[0] - a[0]) <= 1.0 + 1e-9
+            assert not min_lat < _midpoint_lat(a, b) < max_lat
+        else:
+            assert a[0] == b[0]
+
+
+def test_map_data_clusters_at_low_zoom_and_points_at_high_zoom(monkeypatch, mongo_db):
+    from beneficiary_service import BeneficiaryService
+    from index_service import INDEX_SPECS
+
+    monkeypatch.setattr(beneficiary_geo, "MAP_POINT_LIMIT", 50)
+
+    async def scenario(db):
+        await db.beneficiaries.create_indexes(INDEX_SPECS["beneficiaries"])
+        rng = random.Random(3)
+        docs = []
+        for i in range(300):
+            lng, lat = KIGALI if i < 200 else HUYE
+            docs.append({
+                "id": f"b{i}", "organization_id": ORG, "name": f"B{i}", "gender": "female",
+                "gps_longitude": lng + rng.uniform(-0.01, 0.01), "gps_latitude": lat + rng.uniform(-0.01, 0.01),
+                "risk_level": "high" if i % 10 == 0 else ("low" if i % 3 else None),
+            })
+        docs.append({"id": "nogps", "organization_id": ORG, "name": "No GPS", "gender": "male"})
+        await db.beneficiaries.insert_many(docs)
+        assert await beneficiary_geo.backfill(db, ORG, batch_size=64) == 300
+
+        service = BeneficiaryService(db)
+        # location is internal to the map queries
+        assert "location" not in (await service.get_beneficiary_by_id("b0", ORG)).model_dump()
+        listed = await service.get_beneficiaries(ORG, page_size=5)
+        assert not any("location" in b.model_dump() for b in listed["items"])
+        rwanda = "28.8,-2.9,30.9,-1.0"
+        clusters = await service.get_beneficiary_map_data(ORG, bbox=rwanda, zoom=7)
+        assert clusters["mode"] == "clusters" and clusters["map_points"] == []
+        assert [c["count"] for c in clusters["clusters"]] == [200, 100]
+        kigali = clusters["clusters"][0]
+        assert kigali["risk_levels"] == {"low": 180, "medium": 0, "high": 20, "critical": 0}
+        assert kigali["longitude"] == pytest.approx(KIGALI[0], abs=0.01)
+        min_lng, min_lat, max_lng, max_lat = kigali["bounds"]
+        assert min_lng <= kigali["longitude"] <= max_lng and min_lat <= kigali["latitude"] <= max_lat
+
+        points = await service.get_beneficiary_map_data(ORG, bbox="29.6,-2.7,29.9,-2.5", zoom=15)
+        assert points["mode"] == "points" and points["truncated"] is True and len(points["map_points"]) == 50
+
+        # Without a zoom: points while they fit, clusters otherwise
+        few = await service.get_beneficiary_map_data(ORG, bbox="30.05,-1.96,30.052,-1.94")
+        assert few["mode"] == "points" and 0 < len(few["map_points"]) <= 50
+        many = await service.get_beneficiary_map_data(ORG)
+        assert many["mode"] == "clusters" and many["total"] == 300
+
+        # Near the middle of a long latitude edge, where a plain rectangle's
+        # geodesic edge would bow 4 degrees into the box
+        await db.beneficiaries.insert_many([
+            {"id": "edge-in", "organization_id": ORG, "gps_longitude": 30.0, "gps_latitude": 40.2},
+            {"id": "edge-out", "organization_id": ORG, "gps_longitude": 30.0, "gps_latitude": 39.9999},
+        ])
+        await beneficiary_geo.backfill(db, ORG)
+        edge = await service.get_beneficiary_map_data(ORG, bbox="0,40,60,50", zoom=15)
+        assert [p["id"] for p in edge["map_points"]] == ["edge-in"]
+
+    mongo_db(scenario)
+
+
+def test_map_data_route_is_not_captured_as_a_beneficiary_id(monkeypatch, mongo_db):
+    import os
+    from types import SimpleNamespace
+
+    for dep in ("fastapi", "httpx", "jose", "passlib"):
+        pytest.importorskip(dep)
+    import httpx
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    import server
+    from beneficiary_service import BeneficiaryService
+    from index_service import INDEX_SPECS
+
+    async def scenario(db):
+        await db.beneficiaries.create_indexes(INDEX_SPECS["beneficiaries"])
+        await db.beneficiaries.insert_many([
+            {"id": f"b{i}", "organization_id": ORG, "name": f"B{i}", "gender": "female",
+             "gps_longitude": KIGALI[0] + i * 0.001, "gps_latitude": KIGALI[1]}
+            for i in range(5)
+        ])
+        await beneficiary_geo.backfill(db, ORG)
+        monkeypatch.setattr(server, "beneficiary_service", BeneficiaryService(db))
+        app = server.create_app()
+        app.dependency_overrides[server.auth_util.get_current_active_user] = lambda: SimpleNamespace(organization_id=ORG, id="u1")
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            clusters = await http.get("/api/beneficiaries/map-data", params={"bbox": "28.8,-2.9,30.9,-1.0", "zoom": 7})
+            points = await http.get("/api/beneficiaries/map-data", params={"bbox": "28.8,-2.9,30.9,-1.0", "zoom": 15})
+            bad = await http.get("/api/beneficiaries/map-data", params={"bbox": "1,2,3"})
+
+        assert clusters.status_code == 200
+        body = clusters.json()
+        assert body["mode"] == "clusters" and body["map_points"] == []
+        assert [c["count"] for c in body["clusters"]] == [5]
+        assert {"latitude", "longitude", "bounds", "risk_levels"} <= set(body["clusters"][0])
+        assert points.status_code == 200
+        body = points.json()
+        assert body["mode"] == "points" and sorted(p["id"] for p in body["map_points"]) == [f"b{i}" for i in range(5)]
+        # A bad bbox is a map-data error, not "Beneficiary not found"
+        assert bad.status_code == 400 and "not found" not in bad.json()["detail"].lower()
+
+    mongo_db(scenario)
@@ -0,0 +1,111 @@
+"""
+Beneficiary search: folded tokens and prefixes, exact identifiers, ranking
+and the backfill (MongoDB parts are skipped when no server is reachable).
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("pymongo")
+
+import beneficiary_search  # noqa: E402
+from beneficiary_search import search_fields, search_filter  # noqa: E402
+
+ORG = "org-beneficiary-search"
+
+
+def test_search_fields_fold_accents_and_store_prefixes():
+    fields = search_fields({"name": "Éric  NGABÓ", "first_name": "Eric", "national_id": "1 1990-8001", "system_id": None})
+    assert fields["search_tokens"] == ["eric", "ngabo", "1", "1990", "8001"]
+    assert {"e", "er", "eric", "n", "ngab", "ngabo", "199"} <= set(fields["search_terms"])
+    assert "ric" not in fields["search_terms"]
+    assert fields["national_id_key"] == "119908001" and fields["system_id_key"] is None
+
+
+def test_search_filter():
+    clause, words = search_filter("  ngab ÉR ")
+    assert words == ["ngab", "er"]
+    assert clause["$or"][0] == {"national_id_key": "ngaber"}
+    assert clause["$or"][2] == {"search_terms": {"$all": ["ngab", "er"]}}
+    assert search_filter(" -- ") == (None, [])
+    long = "a" * (beneficiary_search.MAX_PREFIX + 5)
+    clause, _ = search_filter(long)
+    assert clause["$or"][2]["$and"][0] == {"search_terms": {"$all": [long[:beneficiary_search.MAX_PREFIX]]}}
+
+
+def test_search_ranks_and_backfills(mongo_db):
+    from beneficiary_service import BeneficiaryService
+    from models import BeneficiaryCreate, BeneficiaryUpdate
+
+    async def scenario(db):
+        now = datetime.utcnow()
+        people = [
+            {"name": "Uwase Ngabo", "national_id": "1199080012345678", "system_id": "BEN-1"},
+            {"name": "Ngabonziza Jean", "national_id": "1199080099999999", "system_id": "BEN-2"},
+            {"name": "Jean Ngabo", "national_id": "1198870000000001", "system_id": "BEN-3"},
+            {"name": "Ángel Mutoni", "national_id": None, "system_id": "BEN-20240101-AB12"},
+        ]
+        docs = [
+            {"id": f"b{i}", "organization_id": ORG, "gender": "female", "created_at": now - timedelta(minutes=i), **p}
+            for i, p in enumerate(people)
+        ]
+        # Written before search fields existed
+        await db.beneficiaries.insert_many(docs)
+        assert await beneficiary_search.backfill(db, ORG, batch_size=3) == 4
+        assert await beneficiary_search.backfill(db, ORG) == 0
+
+        service = BeneficiaryService(db)
+
+        async def names(search, **kwargs):
+            result = await service.get_beneficiaries(ORG, search=search, **kwargs)
+            return [b.name for b in result["items"]], result
+
+        found, result = await names("ngab")
+        assert found == ["Uwase Ngabo", "Ngabonziza Jean", "Jean Ngabo"]
+        assert result["total"] == 3 and result["next_cursor"] is None
+        # Whole-word matches rank above prefix matches
+        assert (await names("ngabo"))[0] == ["Uwase Ngabo", "Jean Ngabo", "Ngabonziza Jean"]
+        assert (await names("jean ngab"))[0] == ["Ngabonziza Jean", "Jean Ngabo"]
+        assert (await names("angel"))[0] == ["Ángel Mutoni"]
+        # Exact identifiers, typed with or without punctuation
+        assert (await names("1199080012345678"))[0] == ["Uwase Ngabo"]
+        assert (await names("ben20240101ab12"))[0] == ["Ángel Mutoni"]
+        assert (await names("ngab", page=2, page_size=2))[0] == ["Jean Ngabo"]
+        assert "search_terms" not in result["items"][0].model_dump()
+
+        created = await service.create_beneficiary(BeneficiaryCreate(name="Zawadi Kamanzi", gender="female"), ORG, "u1")
+        assert (await names(created.system_id))[0] == ["Zawadi Kamanzi"]
+        await service.update_beneficiary(created.id, BeneficiaryUpdate(name="Zawadi Uwimana"), ORG, "u1")
+        assert (await names("uwim"))[0] == ["Zawadi Uwimana"]
+        assert (await names("kamanzi"))[0] == []
+
+    mongo_db(scenario)
+
+
+def test_candidates_beyond_the_limit_are_the_newest_plus_identifier_matches(monkeypatch, mongo_db):
+    monkeypatch.setattr(beneficiary_search, "SEARCH_CANDIDATE_LIMIT", 3)
+
+    async def scenario(db):
+        now = datetime.utcnow()
+        docs = [
+            {"id": f"b{i}", "organization_id": ORG, "name": f"Mukamana {i}", "system_id": f"BEN-{i}",
+             "created_at": now - timedelta(minutes=i)}
+            for i in range(8)
+        ]
+        # Oldest, and the only one whose identifier is typed
+        docs.append({"id": "id-match", "organization_id": ORG, "name": "Habimana", "system_id": "MUKA",
+                     "created_at": now - timedelta(days=1)})
+        await db.beneficiaries.insert_many([{**doc, **search_fields(doc)} for doc in docs])
+
+        for _ in range(3):
+            result = await beneficiary_search.search_page(db.beneficiaries, {"organization_id": ORG}, "muka", 1, 10)
+            assert [doc["id"] for doc in result["docs"]] == ["id-match", "b0", "b1", "b2"]
+        assert (result["total"], result["total_is_estimate"]) == (4, True)
+
+    mongo_db(scenario)
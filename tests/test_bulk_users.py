@@ -0,0 +1,138 @@
+"""
+AdminService.bulk_create_users: per-row results for existing and repeated
+emails, partial insert failures and a failed credentials email step.
+Skipped when no MongoDB server is reachable.
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("motor.motor_asyncio")
+pytest.importorskip("pydantic")
+pytest.importorskip("passlib")
+
+ORG = "org-bulk-users-test"
+
+# admin_service imports admin models that models.py does not define yet
+MISSING_MODELS = [
+    "PartnerOrganization", "PartnerOrganizationCreate", "PartnerOrganizationUpdate",
+    "PartnerPerformance", "PartnerPerformanceCreate",
+    "OrganizationBranding", "OrganizationBrandingCreate",
+    "EmailTemplate", "EmailLog",
+]
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    import models
+
+    class UserCreateAdvanced(models.SafeModel):
+        email: str
+        name: str
+        role: models.UserRole = models.UserRole.EDITOR
+        password: Optional[str] = None
+        partner_organization_id: Optional[str] = None
+        department: Optional[str] = None
+        position: Optional[str] = None
+        supervisor_id: Optional[str] = None
+        access_level: str = "standard"
+        permissions: Optional[Dict[str, bool]] = None
+        temporary_password: bool = True
+        send_credentials_email: bool = True
+
+    monkeypatch.setattr(models, "UserCreateAdvanced", UserCreateAdvanced, raising=False)
+    for name in MISSING_MODELS:
+        monkeypatch.setattr(models, name, type(name, (models.SafeModel,), {}), raising=False)
+    monkeypatch.delitem(sys.modules, "admin_service", raising=False)
+    import admin_service
+
+    return admin_service, UserCreateAdvanced
+
+
+def test_bulk_create_users_reports_every_row(admin, mongo_db):
+    admin_service, UserCreateAdvanced = admin
+    from auth import verify_password
+
+    rows = [
+        UserCreateAdvanced(email="New.One@x.org", name="New One", password="first-pass-1"),
+        UserCreateAdvanced(email="Alice@X.org", name="Alice again"),
+        UserCreateAdvanced(email="legacy@x.org", name="Legacy again"),
+        UserCreateAdvanced(email="new.one@X.ORG", name="New One twice"),
+        UserCreateAdvanced(email="rejected@x.org", name="Rejected"),
+        UserCreateAdvanced(email="two@x.org", name="Two"),
+    ]
+
+    async def scenario(db):
+        # One stored lowercased, one stored with its original casing
+        await db.users.insert_many([
+            {"id": "u-alice", "email": "alice@x.org", "organization_id": ORG},
+            {"id": "u-legacy", "email": "Legacy@x.org", "organization_id": ORG},
+        ])
+        # The validator rejects one row of the chunk, as a unique index would
+        await db.command("collMod", "users", validator={"name": {"$ne": "Rejected"}})
+
+        service = admin_service.AdminService(db)
+        got = await service.bulk_create_users(rows, ORG, "admin-1", send_emails=False, chunk_size=2)
+
+        assert [(r["row"], r["email"], r["status"]) for r in got["results"]] == [
+            (0, "New.One@x.org", "created"),
+            (1, "Alice@X.org", "skipped"),
+            (2, "legacy@x.org", "skipped"),
+            (3, "new.one@X.ORG", "skipped"),
+            (4, "rejected@x.org", "failed"),
+            (5, "two@x.org", "created"),
+        ]
+        assert got["results"][1]["error"] == "Email already registered"
+        assert got["results"][2]["error"] == "Email already registered"
+        assert got["results"][3]["error"] == "Duplicate email in batch"
+        assert "validation" in got["results"][4]["error"].lower()
+        assert got["created_count"] == 2
+        assert got["failed_count"] == 4
+        assert [u["email"] for u in got["failed_users"]] == [
+            "Alice@X.org", "legacy@x.org", "new.one@X.ORG", "rejected@x.org",
+        ]
+
+        stored = {doc["email"]: doc async for doc in db.users.find({"created_by": "admin-1"})}
+        assert sorted(stored) == ["new.one@x.org", "two@x.org"]
+        assert stored["new.one@x.org"]["id"] == got["results"][0]["user_id"]
+        assert verify_password("first-pass-1", stored["new.one@x.org"]["password_hash"])
+        created = {u["user"].id: u for u in got["created_users"]}
+        two = created[got["results"][5]["user_id"]]
+        assert verify_password(two["password"], stored["two@x.org"]["password_hash"])
+        assert await db.email_logs.count_documents({}) == 0
+
+    mongo_db(scenario)
+
+
+def test_bulk_create_users_keeps_users_when_emails_fail(admin, mongo_db, monkeypatch):
+    admin_service, UserCreateAdvanced = admin
+
+    async def fail(self, organization_id, email_queue, created_by):
+        raise RuntimeError("smtp down")
+
+    monkeypatch.setattr(admin_service.AdminService, "_send_batch_credentials_emails", fail)
+    rows = [
+        UserCreateAdvanced(email="a@x.org", name="A"),
+        UserCreateAdvanced(email="A@x.org", name="A twice"),
+        UserCreateAdvanced(email="b@x.org", name="B"),
+    ]
+
+    async def scenario(db):
+        service = admin_service.AdminService(db)
+        got = await service.bulk_create_users(rows, ORG, "admin-2")
+
+        assert [r["status"] for r in got["results"]] == ["created", "skipped", "created"]
+        warning = "User created but credentials email not sent: smtp down"
+        assert got["results"][0]["warning"] == warning
+        assert got["results"][2]["warning"] == warning
+        assert "warning" not in got["results"][1]
+        assert got["created_count"] == 2
+        assert await db.users.count_documents({"created_by": "admin-2"}) == 2
+
+    mongo_db(scenario)
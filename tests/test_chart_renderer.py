@@ -0,0 +1,59 @@
+"""Chart specs render in worker processes and are cached by content hash."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("matplotlib")
+
+from chart_renderer import ChartRenderer, chart_key, render_chart  # noqa: E402
+
+SPEC = {
+    "kind": "bar",
+    "title": "Planned vs Actual by Project",
+    "labels": ["p1", "p2"],
+    "series": [{"label": "Planned", "values": [10, 20]}, {"label": "Actual", "values": [8, 25]}],
+    "legend": True,
+}
+
+
+def test_key_covers_data_and_format():
+    changed = {**SPEC, "series": [{"label": "Planned", "values": [10, 21]}, SPEC["series"][1]]}
+    assert chart_key(SPEC) == chart_key(dict(reversed(list(SPEC.items()))))
+    assert chart_key(SPEC) != chart_key(changed)
+    assert chart_key(SPEC, "png") != chart_key(SPEC, "svg")
+
+
+def test_every_kind_renders_png_and_svg():
+    for kind in ("bar", "barh", "line", "pie", "donut"):
+        spec = {"kind": kind, "labels": ["a", "b"], "series": [{"values": [1, 2]}], "style": "seaborn-v0_8", "palette": "husl"}
+        assert render_chart(spec).startswith(b"\x89PNG")
+    svg = render_chart(SPEC, "svg")
+    assert b"<svg" in svg
+    assert render_chart(SPEC, "svg") == svg
+    with pytest.raises(ValueError):
+        render_chart({**SPEC, "kind": "radar"})
+
+
+def test_repeated_specs_render_once_in_the_pool():
+    renderer = ChartRenderer(max_workers=1)
+
+    async def scenario():
+        first, second = await asyncio.gather(renderer.render(SPEC), renderer.render(SPEC))
+        assert first == second and first.startswith(b"\x89PNG")
+        assert renderer.rendered == 1
+        await renderer.render(dict(SPEC))
+        assert renderer.rendered == 1
+        images = await renderer.render_many(SPEC, None, {**SPEC, "kind": "radar"})
+        assert images[0] == first and images[1] is None and images[2] is None
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        renderer.shutdown()
+    assert renderer.stats()["hits"] >= 2
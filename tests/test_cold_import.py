@@ -0,0 +1,45 @@
+"""Cold import budget for the API module, measured with python -X importtime."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Cumulative microseconds `import server` may take in a fresh interpreter
+COLD_IMPORT_BUDGET_US = int(os.environ.get("COLD_IMPORT_BUDGET_US", "3000000"))
+# Reporting/plotting stacks and the AI client must be imported on first use
+LAZY_MODULES = ("pandas", "matplotlib", "reportlab", "openpyxl", "ai_service", "emergentintegrations")
+
+for dep in ("fastapi", "motor", "jose", "passlib"):
+    pytest.importorskip(dep)
+
+
+def _importtime():
+    env = {**os.environ, "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://localhost:27017")}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def test_server_cold_import_within_budget():
+    timings = _importtime()
+    assert "server" in timings
+    assert timings["server"] <= COLD_IMPORT_BUDGET_US, (
+        f"import server took {timings['server'] / 1e6:.2f}s, budget {COLD_IMPORT_BUDGET_US / 1e6:.2f}s"
+    )
+    eager = sorted(name for name in timings if name.split(".")[0] in LAZY_MODULES)
+    assert not eager, f"imported at module load: {eager[:5]}"
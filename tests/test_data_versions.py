@@ -0,0 +1,31 @@
+"""Version counters that key the analytics caches."""
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from data_versions import DataVersions  # noqa: E402
+
+
+def test_bump_changes_only_the_written_collection_and_org():
+    versions = DataVersions()
+    before = versions.get("org-a", "projects", "expenses")
+    other_org = versions.get("org-b", "projects", "expenses")
+
+    versions.bump("org-a", "expenses")
+
+    after = versions.get("org-a", "projects", "expenses")
+    assert after != before
+    assert after[1] == before[1]  # projects untouched
+    assert versions.get("org-b", "projects", "expenses") == other_org
+
+
+def test_bump_without_organization_invalidates_everyone():
+    versions = DataVersions()
+    a = versions.get("org-a", "projects")
+    b = versions.get("org-b", "expenses")
+    versions.bump(None, "projects")
+    assert versions.get("org-a", "projects") != a
+    assert versions.get("org-b", "expenses") != b
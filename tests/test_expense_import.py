@@ -0,0 +1,112 @@
+"""
+Expense import pipeline: parsing and dedupe helpers, plus an end-to-end
+import against MongoDB (skipped when no server is reachable).
+"""
+
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("pymongo")
+
+import expense_import  # noqa: E402
+from expense_import import ExpenseImporter, dedupe_key  # noqa: E402
+
+ORG = "org-import-test"
+
+CSV = (
+    "Date,Project_ID,Vendor,Amount,Invoice_No,Notes\n"
+    "2024-03-01,p1,Acme,100.50,INV-1,first\n"
+    "2024-03-01,p1,Acme,100.50,INV-1,same invoice again\n"
+    "not-a-date,p1,Acme,10,INV-2,\n"
+    "2024-03-02,p1,Acme,,INV-3,\n"
+    "2024-03-03,p2,Beta,20,,no invoice\n"
+    "2024-03-03,p2,Beta,20,,no invoice twice\n"
+    "2024-03-04,p1,Acme,5,INV-9,already in ledger\n"
+)
+
+
+def test_dedupe_key_normalizes_precision_and_skips_missing_invoice():
+    a = dedupe_key({"invoice_no": "X", "vendor": "V", "amount": 1.004, "date": datetime(2024, 1, 1, 0, 0, 0, 123456)})
+    b = dedupe_key({"invoice_no": "X", "vendor": "V", "amount": 1.0, "date": datetime(2024, 1, 1, 0, 0, 0, 123000)})
+    assert a == b
+    assert dedupe_key({"invoice_no": None, "amount": 1, "date": datetime(2024, 1, 1)}) is None
+
+
+def test_csv_rows_lowercase_headers(tmp_path):
+    path = tmp_path / "ledger.csv"
+    path.write_text("﻿" + CSV)
+    rows = list(expense_import._csv_rows(str(path)))
+    assert len(rows) == 7
+    assert rows[0]["project_id"] == "p1" and rows[0]["invoice_no"] == "INV-1"
+
+
+class _Upload:
+    def __init__(self, filename, data):
+        self.filename = filename
+        self._data = data
+
+    async def read(self, size):
+        chunk, self._data = self._data[:size], self._data[size:]
+        return chunk
+
+
+def test_import_end_to_end(monkeypatch, mongo_db):
+    from finance_rollups import FinanceRollups
+
+    monkeypatch.setattr(expense_import, "IMPORT_BATCH_SIZE", 3)
+    monkeypatch.setattr(expense_import, "SPOOL_CHUNK_SIZE", 16)
+
+    async def scenario(db):
+        await db.expenses.insert_one({
+            "organization_id": ORG, "project_id": "p1", "vendor": "Acme", "amount": 5.0,
+            "invoice_no": "INV-9", "date": datetime(2024, 3, 4),
+        })
+        importer = ExpenseImporter(db, FinanceRollups(db))
+        with pytest.raises(ValueError):
+            await importer.start(ORG, "u1", _Upload("ledger.pdf", b""))
+
+        job = await importer.start(ORG, "u1", _Upload("ledger.csv", CSV.encode()))
+        await asyncio.gather(*importer._tasks)
+
+        status = await importer.get_job(ORG, job["id"])
+        assert status["status"] == "completed"
+        assert (status["rows_processed"], status["inserted"], status["duplicates"], status["failed"]) == (7, 3, 2, 2)
+        errors = [e async for e in importer.error_rows(ORG, job["id"])]
+        assert [e["row"] for e in errors] == [3, 4, 5, 8]
+        rollup_total = sum([r["spent"] async for r in db.finance_rollups.find({"organization_id": ORG})])
+        assert rollup_total == pytest.approx(140.5)
+
+    mongo_db(scenario)
+
+
+def test_abandoned_jobs_are_failed_and_spool_removed(tmp_path, mongo_db):
+    from datetime import timedelta
+
+    from finance_rollups import FinanceRollups
+
+    async def scenario(db):
+        spool = tmp_path / "expense_import_dead.csv"
+        spool.write_text(CSV)
+        stale = datetime.utcnow() - timedelta(minutes=1)
+        await db.expense_import_jobs.insert_many([
+            {"id": "dead", "organization_id": ORG, "status": "running", "worker": "gone",
+             "lease_until": stale, "spool_path": str(spool)},
+            {"id": "alive", "organization_id": ORG, "status": "running", "worker": "other",
+             "lease_until": datetime.utcnow() + timedelta(minutes=5), "spool_path": None},
+        ])
+        importer = ExpenseImporter(db, FinanceRollups(db))
+
+        status = await importer.get_job(ORG, "dead")
+        assert status["status"] == "failed" and "spool_path" not in status
+        assert not spool.exists()
+        assert await importer.fail_expired() == 0
+        assert (await importer.get_job(ORG, "alive"))["status"] == "running"
+
+    mongo_db(scenario)
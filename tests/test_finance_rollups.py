@@ -0,0 +1,143 @@
+"""
+finance_rollups parity: incremental $inc maintenance must match a rebuild
+from raw expenses, and spent_by() must match a direct aggregation for ranges
+that cut through months. Skipped when no MongoDB server is reachable.
+"""
+
+import asyncio
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("motor.motor_asyncio")
+
+from finance_rollups import FinanceRollups  # noqa: E402
+
+ORG = "org-rollup-test"
+
+
+def _random_expense(rng: random.Random) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "organization_id": ORG,
+        "project_id": rng.choice(["p1", "p2"]),
+        "activity_id": rng.choice(["a1", "a2", None]),
+        "funding_source": rng.choice(["USAID", "UNDP"]),
+        "date": datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 180), hours=rng.randint(0, 23)),
+        "amount": round(rng.uniform(1, 500), 2),
+        "approval_status": rng.choice(["draft", "pending", "approved"]),
+    }
+
+
+def test_incremental_matches_rebuild(mongo_db):
+    async def scenario(db):
+        rollups = FinanceRollups(db)
+        rng = random.Random(7)
+        docs = []
+        for _ in range(120):
+            doc = _random_expense(rng)
+            await db.expenses.insert_one(doc)
+            await rollups.apply_insert(doc)
+            docs.append(doc)
+        for doc in rng.sample(docs, 30):
+            changes = {"amount": round(rng.uniform(1, 500), 2), "approval_status": "approved",
+                       "date": doc["date"] + timedelta(days=rng.randint(-40, 40))}
+            before = await db.expenses.find_one_and_update({"id": doc["id"]}, {"$set": changes})
+            await rollups.apply_update(before, {**before, **changes})
+        for doc in rng.sample(docs, 20):
+            before = await db.expenses.find_one_and_delete({"id": doc["id"]})
+            if before:
+                await rollups.apply_delete(before)
+
+        assert await rollups.verify(ORG) == []
+
+        start, end = datetime(2024, 2, 10, 12), datetime(2024, 5, 3)
+        got = await rollups.spent_by(ORG, ["project_id"], {}, start, end)
+        expected = {}
+        async for row in db.expenses.aggregate([
+            {"$match": {"organization_id": ORG, "date": {"$gte": start, "$lte": end}}},
+            {"$group": {"_id": "$project_id", "spent": {"$sum": "$amount"}, "n": {"$sum": 1}}},
+        ]):
+            expected[(row["_id"],)] = (row["spent"], row["n"])
+        assert set(got) == set(expected)
+        for key, (spent, n) in expected.items():
+            assert got[key]["spent"] == pytest.approx(spent)
+            assert got[key]["transactions"] == n
+
+    mongo_db(scenario)
+
+
+def test_rebuild_repairs_drift(mongo_db):
+    async def scenario(db):
+        rollups = FinanceRollups(db)
+        rng = random.Random(11)
+        await db.expenses.insert_many([_random_expense(rng) for _ in range(50)])
+        assert await rollups.verify(ORG) != []
+        await rollups.rebuild(ORG)
+        assert await rollups.verify(ORG) == []
+
+    mongo_db(scenario)
+
+
+def test_spent_by_accepts_timezone_aware_bounds(mongo_db):
+    async def scenario(db):
+        rollups = FinanceRollups(db)
+        rng = random.Random(5)
+        for _ in range(40):
+            doc = _random_expense(rng)
+            await db.expenses.insert_one(doc)
+            await rollups.apply_insert(doc)
+
+        naive = await rollups.spent_by(ORG, ["project_id"], {}, datetime(2024, 3, 15), datetime(2024, 5, 1, 10))
+        kigali = timezone(timedelta(hours=2))
+        aware = await rollups.spent_by(
+            ORG, ["project_id"], {},
+            datetime(2024, 3, 15, tzinfo=timezone.utc), datetime(2024, 5, 1, 12, tzinfo=kigali),
+        )
+        assert aware == naive
+
+    mongo_db(scenario)
+
+
+def test_concurrent_approvals_count_once(mongo_db):
+    from finance_service import FinanceService
+
+    async def scenario(db):
+        service = FinanceService(db)
+        rng = random.Random(3)
+        docs = []
+        for _ in range(10):
+            doc = {**_random_expense(rng), "approval_status": "draft"}
+            await db.expenses.insert_one(doc)
+            await service.rollups.apply_insert(doc)
+            docs.append(doc)
+        for doc in docs:
+            await service.submit_expense_for_approval(ORG, doc["id"], "u1")
+
+        async def attempt(call):
+            try:
+                return await call
+            except ValueError:
+                return None
+
+        for doc in docs:
+            results = await asyncio.gather(
+                attempt(service.approve_expense(ORG, doc["id"], "a1", "Admin")),
+                attempt(service.approve_expense(ORG, doc["id"], "a2", "Director")),
+                attempt(service.reject_expense(ORG, doc["id"], "a3", "Admin", "duplicate")),
+            )
+            assert sum(r is not None for r in results) == 1
+
+        assert await service.rollups.verify(ORG) == []
+        with pytest.raises(ValueError):
+            await service.approve_expense(ORG, docs[0]["id"], "a1", "Admin")
+        assert await service.approve_expense(ORG, "missing", "a1", "Admin") is None
+
+    mongo_db(scenario)
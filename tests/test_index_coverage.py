@@ -0,0 +1,125 @@
+"""
+Index coverage test: every hot service query must be served by an index.
+
+Runs explain() for the query shapes issued by the services against a scratch
+database provisioned from index_service.INDEX_SPECS and fails on COLLSCAN.
+Skipped when no MongoDB server is reachable.
+"""
+
+import json
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pymongo = pytest.importorskip("pymongo")
+from bson import json_util  # noqa: E402
+
+from index_service import INDEX_SPECS  # noqa: E402
+from tests.mongo_helpers import mongo_url  # noqa: E402
+
+ORG = "org-index-test"
+NOW = datetime.utcnow()
+
+# (collection, filter, sort) mirroring the services' find() / $match shapes
+QUERY_SHAPES = [
+    ("expenses", {"organization_id": ORG, "project_id": "p1", "date": {"$gte": NOW}}, [("date", -1)]),
+    ("expenses", {"organization_id": ORG}, [("date", -1)]),
+    ("expenses", {"organization_id": ORG, "funding_source": "USAID"}, None),
+    ("expenses", {"organization_id": ORG, "approval_status": "pending"}, [("created_at", 1)]),
+    ("expenses", {"project_id": "p1", "approval_status": "approved"}, None),
+    ("expenses", {"organization_id": ORG, "invoice_no": {"$in": ["INV-1", "INV-2"]}}, None),
+    ("expense_import_jobs", {"organization_id": ORG, "id": "j1"}, None),
+    ("expense_import_jobs", {"status": {"$in": ["queued", "running"]}, "lease_until": {"$lt": NOW}}, None),
+    ("expense_import_errors", {"organization_id": ORG, "job_id": "j1"}, [("row", 1)]),
+    ("generated_reports", {"dedupe_key": "k", "active": True}, None),
+    ("generated_reports", {"status": "queued", "organization_id": {"$nin": [ORG]}}, [("created_at", 1)]),
+    ("generated_reports", {"status": "running", "lease_until": {"$lt": NOW}}, None),
+    ("generated_reports", {"organization_id": ORG, "id": "r1"}, None),
+    ("generated_reports", {"organization_id": ORG, "project_id": "p1"}, [("created_at", -1)]),
+    ("llm_cache", {"key": "k", "expires_at": {"$gt": NOW}}, None),
+    ("report_narratives", {"organization_id": ORG, "key": "k"}, None),
+    ("report_narratives", {"organization_id": ORG, "id": "n1"}, None),
+    ("report_narratives", {"id": "n1", "owner": "o", "generation": 1}, None),
+    ("activities", {"organization_id": ORG, "project_id": "p1"}, [("start_date", 1)]),
+    ("activities", {"organization_id": ORG}, [("start_date", 1)]),
+    ("activities", {"organization_id": ORG}, [("updated_at", -1)]),
+    ("activities", {"organization_id": ORG, "end_date": {"$lt": NOW}, "status": {"$ne": "completed"}}, None),
+    ("activities", {"organization_id": ORG, "created_at": {"$gte": NOW, "$lte": NOW}}, None),
+    ("projects", {"organization_id": ORG, "created_at": {"$gte": NOW, "$lte": NOW}}, None),
+    ("activities", {"project_id": "p1"}, None),
+    ("beneficiaries", {"organization_id": ORG, "project_ids": "p1"}, [("created_at", -1)]),
+    ("beneficiaries", {"organization_id": ORG, "project_ids": "p1", "enrollment_date": {"$lte": NOW}}, None),
+    ("beneficiaries", {"organization_id": ORG}, [("created_at", -1)]),
+    ("beneficiaries", {"organization_id": ORG, "status": "active"}, None),
+    ("beneficiaries", {"project_ids": "p1"}, None),
+    ("beneficiaries", {"organization_id": ORG, "$or": [
+        {"national_id_key": "uwase"}, {"system_id_key": "uwase"}, {"search_terms": {"$all": ["uwase"]}},
+    ]}, None),
+    ("beneficiaries", {"organization_id": ORG, "location": {"$geoWithin": {"$geometry": {
+        "type": "Polygon", "coordinates": [[[28.8, -2.9], [30.9, -2.9], [30.9, -1.0], [28.8, -1.0], [28.8, -2.9]]],
+    }}}}, None),
+    ("service_records", {"beneficiary_id": "b1", "service_date": {"$gte": NOW}}, None),
+    ("service_records", {"organization_id": ORG}, [("service_date", -1)]),
+    ("service_records", {"organization_id": ORG, "project_id": "p1"}, [("service_date", -1)]),
+    ("beneficiary_kpis", {"organization_id": ORG, "beneficiary_id": "b1"}, [("measurement_date", -1)]),
+    ("projects", {"organization_id": ORG, "status": "active"}, None),
+    ("finance_rollups", {"organization_id": ORG, "project_id": "p1", "month": {"$gte": NOW}}, None),
+    ("finance_rollups", {"organization_id": ORG, "month": {"$gte": NOW}}, None),
+    ("budget_items", {"organization_id": ORG, "project_id": "p1"}, None),
+    ("kpi_indicators", {"organization_id": ORG, "project_id": "p1"}, None),
+    ("surveys", {"organization_id": ORG}, [("updated_at", -1)]),
+    ("users", {"email": "someone@example.org"}, None),
+]
+
+# List endpoints paginated with pagination.paginate (sort key + _id)
+KEYSET_SHAPES = [
+    ("expenses", {"organization_id": ORG, "project_id": "p1"}, "date", -1),
+    ("expenses", {"organization_id": ORG}, "date", -1),
+    ("activities", {"organization_id": ORG, "project_id": "p1"}, "start_date", 1),
+    ("activities", {"organization_id": ORG}, "start_date", 1),
+    ("beneficiaries", {"organization_id": ORG, "project_ids": "p1"}, "created_at", -1),
+    ("beneficiaries", {"organization_id": ORG}, "created_at", -1),
+    ("service_records", {"organization_id": ORG}, "service_date", -1),
+    ("service_records", {"organization_id": ORG, "project_id": "p1"}, "service_date", -1),
+    ("surveys", {"organization_id": ORG}, "updated_at", -1),
+]
+
+
+@pytest.fixture(scope="module")
+def scratch_db():
+    client = pymongo.MongoClient(mongo_url(), serverSelectionTimeoutMS=1500)
+    try:
+        client.admin.command("ping")
+    except Exception:
+        pytest.skip("MongoDB not reachable")
+    name = f"datarw_index_test_{uuid.uuid4().hex[:8]}"
+    db = client[name]
+    for collection, models in INDEX_SPECS.items():
+        db[collection].insert_one({"organization_id": ORG})
+        db[collection].create_indexes(models)
+    yield db
+    client.drop_database(name)
+    client.close()
+
+
+@pytest.mark.parametrize("collection,query,sort", QUERY_SHAPES)
+def test_query_shape_uses_index(scratch_db, collection, query, sort):
+    cursor = scratch_db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = json_util.dumps(cursor.explain())
+    assert "COLLSCAN" not in plan, f"{collection} {json.dumps(query, default=str)} falls back to COLLSCAN"
+
+
+@pytest.mark.parametrize("collection,query,field,direction", KEYSET_SHAPES)
+def test_keyset_sort_is_index_ordered(scratch_db, collection, query, field, direction):
+    cursor = scratch_db[collection].find(query).sort([(field, direction), ("_id", direction)])
+    plan = json_util.dumps(cursor.explain()["queryPlanner"]["winningPlan"])
+    assert "COLLSCAN" not in plan
+    assert '"SORT"' not in plan, f"{collection} keyset sort on {field} needs an in-memory sort"
@@ -0,0 +1,42 @@
+"""
+Trend bucket helpers in kpi_service must line up with $dateTrunc
+(weeks start Monday, quarters start Jan/Apr/Jul/Oct) so $densify bounds
+and labels match the buckets the server produces.
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+kpi_service = pytest.importorskip("kpi_service")
+
+
+@pytest.mark.parametrize("granularity", kpi_service.TREND_GRANULARITIES)
+def test_buckets_are_contiguous_and_contain_their_dates(granularity):
+    value = datetime(2023, 11, 15, 13, 30)
+    bucket = kpi_service._bucket_start(value, granularity)
+    for _ in range(60):
+        nxt = kpi_service._next_bucket(bucket, granularity)
+        assert bucket < nxt
+        assert kpi_service._bucket_start(nxt - timedelta(microseconds=1), granularity) == bucket
+        assert kpi_service._bucket_start(nxt, granularity) == nxt
+        bucket = nxt
+
+
+def test_bucket_alignment():
+    value = datetime(2024, 5, 19, 8)  # a Sunday
+    assert kpi_service._bucket_start(value, "week") == datetime(2024, 5, 13)
+    assert kpi_service._bucket_start(value, "month") == datetime(2024, 5, 1)
+    assert kpi_service._bucket_start(value, "quarter") == datetime(2024, 4, 1)
+    assert kpi_service._bucket_label(datetime(2024, 4, 1), "quarter") == "Q2 2024"
+    assert kpi_service._bucket_label(datetime(2024, 5, 1), "month") == "May 2024"
+
+
+def test_aware_dates_are_normalised_to_utc():
+    assert kpi_service._parse_date("2024-03-01T02:00:00+02:00") == datetime(2024, 3, 1)
+    assert kpi_service._parse_date("2024-03-01T00:00:00Z") == datetime(2024, 3, 1)
@@ -0,0 +1,201 @@
+"""LLM gateway: prompt-hash caching, shared calls, deadlines, streaming and the stub provider."""
+
+import asyncio
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("pydantic")
+
+from pydantic import BaseModel  # noqa: E402
+
+from llm_gateway import LLMGateway, LLMUnavailable, StubProvider, prompt_key  # noqa: E402
+
+
+class Insight(BaseModel):
+    risk_level: str
+    recommendations: List[str]
+    confidence: float
+    notes: Optional[List[str]] = None
+
+
+class _Provider:
+    name = "test"
+
+    def __init__(self, delay=0.0, text="answer"):
+        self.delay = delay
+        self.text = text
+        self.calls = 0
+        self.running = {}
+        self.peak = {}
+
+    async def complete(self, messages, max_tokens, temperature, schema):
+        org = messages[0]["content"].split()[0]
+        self.calls += 1
+        self.running[org] = self.running.get(org, 0) + 1
+        self.peak[org] = max(self.peak.get(org, 0), self.running[org])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running[org] -= 1
+        return self.text
+
+
+def _msg(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_prompt_key_ignores_template_whitespace_only():
+    assert prompt_key("m", _msg("Summary:\n    a   b")) == prompt_key("m", _msg("Summary: a b"))
+    assert prompt_key("m", _msg("a")) != prompt_key("other", _msg("a"))
+    assert prompt_key("m", _msg("a")) != prompt_key("m", _msg("a"), schema=Insight)
+    assert prompt_key("m", _msg("a"), temperature=0.7) != prompt_key("m", _msg("a"), temperature=0.2)
+
+
+def test_identical_calls_share_one_request_then_hit_cache():
+    provider = _Provider(delay=0.02)
+    gateway = LLMGateway(provider=provider)
+
+    async def scenario():
+        results = await asyncio.gather(*(gateway.complete("org", _msg("org  same"), fallback=lambda: "basic") for _ in range(5)))
+        assert [r.value for r in results] == ["answer"] * 5
+        assert {r.source for r in results} == {"llm"}
+        again = await gateway.complete("org", _msg("org same"), fallback=lambda: "basic")
+        assert (again.value, again.source) == ("answer", "cache")
+        assert provider.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_deadline_falls_back_and_late_answer_is_cached():
+    provider = _Provider(delay=0.2)
+    gateway = LLMGateway(provider=provider)
+
+    async def scenario():
+        result = await gateway.complete("org", _msg("org slow"), fallback=lambda: "basic", deadline=0.05)
+        assert (result.value, result.source, result.ai_used) == ("basic", "fallback", False)
+        assert "0s" in result.error
+        await asyncio.sleep(0.3)
+        late = await gateway.complete("org", _msg("org slow"), fallback=lambda: "basic", deadline=0.05)
+        assert (late.value, late.source) == ("answer", "cache")
+
+    asyncio.run(scenario())
+    assert gateway.stats()["timeouts"] == 1
+
+
+def test_per_org_limit_and_failures_fall_back():
+    provider = _Provider(delay=0.02, text="not json")
+    gateway = LLMGateway(provider=provider, per_org=1)
+
+    async def scenario():
+        await asyncio.gather(*(
+            gateway.complete(org, _msg(f"{org} prompt {i}"), fallback=lambda: "basic")
+            for org in ("a", "b") for i in range(3)
+        ))
+        assert provider.peak == {"a": 1, "b": 1}
+
+        bad = await gateway.complete("a", _msg("a insight"), schema=Insight, fallback=lambda: None)
+        assert bad.source == "fallback" and bad.value is None
+        # Responses that do not match the schema are not cached
+        await gateway.complete("a", _msg("a insight"), schema=Insight, fallback=lambda: None)
+        assert provider.calls == 8
+
+    asyncio.run(scenario())
+
+
+def test_no_provider_uses_fallback():
+    gateway = LLMGateway(provider=None)
+    result = asyncio.run(gateway.complete("org", _msg("x"), fallback=lambda: "basic"))
+    assert (result.value, result.source) == ("basic", "fallback")
+
+
+def test_stub_provider_is_deterministic_and_fills_schemas():
+    gateway = LLMGateway(provider=StubProvider())
+    other = LLMGateway(provider=StubProvider())
+
+    async def scenario():
+        first = await gateway.complete("org", _msg("Analyze"), schema=Insight, fallback=lambda: None)
+        second = await other.complete("org", _msg("Analyze"), schema=Insight, fallback=lambda: None)
+        assert first.source == "llm" and first.value == second.value
+        assert isinstance(first.value.confidence, float) and len(first.value.recommendations) == 3
+        text = await gateway.complete("org", _msg("Write a narrative"), fallback=lambda: "")
+        assert text.value.startswith("# Summary")
+
+    asyncio.run(scenario())
+
+
+def test_stream_yields_chunks_and_caches_the_text():
+    gateway = LLMGateway(provider=StubProvider())
+
+    async def collect(**params):
+        return [chunk async for chunk in gateway.stream("org", _msg("Write a narrative"), **params)]
+
+    async def scenario():
+        chunks = await collect(max_tokens=2500)
+        assert len(chunks) > 10
+        # The streamed text is the cached completion, replayed as one chunk
+        assert await collect(max_tokens=2500) == ["".join(chunks)]
+        result = await gateway.complete("org", _msg("Write a narrative"), fallback=lambda: "", max_tokens=2500)
+        assert (result.value, result.source) == ("".join(chunks), "cache")
+
+    asyncio.run(scenario())
+    assert gateway.stats()["llm_calls"] == 1
+
+
+def test_stream_without_provider_or_first_chunk_raises():
+    class Silent:
+        name = "silent"
+
+        async def stream(self, messages, max_tokens, temperature):
+            await asyncio.sleep(1)
+            yield "late"
+
+    async def drain(gateway):
+        return [chunk async for chunk in gateway.stream("org", _msg("x"), first_chunk_deadline=0.05)]
+
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(drain(LLMGateway(provider=None)))
+    gateway = LLMGateway(provider=Silent())
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(drain(gateway))
+    assert gateway.stats()["timeouts"] == 1
+
+
+def test_stream_of_whole_answer_waits_for_deadline_and_shares_the_call():
+    provider = _Provider(delay=0.1, text="whole narrative")
+    provider.incremental = False
+    gateway = LLMGateway(provider=provider)
+
+    async def drain(text, deadline):
+        return [chunk async for chunk in gateway.stream("org", _msg(text), first_chunk_deadline=0.01, deadline=deadline)]
+
+    async def scenario():
+        # The first-chunk deadline does not apply to a single-chunk answer
+        assert await drain("org a", 1.0) == ["whole narrative"]
+        # A timed-out stream leaves the shared call running to fill the cache
+        with pytest.raises(LLMUnavailable):
+            await drain("org b", 0.01)
+        await asyncio.sleep(0.15)
+        assert await drain("org b", 0.01) == ["whole narrative"]
+
+    asyncio.run(scenario())
+    assert provider.calls == 2 and gateway.stats()["timeouts"] == 1
+
+
+@pytest.mark.parametrize("provider", ["stub", "none"])
+def test_finance_insights_payload(provider):
+    pytest.importorskip("motor")
+    from ai_service import FinanceAI
+
+    gateway = LLMGateway(provider=StubProvider() if provider == "stub" else None)
+    payload = {"summary": {"total": 3, "page": 1}, "anomalies": [{"id": "e1", "amount": 2000000}]}
+    result = asyncio.run(FinanceAI(gateway).finance_insights(payload, "org"))
+    assert result["ai_used"] is (provider == "stub")
+    assert result["recommendations"] and "risk_level" in result
+    if provider == "none":
+        assert result["risk_level"] == "medium"
@@ -0,0 +1,77 @@
+"""
+Cursor pagination must return the same documents, in the same order, as
+offset pagination, including documents whose sort key is null, missing or
+stored with another BSON type. Skipped when no MongoDB server is reachable.
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("motor.motor_asyncio")
+
+ORG = "org-keyset-test"
+
+
+async def _seed(db, now: datetime):
+    rng = random.Random(2)
+    docs = []
+    for i in range(60):
+        doc = {"id": f"d{i}", "organization_id": ORG}
+        shape = rng.randint(0, 5)
+        day = now - timedelta(days=rng.randint(0, 10))
+        if shape <= 1:
+            doc["date"] = day
+        elif shape == 2:
+            # Legacy rows kept the date as an ISO string
+            doc["date"] = day.date().isoformat()
+        elif shape == 3:
+            doc["date"] = None
+        elif shape == 4:
+            doc["date"] = rng.randint(0, 3)
+        docs.append(doc)
+    await db.expenses.insert_many(docs)
+
+
+async def _pages_by_cursor(collection, direction, page_size):
+    from pagination import paginate
+
+    ids, cursor = [], None
+    while True:
+        result = await paginate(collection, {"organization_id": ORG}, "date", direction,
+                                page_size=page_size, cursor=cursor)
+        ids.extend(doc["id"] for doc in result["docs"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+async def _pages_by_offset(collection, direction, page_size):
+    from pagination import paginate
+
+    ids, page = [], 1
+    while True:
+        result = await paginate(collection, {"organization_id": ORG}, "date", direction,
+                                page=page, page_size=page_size)
+        ids.extend(doc["id"] for doc in result["docs"])
+        if result["next_cursor"] is None:
+            return ids
+        page += 1
+
+
+@pytest.mark.parametrize("direction", [-1, 1])
+@pytest.mark.parametrize("page_size", [1, 4, 7])
+def test_cursor_pages_match_offset_pages(mongo_db, direction, page_size):
+    async def scenario(db):
+        await _seed(db, datetime.utcnow())
+        by_offset = await _pages_by_offset(db.expenses, direction, page_size)
+        assert len(by_offset) == 60
+        assert await _pages_by_cursor(db.expenses, direction, page_size) == by_offset
+
+    mongo_db(scenario)
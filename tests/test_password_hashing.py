@@ -0,0 +1,43 @@
+"""Password hashing runs on auth's bounded pool and sheds load with 503."""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("jose")
+pytest.importorskip("passlib")
+
+from fastapi import HTTPException  # noqa: E402
+
+import auth  # noqa: E402
+
+
+def test_hashing_runs_off_the_event_loop_thread():
+    loop_thread = threading.get_ident()
+    worker_thread = asyncio.run(auth._run_hashing(threading.get_ident))
+    assert worker_thread != loop_thread
+
+
+def test_saturated_pool_rejects_with_503(monkeypatch):
+    monkeypatch.setattr(auth, "PASSWORD_HASH_MAX_PENDING", 0)
+    rejected = auth.password_hashing_stats()["rejected"]
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(auth.verify_password_async("pw", "hash"))
+    assert exc.value.status_code == 503
+    assert auth.password_hashing_stats()["rejected"] == rejected + 1
+    assert auth.password_hashing_stats()["pending"] == 0
+
+
+def test_bulk_hashing_preserves_order():
+    pytest.importorskip("bcrypt")
+    passwords = [f"pw-{i}" for i in range(5)]
+    hashes = asyncio.run(auth.hash_passwords_bulk(passwords, chunk_size=2))
+    assert len(hashes) == 5
+    assert all(auth.verify_password(p, h) for p, h in zip(passwords, hashes))
+    assert asyncio.run(auth.hash_passwords_bulk([])) == []
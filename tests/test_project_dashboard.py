@@ -0,0 +1,307 @@
+"""
+Projects dashboard parity: ProjectService.get_dashboard_data ($facet per
+collection) must equal the per-query computation it replaced on seeded data.
+Skipped when no MongoDB server is reachable.
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("motor.motor_asyncio")
+
+ORG = "org-dashboard-test"
+
+ACHIEVEMENT = {"$addFields": {
+    "achievement_rate": {
+        "$cond": [
+            {"$and": [{"$ne": ["$target_value", None]}, {"$gt": ["$target_value", 0]}]},
+            {"$multiply": [{"$divide": ["$current_value", "$target_value"]}, 100]},
+            0
+        ]
+    }
+}}
+
+
+def _close(a, b, path="root"):
+    """Equality with float tolerance, recursing into dicts and lists"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        assert set(a) == set(b), path
+        for key in a:
+            _close(a[key], b[key], f"{path}.{key}")
+    elif isinstance(a, list) and isinstance(b, list):
+        assert len(a) == len(b), path
+        for i, (x, y) in enumerate(zip(a, b)):
+            _close(x, y, f"{path}[{i}]")
+    elif isinstance(a, float) or isinstance(b, float):
+        assert a == pytest.approx(b, rel=1e-9, abs=1e-9), path
+    else:
+        assert a == b, path
+
+
+async def _seed(db, now: datetime):
+    rng = random.Random(6)
+    # Half-day offsets keep every date clear of the boundaries the two runs compute separately
+    day = lambda n: now + timedelta(days=n, hours=12)
+    projects = []
+    for i in range(14):
+        start = day(-rng.randint(60, 400))
+        created = start - timedelta(days=rng.randint(0, 20))
+        projects.append({
+            "id": f"p{i}", "organization_id": ORG, "name": f"Project {i}",
+            "status": rng.choice(["planned", "active", "completed", "on_hold", "cancelled"]),
+            "budget_total": rng.choice([0, rng.randint(1, 50) * 1000]),
+            "budget_utilized": rng.randint(0, 60) * 1000,
+            "start_date": start, "end_date": day(rng.randint(-40, 90)),
+            "created_at": created, "updated_at": created + timedelta(days=rng.randint(10, 300)),
+        })
+    activities = []
+    for i in range(40):
+        activity = {
+            "id": f"a{i}", "organization_id": ORG, "project_id": f"p{i % 14}", "name": f"Activity {i}",
+            "status": rng.choice(["not_started", "in_progress", "completed", "delayed"]),
+            "progress_percentage": rng.randint(0, 100),
+            "budget_allocated": rng.randint(0, 20) * 500,
+            "start_date": day(-rng.randint(0, 120)), "end_date": day(rng.randint(-60, 60)),
+            "updated_at": day(-rng.randint(0, 80)) + timedelta(minutes=i),
+        }
+        if i % 9 == 0:
+            del activity["budget_allocated"]
+        activities.append(activity)
+    kpis = [{
+        "id": f"k{i}", "organization_id": ORG, "project_id": f"p{i % 14}",
+        "target_value": rng.choice([None, 0, 50, 80, 200]), "current_value": rng.randint(0, 150),
+        "updated_at": day(-rng.randint(0, 300)),
+    } for i in range(20)]
+    budget_items = [{
+        "id": f"bi{i}", "organization_id": ORG, "project_id": f"p{i % 14}",
+        "category": rng.choice(["staff", "travel", "equipment", None]),
+        "budgeted_amount": rng.randint(1, 40) * 250, "created_at": day(-rng.randint(0, 300)),
+    } for i in range(25)]
+    beneficiaries = [{"id": f"b{i}", "organization_id": ORG, "name": f"B{i}"} for i in range(9)]
+
+    await db.projects.insert_many(projects)
+    await db.activities.insert_many(activities)
+    await db.kpi_indicators.insert_many(kpis)
+    await db.budget_items.insert_many(budget_items)
+    await db.beneficiaries.insert_many(beneficiaries)
+    # Another organization's data must not leak into the dashboard
+    await db.projects.insert_one({"id": "other", "organization_id": "org-other", "status": "active", "budget_total": 5})
+
+
+async def _baseline(db, organization_id: str):
+    """The per-query dashboard computation that the $facet version replaced"""
+    from models import ProjectDashboardData, ProjectStatus
+
+    org = {"organization_id": organization_id}
+    current_date = datetime.utcnow()
+    total_projects = await db.projects.count_documents(org)
+    active_projects = await db.projects.count_documents({**org, "status": ProjectStatus.ACTIVE})
+    completed_projects = await db.projects.count_documents({**org, "status": ProjectStatus.COMPLETED})
+
+    total_budget = budget_utilized = 0
+    async for project in db.projects.find(org):
+        total_budget += project.get("budget_total", 0)
+        budget_utilized += project.get("budget_utilized", 0)
+    utilization_rate = (budget_utilized / total_budget * 100) if total_budget > 0 else 0
+    total_beneficiaries = await db.beneficiaries.count_documents(org)
+
+    kpi_result = await db.kpi_indicators.aggregate([
+        {"$match": org}, ACHIEVEMENT, {"$group": {"_id": None, "avg_achievement": {"$avg": "$achievement_rate"}}},
+    ]).to_list(1)
+    kpi_achievement_rate = kpi_result[0]["avg_achievement"] if kpi_result and kpi_result[0]["avg_achievement"] is not None else 0
+
+    budget_by_category = {
+        str(item["_id"]) if item["_id"] is not None else "uncategorized": item["total"]
+        async for item in db.budget_items.aggregate([
+            {"$match": org}, {"$group": {"_id": "$category", "total": {"$sum": "$budgeted_amount"}}},
+        ])
+    }
+    projects_by_status = {
+        str(item["_id"]) if item["_id"] is not None else "unknown": item["count"]
+        async for item in db.projects.aggregate([
+            {"$match": org}, {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ])
+    }
+    recent_activities = [{
+        "id": str(activity.get("_id", activity.get("id", ""))),
+        "name": activity.get("name", "Unknown Activity"),
+        "status": activity.get("status", "unknown"),
+        "progress": activity.get("progress_percentage", 0),
+        "updated_at": activity.get("updated_at", datetime.utcnow()).isoformat()
+    } async for activity in db.activities.find(org).sort("updated_at", -1).limit(5)]
+    overdue_activities = await db.activities.count_documents(
+        {**org, "end_date": {"$lt": current_date}, "status": {"$ne": "completed"}}
+    )
+
+    # Activity insights
+    activity_stats = await db.activities.aggregate([
+        {"$match": org},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}, "avg_progress": {"$avg": "$progress_percentage"},
+                    "total_budget": {"$sum": "$budget_allocated"}}},
+    ]).to_list(100)
+    completion_trend = await db.activities.aggregate([
+        {"$match": {**org, "updated_at": {"$gte": datetime.utcnow() - timedelta(weeks=8)}, "status": "completed"}},
+        {"$group": {"_id": {"year": {"$year": "$updated_at"}, "week": {"$week": "$updated_at"}}, "count": {"$sum": 1}}},
+        {"$sort": {"_id.year": 1, "_id.week": 1}},
+    ]).to_list(100)
+    efficiency = await db.activities.aggregate([
+        {"$match": {**org, "status": "completed", "start_date": {"$exists": True}, "end_date": {"$exists": True}}},
+        {"$addFields": {"completion_days": {"$divide": [{"$subtract": ["$end_date", "$start_date"]}, 86400000]}}},
+        {"$group": {"_id": None, "avg_completion_days": {"$avg": "$completion_days"}}},
+    ]).to_list(1)
+    avg_completion_days = efficiency[0]["avg_completion_days"] if efficiency else 0
+    activity_insights = {
+        "activity_status_breakdown": {
+            item["_id"] if item["_id"] else "unknown": {
+                "count": item["count"],
+                "avg_progress": round(item["avg_progress"], 1) if item["avg_progress"] is not None else 0,
+                "budget_allocated": item["total_budget"] if item["total_budget"] is not None else 0
+            }
+            for item in activity_stats
+        },
+        "completion_trend_weekly": [
+            {"week": f"{item['_id']['year']}-W{item['_id']['week']}", "completed": item["count"]}
+            for item in completion_trend
+        ],
+        "avg_completion_days": round(avg_completion_days, 1) if avg_completion_days else 0,
+        "total_activities": sum(item["count"] for item in activity_stats)
+    }
+
+    # Performance trends
+    six_months_ago = datetime.utcnow() - timedelta(days=180)
+    budget_trend = await db.budget_items.aggregate([
+        {"$match": {**org, "created_at": {"$gte": six_months_ago}}},
+        {"$group": {"_id": {"year": {"$year": "$created_at"}, "month": {"$month": "$created_at"}},
+                    "total_spent": {"$sum": "$budgeted_amount"}}},
+        {"$sort": {"_id.year": 1, "_id.month": 1}},
+    ]).to_list(100)
+    kpi_trend = await db.kpi_indicators.aggregate([
+        {"$match": {**org, "updated_at": {"$gte": six_months_ago}}},
+        ACHIEVEMENT,
+        {"$group": {"_id": {"year": {"$year": "$updated_at"}, "month": {"$month": "$updated_at"}},
+                    "avg_achievement": {"$avg": "$achievement_rate"}}},
+        {"$sort": {"_id.year": 1, "_id.month": 1}},
+    ]).to_list(100)
+    performance_trends = {
+        "budget_trend_monthly": [
+            {"month": f"{item['_id']['year']}-{item['_id']['month']:02d}", "amount": item["total_spent"]}
+            for item in budget_trend
+        ],
+        "kpi_trend_monthly": [
+            {"month": f"{item['_id']['year']}-{item['_id']['month']:02d}",
+             "achievement": round(item["avg_achievement"], 1) if item["avg_achievement"] is not None else 0}
+            for item in kpi_trend
+        ]
+    }
+
+    # Risk indicators
+    high_utilization = await db.projects.aggregate([
+        {"$match": org},
+        {"$addFields": {"utilization_rate": {"$cond": [
+            {"$gt": ["$budget_total", 0]}, {"$multiply": [{"$divide": ["$budget_utilized", "$budget_total"]}, 100]}, 0
+        ]}}},
+        {"$match": {"utilization_rate": {"$gt": 80}}},
+        {"$count": "n"},
+    ]).to_list(1)
+    due_soon = await db.projects.count_documents({
+        **org, "end_date": {"$lte": current_date + timedelta(days=30), "$gte": current_date}, "status": {"$ne": "completed"}
+    })
+    low_progress = await db.activities.count_documents({
+        **org, "progress_percentage": {"$lt": 50}, "status": {"$in": ["in_progress", "delayed"]},
+        "start_date": {"$lte": current_date - timedelta(days=30)}
+    })
+    risk_indicators = {
+        "budget_risk": {"high_utilization_projects": high_utilization[0]["n"] if high_utilization else 0,
+                        "threshold": 80, "description": "Projects with >80% budget utilization"},
+        "timeline_risk": {"projects_due_soon": due_soon, "threshold_days": 30,
+                          "description": "Projects due within 30 days"},
+        "performance_risk": {"low_progress_activities": low_progress, "threshold": 50,
+                             "description": "Activities with <50% progress after 30+ days"},
+    }
+
+    # Completion analytics
+    total_closed = await db.projects.count_documents({**org, "status": {"$in": ["completed", "cancelled"]}})
+    successful = await db.projects.count_documents({**org, "status": "completed"})
+    completion = await db.projects.aggregate([
+        {"$match": {**org, "status": "completed", "start_date": {"$exists": True}, "end_date": {"$exists": True}}},
+        {"$addFields": {
+            "planned_duration": {"$divide": [{"$subtract": ["$end_date", "$start_date"]}, 86400000]},
+            "actual_duration": {"$divide": [{"$subtract": ["$updated_at", "$created_at"]}, 86400000]},
+        }},
+        {"$addFields": {"schedule_variance": {"$subtract": ["$actual_duration", "$planned_duration"]}}},
+        {"$group": {
+            "_id": None,
+            "avg_planned_duration": {"$avg": "$planned_duration"},
+            "avg_actual_duration": {"$avg": "$actual_duration"},
+            "avg_schedule_variance": {"$avg": "$schedule_variance"},
+            "on_time_projects": {"$sum": {"$cond": [{"$lte": ["$schedule_variance", 0]}, 1, 0]}},
+            "total_projects": {"$sum": 1},
+        }},
+    ]).to_list(1)
+    data = completion[0] if completion else {
+        "avg_planned_duration": 0, "avg_actual_duration": 0, "avg_schedule_variance": 0,
+        "on_time_projects": 0, "total_projects": 0,
+    }
+    on_time_rate = (data["on_time_projects"] / data["total_projects"] * 100) if data["total_projects"] > 0 else 0
+    rounded = lambda value: round(value, 1) if value is not None else 0
+    completion_analytics = {
+        "project_success_rate": round((successful / total_closed * 100) if total_closed > 0 else 0, 1),
+        "on_time_completion_rate": round(on_time_rate, 1),
+        "avg_planned_duration_days": rounded(data["avg_planned_duration"]),
+        "avg_actual_duration_days": rounded(data["avg_actual_duration"]),
+        "avg_schedule_variance_days": rounded(data["avg_schedule_variance"]),
+        "total_completed_projects": successful,
+        "total_closed_projects": total_closed,
+    }
+
+    return ProjectDashboardData(
+        total_projects=total_projects,
+        active_projects=active_projects,
+        completed_projects=completed_projects,
+        total_budget=total_budget,
+        budget_utilized=budget_utilized,
+        utilization_rate=utilization_rate,
+        budget_utilization=utilization_rate,
+        total_beneficiaries=total_beneficiaries,
+        beneficiaries_reached=total_beneficiaries,
+        kpi_achievement_rate=kpi_achievement_rate,
+        kpi_performance={"average_achievement": kpi_achievement_rate},
+        overdue_activities=overdue_activities,
+        recent_activities=recent_activities,
+        budget_by_category=budget_by_category,
+        projects_by_status=projects_by_status,
+        activity_insights=activity_insights,
+        performance_trends=performance_trends,
+        risk_indicators=risk_indicators,
+        completion_analytics=completion_analytics,
+    )
+
+
+def test_facet_dashboard_matches_per_query_baseline(mongo_db):
+    from project_service import ProjectService
+
+    async def scenario(db):
+        await _seed(db, datetime.utcnow())
+        got = await ProjectService(db).get_dashboard_data(ORG)
+        expected = await _baseline(db, ORG)
+        _close(got.model_dump(), expected.model_dump())
+        assert got.total_projects == 14
+
+    mongo_db(scenario)
+
+
+def test_facet_dashboard_of_empty_organization(mongo_db):
+    from project_service import ProjectService
+
+    async def scenario(db):
+        got = await ProjectService(db).get_dashboard_data(ORG)
+        _close(got.model_dump(), (await _baseline(db, ORG)).model_dump())
+
+    mongo_db(scenario)
@@ -0,0 +1,154 @@
+"""
+Project KPI parity: KPIService.get_project_kpis (grouped aggregations joined
+in memory) must equal the per-project queries it replaced on seeded data.
+Skipped when no MongoDB server is reachable.
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("motor.motor_asyncio")
+
+ORG = "org-project-kpis-test"
+
+
+async def _seed(db, now: datetime):
+    rng = random.Random(8)
+    projects = [{
+        "id": f"p{i}", "organization_id": ORG, "name": f"Project {i}",
+        "status": rng.choice(["planned", "active", "completed"]),
+        "budget": rng.choice([0, rng.randint(1, 40) * 1000]),
+        "target_beneficiaries": rng.choice([0, rng.randint(1, 10)]),
+        "start_date": now - timedelta(days=100), "end_date": now + timedelta(days=100),
+        "created_at": now - timedelta(days=120), "updated_at": now - timedelta(days=1),
+    } for i in range(8)]
+    activities = []
+    for i in range(50):
+        activity = {
+            "id": f"a{i}", "organization_id": ORG, "project_id": f"p{rng.randint(0, 8)}",
+            "status": rng.choice(["not_started", "in_progress", "completed", "delayed"]),
+            "progress_percentage": rng.randint(0, 100),
+        }
+        # End dates as datetimes, naive ISO strings, planned overrides or missing
+        end = now + timedelta(days=rng.randint(-30, 30), hours=12)
+        shape = rng.randint(0, 4)
+        if shape == 0:
+            activity["end_date"] = end
+        elif shape == 1:
+            activity["end_date"] = end.replace(microsecond=0).isoformat()
+        elif shape == 2:
+            activity["planned_end_date"] = end
+            activity["end_date"] = now + timedelta(days=365)
+        elif shape == 3:
+            del activity["progress_percentage"]
+        activities.append(activity)
+    beneficiaries = []
+    for i in range(30):
+        ids = rng.sample([f"p{k}" for k in range(9)], rng.randint(0, 3))
+        # Repeated entries count once; a scalar project_ids still matches
+        project_ids = ids + ids[:1] if i % 5 == 0 else (ids[0] if i % 7 == 0 and ids else ids)
+        beneficiaries.append({"id": f"b{i}", "organization_id": ORG, "project_ids": project_ids})
+    expenses = [{
+        "id": f"e{i}", "organization_id": ORG, "project_id": f"p{rng.randint(0, 8)}",
+        "amount": rng.randint(1, 400) * 12.25,
+        "approval_status": rng.choice(["draft", "pending", "approved"]),
+    } for i in range(60)]
+
+    await db.projects.insert_many(projects)
+    await db.activities.insert_many(activities)
+    await db.beneficiaries.insert_many(beneficiaries)
+    await db.expenses.insert_many(expenses)
+
+
+async def _baseline(service, organization_id: str, project_id=None):
+    """The per-project query loop that the grouped aggregations replaced"""
+    db = service.db
+    query = {"organization_id": organization_id}
+    if project_id:
+        query["id"] = project_id
+
+    projects = []
+    async for project in db.projects.find(query):
+        project_id_str = project.get("id", str(project.get("_id")))
+        project_activities = await db.activities.find({"project_id": project_id_str}).to_list(None)
+        project_beneficiaries = await db.beneficiaries.count_documents({"project_ids": project_id_str})
+        project_expenses = 0
+        async for expense in db.expenses.find({"project_id": project_id_str, "approval_status": "approved"}):
+            project_expenses += expense.get("amount", 0)
+
+        total_activities = len(project_activities)
+        completed_activities = len([a for a in project_activities if a.get("status") == "completed"])
+        overdue_activities = len([a for a in project_activities if service._is_activity_overdue(a)])
+        project_budget = project.get("budget", 0)
+        budget_utilization = (project_expenses / project_budget * 100) if project_budget > 0 else 0
+        avg_activity_progress = sum(a.get("progress_percentage", 0) for a in project_activities) / total_activities if total_activities > 0 else 0
+        target_beneficiaries = project.get("target_beneficiaries", 0)
+        beneficiary_achievement_rate = (project_beneficiaries / target_beneficiaries * 100) if target_beneficiaries > 0 else 0
+
+        projects.append({
+            "project_id": project_id_str,
+            "name": project.get("name", "Unnamed Project"),
+            "status": project.get("status", "planning"),
+            "total_activities": total_activities,
+            "completed_activities": completed_activities,
+            "overdue_activities": overdue_activities,
+            "activity_completion_rate": round(completed_activities / total_activities * 100, 2) if total_activities > 0 else 0,
+            "avg_activity_progress": round(avg_activity_progress, 2),
+            "budget": project_budget,
+            "expenses": project_expenses,
+            "budget_utilization": round(budget_utilization, 2),
+            "target_beneficiaries": target_beneficiaries,
+            "actual_beneficiaries": project_beneficiaries,
+            "beneficiary_achievement_rate": round(beneficiary_achievement_rate, 2),
+            "start_date": project.get("start_date"),
+            "end_date": project.get("end_date"),
+            "created_at": project.get("created_at"),
+            "updated_at": project.get("updated_at")
+        })
+
+    total_projects = len(projects)
+    if total_projects == 0:
+        return {"projects": [], "summary": {}, "analytics": {}}
+    completed_projects = len([p for p in projects if p["status"] == "completed"])
+    total_budget = sum(p["budget"] for p in projects)
+    total_expenses = sum(p["expenses"] for p in projects)
+    avg_budget_utilization = sum(p["budget_utilization"] for p in projects) / total_projects
+    return {
+        "projects": projects,
+        "summary": {
+            "total_projects": total_projects,
+            "completed_projects": completed_projects,
+            "project_completion_rate": round(completed_projects / total_projects * 100, 2),
+            "total_budget": total_budget,
+            "total_expenses": total_expenses,
+            "overall_budget_utilization": round(total_expenses / total_budget * 100, 2) if total_budget > 0 else 0,
+            "avg_budget_utilization": round(avg_budget_utilization, 2)
+        },
+        "analytics": {
+            "status_distribution": service._get_project_status_distribution(projects),
+            "budget_performance": service._get_budget_performance_analytics(projects),
+            "beneficiary_impact": service._get_beneficiary_impact_analytics(projects)
+        }
+    }
+
+
+@pytest.mark.parametrize("project_id", [None, "p3", "missing"])
+def test_grouped_project_kpis_match_per_project_queries(mongo_db, project_id):
+    from kpi_service import KPIService
+
+    async def scenario(db):
+        await _seed(db, datetime.utcnow())
+        service = KPIService(db)
+        got = await service.get_project_kpis(ORG, project_id)
+        assert got == await _baseline(service, ORG, project_id)
+        if project_id is None:
+            assert len(got["projects"]) == 8
+
+    mongo_db(scenario)
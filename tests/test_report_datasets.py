@@ -0,0 +1,58 @@
+"""Report datasets are computed once per (org, scope, range, data version)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from data_versions import data_versions  # noqa: E402
+from report_datasets import ReportDatasets  # noqa: E402
+
+
+class _Finance:
+    def __init__(self):
+        self.calls = []
+
+    async def _record(self, name):
+        self.calls.append(name)
+        await asyncio.sleep(0.01)
+        return {"name": name}
+
+    def project_budget_details(self, *args):
+        return self._record("details")
+
+    def burn_rate(self, *args):
+        return self._record("burn_rate")
+
+    def budget_vs_actual(self, *args):
+        return self._record("variance")
+
+    def funding_utilization(self, *args):
+        return self._record("funding")
+
+
+def test_formats_share_one_computation_until_expenses_change():
+    finance = _Finance()
+    datasets = ReportDatasets(finance)
+
+    async def scenario():
+        first, second = await asyncio.gather(
+            datasets.project("org-ds", "p1", None, None),
+            datasets.project("org-ds", "p1", None, None),
+        )
+        assert first is second
+        assert sorted(finance.calls) == ["burn_rate", "details", "funding", "variance"]
+
+        await datasets.project("org-ds", "p1", None, None)
+        assert len(finance.calls) == 4
+
+        await datasets.project("org-ds", "p1", "2024-01-01", None)
+        assert len(finance.calls) == 8
+
+        data_versions.bump("org-ds", "expenses")
+        await datasets.project("org-ds", "p1", None, None)
+        assert len(finance.calls) == 12
+
+    asyncio.run(scenario())
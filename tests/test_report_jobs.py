@@ -0,0 +1,101 @@
+"""
+AI report job queue: request identity, plus coalescing, per-organization
+limits and failure handling against MongoDB (skipped when no server is
+reachable).
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("pymongo")
+
+from report_jobs import ReportJobQueue, dedupe_key  # noqa: E402
+
+START, END = datetime(2024, 1, 1), datetime(2024, 3, 31)
+
+
+def test_dedupe_key_covers_every_output_option():
+    base = dedupe_key("org", "p1", "Monthly", START, END, True, True)
+    assert base == dedupe_key("org", "p1", "monthly", START, END, True, True)
+    assert base != dedupe_key("org", "p1", "monthly", START, END, False, True)
+    assert base != dedupe_key("org", "p1", "monthly", START, END, True, False)
+    assert base != dedupe_key("org", "p1", "monthly", START, END + timedelta(days=1), True, True)
+    assert base != dedupe_key("org2", "p1", "monthly", START, END, True, True)
+
+
+class _Reporting:
+    def __init__(self):
+        self.running = {}
+        self.peak = {}
+        self.release = asyncio.Event()
+
+    async def build_project_report(self, report_id, project_id, report_type, period_start, period_end, include_images, ai_narrative):
+        org = project_id.split(":")[0]
+        self.running[org] = self.running.get(org, 0) + 1
+        self.peak[org] = max(self.peak.get(org, 0), self.running[org])
+        try:
+            await self.release.wait()
+            if project_id.endswith("broken"):
+                raise RuntimeError("No data found")
+        finally:
+            self.running[org] -= 1
+        return {"metadata": {"pdf_path": f"/tmp/report_{report_id}.pdf", "generated_at": datetime.utcnow(),
+                             "narrative_length": 10, "charts_count": 2}}
+
+
+def test_queue_end_to_end(mongo_db):
+    from index_service import IndexService
+
+    async def wait_for(queue, org, job_id, statuses):
+        for _ in range(200):
+            job = await queue.get_job(org, job_id)
+            if job["status"] in statuses:
+                return job
+            await asyncio.sleep(0.02)
+        raise AssertionError(f"job {job_id} stuck in {job['status']}")
+
+    async def scenario(db):
+        await IndexService(db).ensure_indexes()
+        reporting = _Reporting()
+        queue = ReportJobQueue(db, reporting, workers=3, per_org=1, poll_seconds=0.05)
+
+        first, coalesced = await queue.submit("a", "u1", "a:p1", "monthly", START, END)
+        again, coalesced_again = await queue.submit("a", "u2", "a:p1", "Monthly", START, END)
+        assert not coalesced and coalesced_again and again["id"] == first["id"]
+        second, _ = await queue.submit("a", "u1", "a:broken", "monthly", START, END)
+        other, _ = await queue.submit("b", "u1", "b:p1", "monthly", START, END)
+
+        queue.start()
+        await wait_for(queue, "b", other["id"], {"running"})
+        assert (await queue.get_job("a", second["id"]))["status"] == "queued"
+        reporting.release.set()
+
+        done = await wait_for(queue, "a", first["id"], {"completed"})
+        failed = await wait_for(queue, "a", second["id"], {"failed"})
+        await wait_for(queue, "b", other["id"], {"completed"})
+        assert done["pdf_path"].endswith(".pdf") and done["attempts"] == 1
+        assert "No data found" in failed["error"]
+        assert reporting.peak == {"a": 1, "b": 1}
+        assert await queue.get_job("b", first["id"]) is None
+
+        # Finished jobs release their key, so the same request runs again
+        rerun, coalesced = await queue.submit("a", "u1", "a:p1", "monthly", START, END)
+        assert not coalesced and rerun["id"] != first["id"]
+        await wait_for(queue, "a", rerun["id"], {"completed"})
+        await queue.stop()
+
+        # A job left running by a dead process is requeued once its lease expires
+        stale, _ = await queue.submit("c", "u1", "c:p1", "monthly", START, END)
+        await db.generated_reports.update_one({"id": stale["id"]}, {"$set": {
+            "status": "running", "attempts": 1, "lease_until": datetime.utcnow() - timedelta(seconds=1)}})
+        assert await queue.requeue_expired() == 1
+        assert (await queue.get_job("c", stale["id"]))["status"] == "queued"
+
+    mongo_db(scenario)
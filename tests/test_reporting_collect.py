@@ -0,0 +1,72 @@
+"""
+Report data collection aggregates beneficiaries, budgets and KPIs in MongoDB
+instead of loading them (skipped when no server is reachable).
+"""
+
+import sys
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("pymongo")
+
+ORG = "org-report-collect"
+BENEFICIARIES = 20000
+
+
+def test_collect_project_data_counts_without_loading(tmp_path, monkeypatch, mongo_db):
+    import reporting_service
+
+    monkeypatch.setattr(reporting_service, "REPORTS_DIR", str(tmp_path))
+
+    async def scenario(db):
+        await db.projects.insert_one({"id": "p1", "organization_id": ORG, "name": "Water", "description": "d"})
+        await db.activities.insert_many([
+            {"organization_id": ORG, "project_id": "p1", "name": "A", "status": "completed",
+             "start_date": datetime(2024, 1, 5), "end_date": datetime(2024, 2, 1), "notes": "x" * 1000},
+            {"organization_id": ORG, "project_id": "p1", "name": "B", "status": "in_progress",
+             "start_date": datetime(2024, 2, 1), "end_date": datetime(2024, 6, 1)},
+            {"organization_id": ORG, "project_id": "p1", "name": "Later", "status": "completed",
+             "start_date": datetime(2025, 1, 1), "end_date": datetime(2025, 2, 1)},
+        ])
+        await db.budget_items.insert_many([
+            {"organization_id": ORG, "project_id": "p1", "category": "supplies", "budgeted_amount": 100.0, "utilized_amount": 40.0},
+            {"organization_id": ORG, "project_id": "p1", "category": "supplies", "budgeted_amount": 50.0, "utilized_amount": 10.0},
+            {"organization_id": ORG, "project_id": "p1", "budgeted_amount": 50.0, "utilized_amount": 50.0},
+        ])
+        await db.kpi_indicators.insert_many([
+            {"organization_id": ORG, "project_id": "p1", "name": f"K{i}", "achievement_percentage": 50 * i}
+            for i in range(4)
+        ])
+        await db.beneficiaries.insert_many([
+            {"organization_id": ORG, "project_ids": ["p1"], "gender": "female" if i % 2 else "male",
+             "enrollment_date": datetime(2023, 6, 1) if i % 4 else datetime(2024, 2, 1),
+             "custom_fields": {"history": "y" * 2000}}
+            for i in range(BENEFICIARIES)
+        ] + [{"organization_id": ORG, "project_ids": ["p1"], "gender": "male", "enrollment_date": datetime(2025, 1, 1)}])
+
+        service = reporting_service.AIReportingService(db)
+        tracemalloc.start()
+        data = await service._collect_project_data("p1", datetime(2024, 1, 1), datetime(2024, 3, 31))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        summary = data["summary"]
+        assert "beneficiaries" not in data and "_id" not in data["project"]
+        assert summary["total_beneficiaries"] == BENEFICIARIES
+        assert summary["new_beneficiaries"] == BENEFICIARIES // 4
+        assert data["beneficiaries_by_gender"] == {"female": BENEFICIARIES // 2, "male": BENEFICIARIES // 2}
+        assert (summary["total_activities"], summary["completed_activities"]) == (2, 1)
+        assert [a["name"] for a in data["activities"]] == ["A", "B"] and "notes" not in data["activities"][0]
+        assert data["budget_by_category"] == {"supplies": {"budgeted": 150.0, "utilized": 50.0}, "other": {"budgeted": 50.0, "utilized": 50.0}}
+        assert summary["budget_utilization"] == pytest.approx(50.0)
+        assert summary["kpi_achievement"] == pytest.approx(50.0)
+        # 20k documents of ~2 KB each would need tens of MB if loaded
+        assert peak < 5 * 1024 * 1024
+
+    mongo_db(scenario)
@@ -0,0 +1,144 @@
+"""Analytics response cache: LRU/TTL eviction, version keys and ETags."""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+pytest.importorskip("fastapi")
+
+from starlette.requests import Request  # noqa: E402
+
+from data_versions import data_versions  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_response_cache_hits_until_a_dependency_is_written():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"total": len(calls)}
+
+    async def serve(request):
+        return await cache.respond(request, "org-rc", "finance/forecast", {"x": None}, ("expenses",), compute)
+
+    first = asyncio.run(serve(_request()))
+    second = asyncio.run(serve(_request()))
+    assert len(calls) == 1
+    assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+    assert first.body == second.body == b'{"total":1}'
+
+    data_versions.bump("org-rc", "beneficiaries")
+    asyncio.run(serve(_request()))
+    assert len(calls) == 1
+
+    data_versions.bump("org-rc", "expenses")
+    third = asyncio.run(serve(_request()))
+    assert len(calls) == 2
+    assert third.headers["etag"] != first.headers["etag"]
+
+
+def test_matching_if_none_match_returns_304():
+    cache = ResponseCache(maxsize=10, ttl=60)
+
+    async def compute():
+        return {"ok": True}
+
+    async def serve(request):
+        return await cache.respond(request, "org-etag", "kpi/projects", {}, ("projects",), compute)
+
+    etag = asyncio.run(serve(_request())).headers["etag"]
+    not_modified = asyncio.run(serve(_request(f'"stale", W/{etag}')))
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert asyncio.run(serve(_request('"stale"'))).status_code == 200
+    assert cache.stats()["not_modified"] == 1
+
+
+def test_failed_compute_is_not_cached():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        return {"ok": True}
+
+    async def serve(request):
+        return await cache.respond(request, "org-err", "kpi/indicators", {}, ("projects",), compute)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(serve(_request()))
+    response = asyncio.run(serve(_request()))
+    assert len(calls) == 2
+    assert response.headers["x-cache"] == "MISS" and response.body == b'{"ok":true}'
+
+
+def test_beneficiary_analytics_route_revalidates_with_304(monkeypatch):
+    import os
+    from types import SimpleNamespace
+
+    for dep in ("httpx", "motor", "jose", "passlib"):
+        pytest.importorskip(dep)
+    from fastapi.testclient import TestClient
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    import server
+
+    calls = []
+
+    class Beneficiaries:
+        async def get_beneficiary_analytics(self, organization_id, project_id=None):
+            calls.append((organization_id, project_id))
+            return {"total_beneficiaries": 3}
+
+    monkeypatch.setattr(server, "beneficiary_service", Beneficiaries())
+    monkeypatch.setattr(server, "analytics_cache", ResponseCache(maxsize=10, ttl=60))
+    app = server.create_app()
+    app.dependency_overrides[server.auth_util.get_token_principal] = lambda: SimpleNamespace(organization_id="org-route")
+    # No context manager: the lifespan hook (database probe, index sync) is not run
+    http = TestClient(app)
+
+    first = http.get("/api/beneficiaries/analytics")
+    assert first.status_code == 200 and first.json() == {"total_beneficiaries": 3}
+    assert first.headers["x-cache"] == "MISS"
+    second = http.get("/api/beneficiaries/analytics", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304 and second.headers["x-cache"] == "HIT"
+    assert calls == [("org-route", None)]
@@ -0,0 +1,141 @@
+"""
+Parity between the vectorized risk engine (risk_scoring.py) and the
+per-beneficiary formula in BeneficiaryService._calculate_individual_risk_score,
+and of calculate_risk_scores against that path on seeded data (skipped when no
+MongoDB server is reachable).
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pydantic")
+
+import risk_scoring  # noqa: E402
+from models import RiskLevel  # noqa: E402
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def reference_score(recent_services, progress_values, last_service_date, avg_satisfaction):
+    """Line-for-line transcription of _calculate_individual_risk_score"""
+    risk_score = 0.0
+    expected_services = 12
+    attendance_rate = min(recent_services / expected_services, 1.0)
+    risk_score += (1 - attendance_rate) * 40
+    if progress_values:
+        avg_progress = sum(p or 0 for p in progress_values) / len(progress_values)
+        expected_progress = 75
+        kpi_risk = max(0, (expected_progress - avg_progress) / expected_progress)
+        risk_score += kpi_risk * 30
+    else:
+        risk_score += 15
+    if last_service_date:
+        days_since_service = (NOW - last_service_date).days
+        if days_since_service > 30:
+            time_risk = min(days_since_service / 90, 1.0)
+            risk_score += time_risk * 20
+    else:
+        risk_score += 20
+    if avg_satisfaction is not None:
+        satisfaction_risk = max(0, (3 - avg_satisfaction) / 2)
+        risk_score += satisfaction_risk * 10
+    return min(risk_score, 100.0)
+
+
+def reference_level(score):
+    if score >= 80:
+        return RiskLevel.CRITICAL
+    elif score >= 60:
+        return RiskLevel.HIGH
+    elif score >= 40:
+        return RiskLevel.MEDIUM
+    return RiskLevel.LOW
+
+
+def _cases():
+    rng = random.Random(2024)
+    cases = [
+        (0, [], None, None),
+        (12, [75.0], NOW, 3.0),
+        (20, [100.0, 120.0], NOW - timedelta(days=30, hours=23), 5.0),
+        (3, [None, 10.0], NOW - timedelta(days=31), 1.0),
+        (0, [0.0], NOW - timedelta(days=90), None),
+        (1, [], NOW - timedelta(days=400), 2.5),
+        (5, [33.3, 66.7, 12.1], NOW + timedelta(days=2), None),
+    ]
+    for _ in range(2000):
+        progress = [rng.choice([None, rng.uniform(0, 130)]) for _ in range(rng.randint(0, 5))]
+        last = rng.choice([None, NOW - timedelta(days=rng.uniform(0, 200))])
+        satisfaction = rng.choice([None, rng.uniform(1, 5)])
+        cases.append((rng.randint(0, 20), progress, last, satisfaction))
+    return cases
+
+
+def test_vectorized_scores_match_reference_exactly():
+    cases = _cases()
+    recent = np.array([c[0] for c in cases], dtype=np.float64)
+    progress = np.array(
+        [sum(p or 0 for p in c[1]) / len(c[1]) if c[1] else np.nan for c in cases], dtype=np.float64
+    )
+    days = risk_scoring.days_since(NOW, [c[2] for c in cases])
+    satisfaction = np.array([np.nan if c[3] is None else c[3] for c in cases], dtype=np.float64)
+
+    scores = risk_scoring.risk_scores(recent, progress, days, satisfaction)
+    levels = risk_scoring.risk_levels(scores)
+
+    for i, case in enumerate(cases):
+        expected = reference_score(*case)
+        assert float(scores[i]) == expected, f"case {case}: {scores[i]!r} != {expected!r}"
+        assert levels[i] == reference_level(expected)
+
+
+def test_batch_scores_match_per_beneficiary_path(mongo_db):
+    from beneficiary_service import BeneficiaryService
+
+    org = "org-risk-test"
+
+    async def scenario(db):
+        rng = random.Random(17)
+        now = datetime.utcnow()
+        beneficiaries, records, kpis = [], [], []
+        for i in range(40):
+            bid = f"b{i}"
+            # Half a day off whole days keeps .days stable between the two paths' clocks
+            last = rng.choice([None, now - timedelta(days=rng.randint(0, 150), hours=12)])
+            beneficiaries.append({"id": bid, "organization_id": org, "name": f"B{i}", "gender": "female",
+                                  "status": "active", "last_service_date": last})
+            for _ in range(rng.randint(0, 15)):
+                record = {"id": f"{bid}-s{len(records)}", "beneficiary_id": bid, "organization_id": org,
+                          "service_date": now - timedelta(days=rng.choice([5, 40, 80, 120]))}
+                if rng.random() < 0.5:
+                    record["satisfaction_score"] = rng.randint(1, 5)
+                records.append(record)
+            for k in range(rng.randint(0, 4)):
+                kpi = {"id": f"{bid}-k{k}", "beneficiary_id": bid, "organization_id": org, "project_id": "p1",
+                       "kpi_name": "progress", "kpi_type": "percentage",
+                       "measurement_date": now - timedelta(days=k + 1)}
+                # Some KPIs carry no progress value at all
+                if rng.random() < 0.7:
+                    kpi["progress_percentage"] = rng.choice([None, round(rng.uniform(0, 120), 2)])
+                kpis.append(kpi)
+        await db.beneficiaries.insert_many(beneficiaries)
+        await db.service_records.insert_many(records)
+        await db.beneficiary_kpis.insert_many(kpis)
+
+        service = BeneficiaryService(db)
+        assert await service.calculate_risk_scores(org) == {"updated_count": len(beneficiaries)}
+
+        async for doc in db.beneficiaries.find({"organization_id": org}):
+            expected = await service._calculate_individual_risk_score(doc["id"], org)
+            assert doc["risk_score"] == pytest.approx(expected, abs=1e-9), doc["id"]
+            assert doc["risk_level"] == reference_level(doc["risk_score"])
+
+    mongo_db(scenario)
@@ -0,0 +1,40 @@
+"""Write-only XLSX rendering used by the finance report routes."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from xlsx_reports import Formatted, iter_file, render_workbook  # noqa: E402
+
+
+def _load(fh):
+    import io
+    return openpyxl.load_workbook(io.BytesIO(b"".join(iter_file(fh))))
+
+
+def test_sheets_formats_and_widths_round_trip():
+    rows = (["P-%d" % i, float(i), i / 100] for i in range(5000))
+    fh = render_workbook([
+        {"title": "ByProject", "header": ["Project ID", "Spent", "Share"], "rows": rows, "formats": {1: "#,##0.00", 2: "0.0%"}},
+        {"title": "Overview", "header": ["Metric", "Value"], "rows": [["Variance %", Formatted(0.25, "0.0%")], ["Long " + "x" * 80, 1]]},
+    ])
+    assert fh.closed is False
+    wb = _load(fh)
+    assert fh.closed
+
+    ws = wb["ByProject"]
+    assert ws.max_row == 5001
+    assert ws["A1"].font.b
+    assert ws["B3"].value == 1.0 and ws["B3"].number_format == "#,##0.00"
+    assert ws["C3"].number_format == "0.0%"
+    assert ws.column_dimensions["A"].width == 12
+
+    overview = wb["Overview"]
+    assert overview["B2"].number_format == "0.0%"
+    assert overview.column_dimensions["A"].width == 50